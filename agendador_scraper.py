@@ -2,10 +2,93 @@
 Agendador para Scraper Camões - Execução Diária Automática
 """
 
+import os
 import schedule
 import time
 from datetime import datetime
-from scraper_camoes_selenium import CamoesEstoqueFinal
+from scraper_camoes_selenium import CamoesEstoqueFinal, memoria_navegador_mb
+
+# Reciclar o navegador aquecido após N execuções ou acima deste RSS (MB)
+MAX_JOBS_POR_NAVEGADOR = 20
+MAX_RSS_NAVEGADOR_MB = 1500
+
+
+class ServicoNavegador:
+    """
+    Mantém um scraper com Chrome aquecido entre as execuções do agendador.
+    Antes de cada job verifica se o navegador responde; depois de cada job
+    recicla o navegador se passou de max_jobs execuções ou de max_rss_mb.
+    """
+    
+    def __init__(self, headless=True, max_jobs=MAX_JOBS_POR_NAVEGADOR, max_rss_mb=MAX_RSS_NAVEGADOR_MB):
+        self.headless = headless
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.scraper = None
+        self.jobs = 0
+    
+    def _iniciar(self):
+        print("🌐 Aquecendo navegador do agendador...")
+        inicio = time.time()
+        self.scraper = CamoesEstoqueFinal(headless=self.headless)
+        self.jobs = 0
+        print(f"✅ Navegador pronto em {time.time() - inicio:.1f}s")
+    
+    def _encerrar(self):
+        if self.scraper is not None:
+            try:
+                self.scraper.fechar()
+            except Exception as e:
+                print(f"⚠️ Erro ao fechar navegador: {e}")
+            self.scraper = None
+    
+    def obter_scraper(self):
+        """Scraper pronto para uso (health-check antes de cada job)"""
+        if self.scraper is not None and not self.scraper.navegador_saudavel():
+            print("⚠️ Navegador não responde, reiniciando...")
+            self._encerrar()
+        if self.scraper is None:
+            self._iniciar()
+        return self.scraper
+    
+    def concluir_job(self):
+        """Limpa o navegador e recicla se atingiu o limite de jobs ou de memória"""
+        if self.scraper is None:
+            return
+        self.jobs += 1
+        
+        try:
+            self.scraper.preparar_proxima_execucao()
+        except Exception as e:
+            print(f"⚠️ Navegador em estado inválido após o job ({e}), reciclando")
+            self._reciclar()
+            return
+        
+        rss = memoria_navegador_mb(self.scraper.driver)
+        if rss is not None:
+            print(f"🧠 Memória do navegador: {rss:.0f} MB após {self.jobs} execução(ões)")
+        
+        if self.jobs >= self.max_jobs:
+            print(f"♻️ Navegador atingiu {self.jobs} execuções, reciclando")
+            self._reciclar()
+        elif rss is not None and rss > self.max_rss_mb:
+            print(f"♻️ Navegador acima de {self.max_rss_mb} MB, reciclando")
+            self._reciclar()
+    
+    def _reciclar(self):
+        # Já sobe o próximo navegador para a próxima execução não pagar o cold start
+        self._encerrar()
+        try:
+            self._iniciar()
+        except Exception as e:
+            print(f"⚠️ Falha ao aquecer novo navegador ({e}), será iniciado no próximo job")
+    
+    def fechar(self):
+        self._encerrar()
+
+
+servico_navegador = ServicoNavegador(headless=True)
+
 
 def job_atualizar_estoque():
     """Job que será executado diariamente"""
@@ -15,21 +98,23 @@ def job_atualizar_estoque():
     print("="*60 + "\n")
     
     try:
-        scraper = CamoesEstoqueFinal(headless=True)
+        scraper = servico_navegador.obter_scraper()
         estoque = scraper.buscar_estoque()
         
         if estoque:
             scraper.salvar_json('estoque_camoes.json')
             scraper.salvar_csv('estoque_camoes.csv')
+            scraper.registrar_historico()
+            scraper.publicar_mudancas(os.environ.get('WEBHOOK_MUDANCAS'))
             print(f"\n✅ ATUALIZAÇÃO CONCLUÍDA COM SUCESSO!")
             print(f"📊 Total de veículos no estoque: {len(estoque)}")
         else:
             print("\n⚠️ Nenhum veículo encontrado nesta atualização")
-        
-        scraper.fechar()
             
     except Exception as e:
         print(f"\n❌ ERRO na atualização: {e}")
+    finally:
+        servico_navegador.concluir_job()
     
     print("\n" + "="*60 + "\n")
 
@@ -58,9 +143,12 @@ def main():
     job_atualizar_estoque()
     
     # Loop infinito aguardando os horários agendados
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  # Verifica a cada 60 segundos
+    try:
+        while True:
+            schedule.run_pending()
+            time.sleep(60)  # Verifica a cada 60 segundos
+    finally:
+        servico_navegador.fechar()
 
 
 if __name__ == "__main__":
@@ -3,12 +3,22 @@ API REST OTIMIZADA com Cache - Camões Automóveis
 Versão com performance melhorada (< 1s de resposta)
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 import json
 from datetime import datetime
 import os
+from collections import OrderedDict
+from collections.abc import Sequence
 from functools import lru_cache
+import threading
 import time
+import armazenamento_sqlite
+import historico_estoque
+import indices_estoque
+import memoria_compartilhada
+import mudancas_estoque
+import snapshot_binario
+import texto_estoque
 
 app = Flask(__name__)
 
@@ -20,140 +30,669 @@ app.config['JSONIFY_MIMETYPE'] = 'application/json; charset=utf-8'
 # Arquivo do estoque
 ESTOQUE_FILE = 'estoque_camoes.json'
 
-# Cache global
+# Formato lido pela API: 'json' ou 'binario' (estoque_camoes.bin gerado com --binario, mapeado
+# em memória sem parse: partida mais rápida em ambientes serverless como a Vercel)
+FORMATO = os.environ.get('ESTOQUE_FORMATO', 'json')
+BINARIO_FILE = os.environ.get('ESTOQUE_BIN', snapshot_binario.ARQUIVO_PADRAO)
+ARQUIVO_SNAPSHOT = BINARIO_FILE if FORMATO == 'binario' else ESTOQUE_FILE
+
+# Snapshot compartilhado entre workers do gunicorn (gunicorn -c gunicorn.conf.py): o master
+# publica em ESTOQUE_COMPARTILHADO e os workers só mapeiam a geração atual
+COMPARTILHADO = os.environ.get('ESTOQUE_COMPARTILHADO')
+_compartilhado = memoria_compartilhada.ContadorGeracao(COMPARTILHADO) if COMPARTILHADO else None
+
+# Backend: 'json' (arquivo + índices em memória em cada worker) ou 'sqlite' (banco
+# compartilhado entre os workers, gravado pelo scraper com --sqlite)
+BACKEND = os.environ.get('ESTOQUE_BACKEND', 'json')
+SQLITE_FILE = os.environ.get('ESTOQUE_SQLITE', armazenamento_sqlite.ARQUIVO_PADRAO)
+_sqlite = armazenamento_sqlite.EstoqueSQLite(SQLITE_FILE) if BACKEND == 'sqlite' else None
+
+# Histórico de preços gravado pelo scraper
+HISTORICO_LOG = os.environ.get('HISTORICO_LOG', historico_estoque.ARQUIVO_LOG)
+HISTORICO_INDICE = os.environ.get('HISTORICO_INDICE', historico_estoque.ARQUIVO_INDICE)
+
+# Feed de mudanças entre execuções gravado pelo scraper
+MUDANCAS_FEED = os.environ.get('MUDANCAS_FEED', mudancas_estoque.ARQUIVO_FEED)
+
+# Intervalo mínimo entre verificações do arquivo (ms); ESTOQUE_VERIFICAR_MS sobrescreve
+INTERVALO_VERIFICACAO_MS = int(os.environ.get('ESTOQUE_VERIFICAR_MS', '500'))
+
+# Consultas memorizadas por snapshot (LRU); ESTOQUE_LRU_CONSULTAS sobrescreve
+TAMANHO_LRU_CONSULTAS = int(os.environ.get('ESTOQUE_LRU_CONSULTAS', '256'))
+
+# Cache global: um snapshot imutável (estoque + índices) trocado de uma vez só
 _cache = {
-    'estoque': None,
-    'timestamp': None,
-    'cache_duration': 300  # 5 minutos em segundos
+    'snapshot': None,
+    'verificado_em': 0.0,
+    'versao': 0,
+    'recargas': 0,
+    'erros_recarga': 0,
+    'consultas': {'hits': 0, 'misses': 0},
 }
+_lock_recarga = threading.Lock()
+_lock_consultas = threading.Lock()
 
-def carregar_estoque():
-    """Carrega o estoque do arquivo JSON com cache"""
-    global _cache
-    
-    # Verificar se existe cache válido
-    now = time.time()
-    if _cache['estoque'] is not None and _cache['timestamp'] is not None:
-        if now - _cache['timestamp'] < _cache['cache_duration']:
-            return _cache['estoque']
-    
-    # Cache expirado ou não existe, carregar do arquivo
-    if not os.path.exists(ESTOQUE_FILE):
-        estoque_vazio = {
+
+def _assinatura_arquivo(caminho=None):
+    """(mtime_ns, inode, tamanho) do arquivo (padrão: o do estoque); None se não existir"""
+    try:
+        st = os.stat(caminho or ARQUIVO_SNAPSHOT)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+
+def _formatar_n8n(v):
+    """Payload do veículo no formato do webhook N8N (com a mensagem pronta para WhatsApp)"""
+    return {
+        'codigo': v.get('codigo'),
+        'titulo': f"{v.get('marca')} {v.get('modelo')} {v.get('versao')}",
+        'descricao': f"Ano: {v.get('ano')} | KM: {v.get('km')} | Câmbio: {v.get('cambio')}",
+        'preco': v.get('preco'),
+        'foto': v.get('foto_principal'),
+        'fotos': v.get('fotos', []),
+        'cor': v.get('cor'),
+        'link': v.get('link'),
+        'detalhes': v.get('detalhes', ''),
+        'opcionais': v.get('opcionais', []),
+        'mensagem_whatsapp': f"🚘 *{v.get('marca')} {v.get('modelo')}*\n🎨 Cor: {v.get('cor')}\n📅 {v.get('ano')}\n💰 {v.get('preco')}\n📍 {v.get('km')}\n⚙️ {v.get('cambio')}\n📸 {len(v.get('fotos', []))} fotos disponíveis\n\n📝 *Detalhes:*\n{v.get('detalhes', 'Não informado')}"
+    }
+
+
+class _PayloadsN8N(Sequence):
+    """Payloads N8N do snapshot binário formatados no acesso (sem montar todos os veículos de antemão)"""
+    
+    def __init__(self, veiculos):
+        self._veiculos = veiculos
+    
+    def __len__(self):
+        return len(self._veiculos)
+    
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self[i] for i in range(len(self))[pos]]
+        return _formatar_n8n(self._veiculos[pos])
+
+
+def _payloads_n8n(veiculos):
+    """JSON: todos pré-formatados; binário: formatados só quando pedidos"""
+    if isinstance(veiculos, snapshot_binario.VeiculosBinarios):
+        return _PayloadsN8N(veiculos)
+    return [_formatar_n8n(v) for v in veiculos]
+
+
+class _Snapshot(dict):
+    """Snapshot cujas partes caras (índices, respostas pré-serializadas...) são montadas no primeiro uso"""
+    
+    def __init__(self, fabricas, **valores):
+        super().__init__(**valores)
+        self._fabricas = fabricas
+        self._lock = threading.RLock()
+    
+    def __missing__(self, chave):
+        if chave not in self._fabricas:
+            raise KeyError(chave)
+        with self._lock:
+            if not dict.__contains__(self, chave):
+                self[chave] = self._fabricas[chave]()
+            return dict.__getitem__(self, chave)
+
+
+def _por_codigo(veiculos):
+    """{codigo: posicao}; no formato binário lê só a coluna de códigos"""
+    if isinstance(veiculos, snapshot_binario.VeiculosBinarios):
+        codigos = veiculos.valores('codigo')
+    else:
+        codigos = [v.get('codigo') for v in veiculos]
+    por_codigo = {}
+    for pos, codigo in enumerate(codigos):
+        if codigo is not None:
+            por_codigo.setdefault(codigo, pos)
+    return por_codigo
+
+
+def _assinatura_snapshot():
+    """Geração publicada (modo compartilhado) ou assinatura do arquivo do estoque"""
+    if _compartilhado is not None:
+        return _compartilhado.geracao()
+    return _assinatura_arquivo()
+
+
+def _ler_snapshot(assinatura):
+    """Lê o arquivo (índices sob demanda); levanta ValueError se ele mudar durante a leitura"""
+    if assinatura is None:
+        estoque = {
             'ultima_atualizacao': None,
             'total_veiculos': 0,
             'veiculos': []
         }
-        _cache['estoque'] = estoque_vazio
-        _cache['timestamp'] = now
-        return estoque_vazio
+    elif _compartilhado is not None or FORMATO == 'binario':
+        # Gerações compartilhadas nunca são reescritas: o arquivo aberto é sempre o da assinatura
+        binario = _compartilhado.abrir(assinatura) if _compartilhado is not None else snapshot_binario.abrir(BINARIO_FILE)
+        estoque = {
+            'ultima_atualizacao': binario.ultima_atualizacao,
+            'total_veiculos': binario.total_veiculos,
+            'veiculos': binario.veiculos
+        }
+    else:
+        with open(ESTOQUE_FILE, 'r', encoding='utf-8') as f:
+            estoque = json.load(f)
+    if assinatura is not None and _compartilhado is None and _assinatura_arquivo() != assinatura:
+        raise ValueError('arquivo alterado durante a leitura')
+    
+    veiculos = estoque['veiculos']
+    fabricas = {
+        'por_codigo': lambda: _por_codigo(veiculos),
+        'indices': lambda: indices_estoque.construir_indices(veiculos),
+        'respostas': lambda: memoria_compartilhada.preparar_respostas(estoque),
+        'texto': lambda: texto_estoque.construir_indice_texto(veiculos),
+        'n8n': lambda: _payloads_n8n(veiculos),
+    }
+    partes = {}
+    if assinatura is not None and _compartilhado is not None:
+        # Corpo já serializado pelo master, aberto junto com o binário da mesma geração
+        partes['respostas'] = _compartilhado.respostas(assinatura)
+    _cache['versao'] += 1
+    return _Snapshot(
+        fabricas,
+        **partes,
+        estoque=estoque,
+        consultas=OrderedDict(),  # LRU nova a cada snapshot: troca de estoque invalida tudo
+        assinatura=assinatura,
+        versao=_cache['versao'],
+        carregado_em=time.time(),
+    )
+
+
+def _recarregar_se_mudou():
+    """Compara a assinatura do arquivo e troca o snapshot se mudou (chamar com _lock_recarga)"""
+    assinatura = _assinatura_snapshot()
+    atual = _cache['snapshot']
+    _cache['verificado_em'] = time.monotonic()
+    if atual is not None and atual['assinatura'] == assinatura:
+        return
+    try:
+        novo = _ler_snapshot(assinatura)
+    except (OSError, ValueError) as e:
+        # Arquivo sendo gravado pelo scraper (ou inválido): segue com o snapshot anterior
+        _cache['erros_recarga'] += 1
+        print(f"⚠️  Estoque não recarregado ({e}); mantendo versão {atual['versao'] if atual else '-'}")
+        if atual is None:
+            raise
+        return
+    _cache['snapshot'] = novo  # troca atômica: quem já leu o anterior continua com ele
+    _cache['recargas'] += 1
+
+
+def obter_snapshot():
+    """
+    Snapshot atual {estoque, indices, assinatura, versao, carregado_em}.
+    Índices, respostas pré-serializadas e payloads N8N são montados no primeiro uso.
+    
+    O arquivo é verificado (stat) no máximo a cada INTERVALO_VERIFICACAO_MS e só é
+    relido quando mtime/inode/tamanho mudam. Apenas um thread faz a recarga; os
+    demais continuam respondendo com o snapshot anterior enquanto isso.
+    No modo compartilhado o contador de geração (memória mapeada) é lido a cada
+    requisição, então todos os workers trocam juntos quando o master publica.
+    """
+    snapshot = _cache['snapshot']
+    if snapshot is not None:
+        if _compartilhado is not None:
+            if snapshot['assinatura'] == _compartilhado.geracao():
+                return snapshot
+        elif time.monotonic() - _cache['verificado_em'] < INTERVALO_VERIFICACAO_MS / 1000:
+            return snapshot
+    
+    if snapshot is None:
+        # Primeira carga: todos esperam pelo mesmo parse
+        with _lock_recarga:
+            if _cache['snapshot'] is None:
+                _recarregar_se_mudou()
+        return _cache['snapshot']
+    
+    if _lock_recarga.acquire(blocking=False):
+        try:
+            _recarregar_se_mudou()
+        finally:
+            _lock_recarga.release()
+    return _cache['snapshot']
+
+
+def buscar_memorizado(snapshot, consulta):
+    """((posicao, score), ...) da busca aproximada, memorizados por consulta normalizada no LRU do snapshot"""
+    chave = ' '.join(indices_estoque.tokenizar(consulta))
+    lru = snapshot['consultas']
+    with _lock_consultas:
+        if chave in lru:
+            lru.move_to_end(chave)
+            _cache['consultas']['hits'] += 1
+            return lru[chave]
     
-    with open(ESTOQUE_FILE, 'r', encoding='utf-8') as f:
-        estoque = json.load(f)
-        _cache['estoque'] = estoque
-        _cache['timestamp'] = now
-        return estoque
+    encontrados = tuple(indices_estoque.buscar_aproximado(snapshot['indices'], chave))
+    with _lock_consultas:
+        _cache['consultas']['misses'] += 1
+        lru[chave] = encontrados
+        if len(lru) > TAMANHO_LRU_CONSULTAS:
+            lru.popitem(last=False)
+    return encontrados
+
+
+def obter_indice_historico():
+    """Índice do histórico de preços, relido só quando o arquivo muda (o scraper troca por rename)"""
+    assinatura = _assinatura_arquivo(HISTORICO_INDICE)
+    atual = _cache.get('historico')
+    if atual is None or atual['assinatura'] != assinatura:
+        atual = {'assinatura': assinatura, 'indice': historico_estoque.carregar_indice(HISTORICO_INDICE)}
+        _cache['historico'] = atual
+    return atual['indice']
+
+
+def obter_feed_mudancas():
+    """Feed de mudanças, relido só quando o arquivo muda (o scraper troca por rename)"""
+    assinatura = _assinatura_arquivo(MUDANCAS_FEED)
+    atual = _cache.get('mudancas')
+    if atual is None or atual['assinatura'] != assinatura:
+        atual = {'assinatura': assinatura, 'feed': mudancas_estoque.carregar_feed(MUDANCAS_FEED)}
+        _cache['mudancas'] = atual
+    return atual['feed']
+
+
+def carregar_estoque():
+    """Estoque do snapshot atual (recarregado quando o arquivo muda)"""
+    return obter_snapshot()['estoque']
+
+
+def obter_indices():
+    """Índices do snapshot atual"""
+    return obter_snapshot()['indices']
 
 
 def limpar_cache():
     """Limpa o cache forçando recarregamento"""
-    global _cache
-    _cache['estoque'] = None
-    _cache['timestamp'] = None
+    with _lock_recarga:
+        _cache['snapshot'] = None
+        _cache['verificado_em'] = 0.0
+        _cache.pop('sqlite', None)
+
+
+def _blocos_arquivo(fd, tamanho_bloco=256 * 1024):
+    """Conteúdo do arquivo em blocos com pread: cada requisição tem o próprio offset no mesmo descritor"""
+    posicao = 0
+    while True:
+        bloco = os.pread(fd, tamanho_bloco, posicao)
+        if not bloco:
+            return
+        posicao += len(bloco)
+        yield bloco
+
+
+def _resposta_preserializada(preparada):
+    """
+    Resposta com o corpo pronto: 304 se If-None-Match bate, senão br/gzip conforme Accept-Encoding.
+    Corpos em memória ('variantes') ou em arquivo já aberto ('arquivos', modo compartilhado: lidos
+    em blocos com pread, direto do cache de páginas, sem cópia inteira por worker)
+    """
+    if request.if_none_match.contains_weak(preparada['etag']):
+        resposta = Response(status=304)
+    else:
+        variantes = preparada.get('variantes') or preparada['arquivos']
+        codificacao = request.accept_encodings.best_match([c for c in ('br', 'gzip') if c in variantes])
+        corpo = variantes[codificacao or 'identity']
+        if isinstance(corpo, bytes):
+            resposta = Response(corpo, content_type='application/json; charset=utf-8')
+        else:
+            resposta = Response(_blocos_arquivo(corpo.fileno()), content_type='application/json; charset=utf-8',
+                                direct_passthrough=True)
+            resposta.content_length = os.fstat(corpo.fileno()).st_size
+        if codificacao:
+            resposta.headers['Content-Encoding'] = codificacao
+    resposta.set_etag(preparada['etag'])
+    resposta.headers['Vary'] = 'Accept-Encoding'
+    resposta.headers['Cache-Control'] = 'no-cache'  # sempre revalida (barato: 304 sem corpo)
+    return resposta
+
+
+OPCOES_LISTAGEM = ('limit', 'offset', 'ordenar', 'campos')
+
+
+def _opcoes_listagem(fonte):
+    """limit/offset/ordenar/campos de args ou body; levanta ValueError com a mensagem de erro"""
+    opcoes = {'limit': None, 'offset': 0, 'ordenar': None, 'campos': None}
+    for nome in ('limit', 'offset'):
+        if fonte.get(nome) not in (None, ''):
+            try:
+                opcoes[nome] = int(fonte[nome])
+            except (TypeError, ValueError):
+                opcoes[nome] = -1
+            if opcoes[nome] < 0:
+                raise ValueError(f'Parâmetro "{nome}" deve ser um inteiro >= 0')
+    
+    if fonte.get('ordenar'):
+        ordenar = fonte['ordenar']
+        if not isinstance(ordenar, str) or ordenar.strip().removeprefix('-') not in indices_estoque.ORDENACOES:
+            validas = ', '.join(indices_estoque.ORDENACOES)
+            raise ValueError(f'Parâmetro "ordenar" deve ser um de: {validas} (prefixo "-" para decrescente)')
+        opcoes['ordenar'] = ordenar.strip()
+    
+    campos = fonte.get('campos')
+    if campos:
+        if isinstance(campos, str):
+            campos = campos.split(',')
+        if not isinstance(campos, list) or not all(isinstance(c, str) for c in campos):
+            raise ValueError('Parâmetro "campos" deve ser uma lista de nomes separados por vírgula')
+        opcoes['campos'] = [c.strip() for c in campos if c.strip()]
+    return opcoes
+
+
+def _listar(snapshot, posicoes, opcoes, anotar=None):
+    """
+    Ordena, pagina e projeta as posições; retorna (veiculos, paginacao).
+    `anotar(pos)` devolve campos extras (score, trechos...) calculados só para a página.
+    """
+    indices = snapshot['indices']
+    inicio, limite = opcoes['offset'], opcoes['limit']
+    fim = inicio + limite if limite is not None else None
+    
+    total = len(posicoes)
+    if opcoes['ordenar']:
+        posicoes = indices_estoque.ordenar(indices, posicoes, opcoes['ordenar'], fim)
+    pagina = posicoes[inicio:fim]
+    
+    veiculos = snapshot['estoque']['veiculos']
+    campos = opcoes['campos']
+    # Só os veículos da página são montados (no snapshot binário, um dict por acesso)
+    resultados = [veiculos[pos] for pos in pagina]
+    if campos:
+        resultados = [{c: v[c] for c in campos if c in v} for v in resultados]
+    if anotar is not None:
+        resultados = [dict(v, **anotar(pos)) for v, pos in zip(resultados, pagina)]
+    
+    return resultados, _paginacao(opcoes, total, len(resultados))
+
+
+def _paginacao(opcoes, total, retornados):
+    inicio, limite = opcoes['offset'], opcoes['limit']
+    fim = inicio + limite if limite is not None else None
+    return {
+        'offset': inicio,
+        'limit': limite,
+        'retornados': retornados,
+        'proximo_offset': fim if fim is not None and fim < total else None,
+    }
+
+
+def _estoque_sqlite():
+    """Estoque completo do SQLite pré-serializado, refeito só quando há uma execução nova"""
+    execucao = _sqlite.execucao() or {'id': None, 'ultima_atualizacao': None}
+    cache = _cache.get('sqlite')
+    if cache is None or cache['execucao'] != execucao['id']:
+        total, veiculos = _sqlite.todos(_opcoes_listagem({}))
+        estoque = {
+            'ultima_atualizacao': execucao['ultima_atualizacao'],
+            'total_veiculos': total,
+            'veiculos': veiculos
+        }
+        cache = {'execucao': execucao['id'], 'respostas': memoria_compartilhada.preparar_respostas(estoque)}
+        _cache['sqlite'] = cache
+    return cache
 
 
 @app.route('/api/estoque', methods=['GET'])
 def obter_estoque_completo():
     """
     GET /api/estoque
-    Retorna o estoque completo (com cache)
+    GET /api/estoque?limit=20&offset=0&ordenar=-ano&campos=codigo,modelo,preco
+    Retorna o estoque completo (serializado e comprimido uma vez por snapshot; ETag/304).
+    Com limit/offset/ordenar/campos retorna só a página pedida.
     """
-    estoque = carregar_estoque()
-    return jsonify(estoque)
+    if not any(request.args.get(nome) for nome in OPCOES_LISTAGEM):
+        if _sqlite is not None:
+            return _resposta_preserializada(_estoque_sqlite()['respostas'])
+        return _resposta_preserializada(obter_snapshot()['respostas'])
+    
+    try:
+        opcoes = _opcoes_listagem(request.args)
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    
+    if _sqlite is not None:
+        execucao = _sqlite.execucao() or {}
+        total, veiculos = _sqlite.todos(opcoes)
+        return jsonify({
+            'ultima_atualizacao': execucao.get('ultima_atualizacao'),
+            'total_veiculos': total,
+            'paginacao': _paginacao(opcoes, total, len(veiculos)),
+            'veiculos': veiculos
+        })
+    
+    snapshot = obter_snapshot()
+    estoque = snapshot['estoque']
+    veiculos, paginacao = _listar(snapshot, range(len(estoque['veiculos'])), opcoes)
+    return jsonify({
+        'ultima_atualizacao': estoque.get('ultima_atualizacao'),
+        'total_veiculos': estoque.get('total_veiculos'),
+        'paginacao': paginacao,
+        'veiculos': veiculos
+    })
 
 
 @app.route('/api/estoque/buscar', methods=['GET'])
 def buscar_veiculo():
     """
     GET /api/estoque/buscar?modelo=corolla
-    Busca veículos por modelo (com cache)
+    Busca veículos por marca/modelo/versão tolerando acento, espaço e erro de digitação.
+    Resultados do mais parecido para o menos, com 'score' (0 a 1); aceita limit/offset/ordenar/campos
     """
     modelo = request.args.get('modelo', '').lower()
     
     if not modelo:
         return jsonify({'erro': 'Parâmetro "modelo" é obrigatório'}), 400
     
-    estoque = carregar_estoque()
-    resultados = [
-        v for v in estoque['veiculos'] 
-        if modelo in v.get('modelo', '').lower()
-    ]
+    try:
+        opcoes = _opcoes_listagem(request.args)
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    
+    if _sqlite is not None:
+        total, resultados = _sqlite.buscar_modelo(modelo, opcoes)
+        paginacao = _paginacao(opcoes, total, len(resultados))
+    else:
+        snapshot = obter_snapshot()
+        encontrados = buscar_memorizado(snapshot, modelo)
+        total = len(encontrados)
+        scores = dict(encontrados)
+        resultados, paginacao = _listar(snapshot, [pos for pos, _ in encontrados], opcoes,
+                                        anotar=lambda pos: {'score': scores[pos]})
     
     return jsonify({
         'query': modelo,
-        'total_encontrados': len(resultados),
+        'total_encontrados': total,
+        'paginacao': paginacao,
+        'veiculos': resultados
+    })
+
+
+@app.route('/api/estoque/texto', methods=['GET'])
+def buscar_texto_livre():
+    """
+    GET /api/estoque/texto?q=teto solar
+    Busca nos detalhes e opcionais (BM25, sem acento e com radicais: 'revisado' acha 'revisada').
+    Cada veículo vem com 'score' e 'trechos' com os termos em *negrito*; aceita limit/offset/ordenar/campos
+    """
+    consulta = request.args.get('q', '').strip()
+    
+    if not consulta:
+        return jsonify({'erro': 'Parâmetro "q" é obrigatório'}), 400
+    
+    try:
+        opcoes = _opcoes_listagem(request.args)
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    
+    if _sqlite is not None:
+        total, resultados = _sqlite.buscar_texto(consulta, opcoes)
+        paginacao = _paginacao(opcoes, total, len(resultados))
+    else:
+        snapshot = obter_snapshot()
+        encontrados = texto_estoque.buscar(snapshot['texto'], consulta)
+        total = len(encontrados)
+        scores = dict(encontrados)
+        veiculos = snapshot['estoque']['veiculos']
+        
+        def anotar(pos):
+            return {'score': scores[pos], 'trechos': texto_estoque.trechos(veiculos[pos], consulta)}
+        
+        resultados, paginacao = _listar(snapshot, [pos for pos, _ in encontrados], opcoes, anotar=anotar)
+    
+    return jsonify({
+        'query': consulta,
+        'total_encontrados': total,
+        'paginacao': paginacao,
         'veiculos': resultados
     })
 
 
+@app.route('/api/estoque/historico/<codigo>', methods=['GET'])
+def historico_por_codigo(codigo):
+    """
+    GET /api/estoque/historico/7329496
+    Histórico do veículo: primeira vez visto, mudanças de preço, saída/retorno e dias em estoque
+    """
+    historico = historico_estoque.historico_veiculo(obter_indice_historico(), codigo, HISTORICO_LOG)
+    if historico is None:
+        return jsonify({'erro': 'Veículo sem histórico'}), 404
+    return jsonify(historico)
+
+
+@app.route('/api/estoque/historico', methods=['GET'])
+def historico_resumo():
+    """
+    GET /api/estoque/historico
+    Dias em estoque (média/mediana/máximo) dos veículos à venda e dos que já saíram
+    """
+    return jsonify(historico_estoque.resumo_permanencia(obter_indice_historico()))
+
+
+@app.route('/api/estoque/mudancas', methods=['GET'])
+def mudancas():
+    """
+    GET /api/estoque/mudancas?desde=12
+    Veículos novos, removidos e com preço/km alterado nas execuções depois da versão `desde`.
+    Guarde 'versao_atual' e mande de volta na próxima chamada; 'completo': false significa que
+    parte das mudanças já saiu do feed e o estoque deve ser recarregado em /api/estoque.
+    """
+    try:
+        desde = int(request.args.get('desde', 0))
+    except ValueError:
+        return jsonify({'erro': 'Parâmetro "desde" deve ser numérico'}), 400
+    return jsonify(mudancas_estoque.mudancas_desde(obter_feed_mudancas(), desde))
+
+
 @app.route('/api/estoque/codigo/<codigo>', methods=['GET'])
 def obter_por_codigo(codigo):
     """
     GET /api/estoque/codigo/001
     Retorna veículo por código (com cache)
     """
-    estoque = carregar_estoque()
-    veiculo = next(
-        (v for v in estoque['veiculos'] if v.get('codigo') == codigo),
-        None
-    )
+    if _sqlite is not None:
+        veiculo = _sqlite.por_codigo(codigo)
+    else:
+        snapshot = obter_snapshot()
+        pos = snapshot['por_codigo'].get(codigo)
+        veiculo = snapshot['estoque']['veiculos'][pos] if pos is not None else None
     
-    if veiculo:
+    if veiculo is not None:
         return jsonify(veiculo)
     else:
         return jsonify({'erro': 'Veículo não encontrado'}), 404
 
 
+# Filtros numéricos do /filtrar: (parâmetro, coluna, limite, fator para a unidade da coluna)
+FILTROS_FAIXA = (
+    ('preco_min', 'preco', 'minimo', 100),  # reais -> centavos
+    ('preco_max', 'preco', 'maximo', 100),
+    ('km_max', 'km', 'maximo', 1),
+    ('ano_min', 'ano_fabricacao', 'minimo', 1),
+    ('ano_max', 'ano_fabricacao', 'maximo', 1),
+)
+
+
 @app.route('/api/estoque/filtrar', methods=['POST'])
 def filtrar_veiculos():
     """
     POST /api/estoque/filtrar
     Body: {
         "marca": "Toyota",
+        "preco_min": 50000,
         "preco_max": 100000,
-        "ano_min": 2020
+        "km_max": 80000,
+        "ano_min": 2020,
+        "ano_max": 2023,
+        "cambio": "Automático",
+        "combustivel": "Flex"
     }
-    Filtra veículos por múltiplos critérios (com cache)
+    Filtra veículos por múltiplos critérios (com cache).
+    limit/offset/ordenar/campos podem vir no body ou na query string.
     """
-    filtros = request.json
-    estoque = carregar_estoque()
-    resultados = estoque['veiculos'].copy()
+    filtros = dict(request.json or {})
+    fonte_opcoes = dict(request.args)
+    fonte_opcoes.update({nome: filtros.pop(nome) for nome in OPCOES_LISTAGEM if nome in filtros})
+    try:
+        opcoes = _opcoes_listagem(fonte_opcoes)
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
     
-    # Aplicar filtros
-    if 'marca' in filtros:
-        marca = filtros['marca'].lower()
-        resultados = [v for v in resultados if marca in v.get('marca', '').lower()]
+    # Filtros de texto: números viram texto ("ano" digitado como 2020); listas/objetos são recusados
+    textos = {}
+    for campo in ('marca', 'cor', 'cambio', 'combustivel', 'modelo'):
+        if campo not in filtros:
+            continue
+        valor = filtros[campo]
+        if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            valor = str(valor)
+        if not isinstance(valor, str):
+            return jsonify({'erro': f'Parâmetro "{campo}" deve ser texto'}), 400
+        textos[campo] = valor
     
-    if 'modelo' in filtros:
-        modelo = filtros['modelo'].lower()
-        resultados = [v for v in resultados if modelo in v.get('modelo', '').lower()]
-    
-    if 'ano_min' in filtros:
+    # marca/cor aceitam parte do valor; cambio/combustivel comparam o valor exato
+    categorias = {campo: (textos[campo], campo in ('cambio', 'combustivel'))
+                  for campo in ('marca', 'cor', 'cambio', 'combustivel') if campo in textos}
+    faixas = []
+    for parametro, coluna, limite, fator in FILTROS_FAIXA:
+        if parametro not in filtros:
+            continue
         try:
-            resultados = [
-                v for v in resultados 
-                if int(v.get('ano', '0/0').split('/')[0]) >= filtros['ano_min']
-            ]
-        except:
-            pass
+            faixas.append((coluna, limite, round(float(filtros[parametro]) * fator)))
+        except (TypeError, ValueError):
+            return jsonify({'erro': f'Parâmetro "{parametro}" deve ser numérico'}), 400
     
-    if 'cor' in filtros:
-        cor = filtros['cor'].lower()
-        resultados = [v for v in resultados if cor in v.get('cor', '').lower()]
+    if _sqlite is not None:
+        total, resultados = _sqlite.filtrar(categorias, faixas, textos.get('modelo'), opcoes)
+        paginacao = _paginacao(opcoes, total, len(resultados))
+    else:
+        snapshot = obter_snapshot()
+        indices = snapshot['indices']
+        
+        # Cada critério vira um bitmap (bit i = veículo i); o resultado é o AND de todos
+        bitmap = indices['todos']
+        for campo, (valor, exato) in categorias.items():
+            bitmap &= indices_estoque.bitmap_categoria(indices, campo, valor, exato=exato)
+        
+        if 'modelo' in textos:
+            posicoes = [pos for pos, _ in indices_estoque.buscar_aproximado(indices, textos['modelo'])]
+            bitmap &= indices_estoque.bitmap_de(posicoes, indices['total'])
+        
+        for coluna, limite, valor in faixas:
+            bitmap &= indices_estoque.bitmap_faixa(indices, coluna, **{limite: valor})
+        
+        posicoes = indices_estoque.posicoes_do_bitmap(bitmap)
+        total = len(posicoes)
+        resultados, paginacao = _listar(snapshot, posicoes, opcoes)
     
     return jsonify({
         'filtros_aplicados': filtros,
-        'total_encontrados': len(resultados),
+        'total_encontrados': total,
+        'paginacao': paginacao,
         'veiculos': resultados
     })
 
@@ -164,12 +703,27 @@ def status():
     GET /api/status
     Retorna status da última atualização
     """
-    estoque = carregar_estoque()
+    if _sqlite is not None:
+        execucao = _sqlite.execucao() or {}
+        return jsonify({
+            'status': 'online',
+            'backend': BACKEND,
+            'ultima_atualizacao': execucao.get('ultima_atualizacao'),
+            'total_veiculos': execucao.get('total_veiculos', 0),
+            'execucao': execucao.get('id'),
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
+    
+    snapshot = obter_snapshot()
+    estoque = snapshot['estoque']
     return jsonify({
         'status': 'online',
+        'backend': BACKEND,
+        'formato': FORMATO,
         'ultima_atualizacao': estoque.get('ultima_atualizacao'),
         'total_veiculos': estoque.get('total_veiculos'),
-        'cache_ativo': _cache['estoque'] is not None,
+        'cache_ativo': True,
+        'versao_snapshot': snapshot['versao'],
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     })
 
@@ -190,29 +744,30 @@ def webhook_n8n():
     
     if acao == 'buscar':
         modelo = dados.get('modelo', '').lower()
-        estoque = carregar_estoque()
-        resultados = [
-            v for v in estoque['veiculos'] 
-            if modelo in v.get('modelo', '').lower()
-        ]
         
-        # Formato especial para N8N com mensagens prontas
-        resposta_formatada = []
-        for v in resultados:
-            resposta_formatada.append({
-                'codigo': v.get('codigo'),
-                'titulo': f"{v.get('marca')} {v.get('modelo')} {v.get('versao')}",
-                'descricao': f"Ano: {v.get('ano')} | KM: {v.get('km')} | Câmbio: {v.get('cambio')}",
-                'preco': v.get('preco'),
-                'foto': v.get('foto_principal'),
-                'fotos': v.get('fotos', []),
-                'cor': v.get('cor'),
-                'link': v.get('link'),
-                'detalhes': v.get('detalhes', ''),
-                'opcionais': v.get('opcionais', []),
-                'mensagem_whatsapp': f"🚘 *{v.get('marca')} {v.get('modelo')}*\n🎨 Cor: {v.get('cor')}\n📅 {v.get('ano')}\n💰 {v.get('preco')}\n📍 {v.get('km')}\n⚙️ {v.get('cambio')}\n📸 {len(v.get('fotos', []))} fotos disponíveis\n\n📝 *Detalhes:*\n{v.get('detalhes', 'Não informado')}"
+        if _sqlite is not None:
+            opcoes = _opcoes_listagem({})
+            if modelo:
+                _, veiculos = _sqlite.buscar_modelo(modelo, opcoes)
+            else:
+                _, veiculos = _sqlite.todos(opcoes)
+            resposta_formatada = [dict(_formatar_n8n(v), **({'score': v['score']} if 'score' in v else {}))
+                                  for v in veiculos]
+            return jsonify({
+                'sucesso': True,
+                'total': len(resposta_formatada),
+                'veiculos': resposta_formatada
             })
         
+        snapshot = obter_snapshot()
+        
+        # Formato especial para N8N com mensagens prontas (pré-formatadas no snapshot)
+        if modelo:
+            resposta_formatada = [dict(snapshot['n8n'][pos], score=score)
+                                  for pos, score in buscar_memorizado(snapshot, modelo)]
+        else:
+            resposta_formatada = list(snapshot['n8n'])  # Sem modelo: todos (como antes)
+        
         return jsonify({
             'sucesso': True,
             'total': len(resposta_formatada),
@@ -235,17 +790,40 @@ def limpar_cache_endpoint():
     })
 
 
+def _resumo_consultas(snapshot):
+    with _lock_consultas:
+        hits, misses = _cache['consultas']['hits'], _cache['consultas']['misses']
+        em_cache = len(snapshot['consultas']) if snapshot else 0
+    return {
+        'hits': hits,
+        'misses': misses,
+        'taxa_acerto': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        'em_cache': em_cache,
+        'capacidade': TAMANHO_LRU_CONSULTAS,
+    }
+
+
 @app.route('/api/cache/info', methods=['GET'])
 def info_cache():
     """
     GET /api/cache/info
     Retorna informações sobre o cache
     """
+    snapshot = _cache['snapshot']
     return jsonify({
-        'cache_ativo': _cache['estoque'] is not None,
-        'timestamp_cache': datetime.fromtimestamp(_cache['timestamp']).strftime('%Y-%m-%d %H:%M:%S') if _cache['timestamp'] else None,
-        'duracao_cache_segundos': _cache['cache_duration'],
-        'veiculos_em_cache': len(_cache['estoque']['veiculos']) if _cache['estoque'] else 0
+        'backend': BACKEND,
+        'formato': FORMATO,
+        'geracao_compartilhada': _compartilhado.geracao() if _compartilhado is not None else None,
+        'cache_ativo': snapshot is not None,
+        'partes_montadas': sorted(k for k in ('por_codigo', 'indices', 'respostas', 'texto', 'n8n')
+                                  if snapshot is not None and k in snapshot),
+        'versao_snapshot': snapshot['versao'] if snapshot else None,
+        'timestamp_cache': datetime.fromtimestamp(snapshot['carregado_em']).strftime('%Y-%m-%d %H:%M:%S') if snapshot else None,
+        'intervalo_verificacao_ms': INTERVALO_VERIFICACAO_MS,
+        'recargas': _cache['recargas'],
+        'erros_recarga': _cache['erros_recarga'],
+        'veiculos_em_cache': len(snapshot['estoque']['veiculos']) if snapshot else 0,
+        'consultas': _resumo_consultas(snapshot)
     })
 
 
@@ -264,7 +842,11 @@ if __name__ == '__main__':
     print("📡 Endpoints disponíveis:")
     print("   GET  /api/estoque")
     print("   GET  /api/estoque/buscar?modelo=corolla")
+    print("   GET  /api/estoque/texto?q=teto solar")
     print("   GET  /api/estoque/codigo/<codigo>")
+    print("   GET  /api/estoque/historico/<codigo>")
+    print("   GET  /api/estoque/historico")
+    print("   GET  /api/estoque/mudancas?desde=<versao>")
     print("   POST /api/estoque/filtrar")
     print("   GET  /api/status")
     print("   POST /api/webhook/n8n")
@@ -272,7 +854,8 @@ if __name__ == '__main__':
     print("   GET  /api/cache/info            ← Info do cache")
     print()
     print("⚡ OTIMIZAÇÕES:")
-    print("   • Cache de 5 minutos (resposta < 100ms)")
+    print("   • Cache recarregado só quando o arquivo muda (resposta < 100ms)")
+    print("   • /api/estoque pré-serializado com gzip/brotli e ETag (304)")
     print("   • CORS habilitado para N8N")
     print("   • Endpoints de gerenciamento de cache")
     print()
@@ -281,8 +864,12 @@ if __name__ == '__main__':
     print()
     
     # Pré-carregar cache na inicialização
-    print("🔄 Pré-carregando cache...")
-    estoque = carregar_estoque()
-    print(f"✅ Cache carregado: {estoque['total_veiculos']} veículos\n")
+    if _sqlite is not None:
+        execucao = _sqlite.execucao() or {}
+        print(f"🗄️  Backend SQLite: {SQLITE_FILE} ({execucao.get('total_veiculos', 0)} veículos)\n")
+    else:
+        print("🔄 Pré-carregando cache...")
+        estoque = carregar_estoque()
+        print(f"✅ Cache carregado: {estoque['total_veiculos']} veículos\n")
     
     app.run(host='0.0.0.0', port=5000, debug=False)  # debug=False para produção
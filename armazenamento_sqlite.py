@@ -0,0 +1,350 @@
+"""
+Armazenamento do estoque em SQLite (WAL + FTS5) compartilhado entre o scraper e a API
+Cada execução do scraper é gravada numa única transação: quem lê nunca vê uma escrita pela metade
+"""
+
+from contextlib import contextmanager
+import json
+import os
+import sqlite3
+import threading
+
+from indices_estoque import (normalizar, preco_para_centavos, km_para_inteiro, ano_para_inteiros,
+                             buscar_aproximado, construir_indices)
+import texto_estoque
+
+ARQUIVO_PADRAO = 'estoque_camoes.db'
+
+# Campos do veículo com coluna própria (fotos e opcionais ficam em tabelas separadas)
+CAMPOS = ('data_scraping', 'codigo', 'modelo', 'marca', 'versao', 'preco', 'ano', 'km',
+          'cambio', 'combustivel', 'cor', 'foto_principal', 'link', 'detalhes')
+CAMPOS_NORMALIZADOS = ('marca', 'cor', 'cambio', 'combustivel')
+
+# Colunas tipadas (mesmos nomes de indices_estoque.COLUNAS_NUMERICAS) -> coluna no banco
+COLUNAS_TIPADAS = {'preco': 'preco_centavos', 'km': 'km_num',
+                   'ano_fabricacao': 'ano_fabricacao', 'ano_modelo': 'ano_modelo'}
+ORDENACOES = {'preco': 'preco_centavos', 'km': 'km_num', 'ano': 'ano_fabricacao'}
+
+ESQUEMA = f"""
+CREATE TABLE IF NOT EXISTS execucoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ultima_atualizacao TEXT,
+    total_veiculos INTEGER
+);
+CREATE TABLE IF NOT EXISTS veiculos (
+    posicao INTEGER PRIMARY KEY,  -- ordem na listagem do site
+    {', '.join(f'{c} TEXT' for c in CAMPOS)},
+    extras TEXT,                  -- JSON com campos sem coluna própria
+    preco_centavos INTEGER, km_num INTEGER, ano_fabricacao INTEGER, ano_modelo INTEGER,
+    {', '.join(f'{c}_norm TEXT' for c in CAMPOS_NORMALIZADOS)}
+);
+CREATE INDEX IF NOT EXISTS idx_veiculos_codigo ON veiculos(codigo);
+CREATE INDEX IF NOT EXISTS idx_veiculos_preco ON veiculos(preco_centavos);
+CREATE INDEX IF NOT EXISTS idx_veiculos_km ON veiculos(km_num);
+CREATE INDEX IF NOT EXISTS idx_veiculos_ano ON veiculos(ano_fabricacao);
+CREATE INDEX IF NOT EXISTS idx_veiculos_marca ON veiculos(marca_norm);
+CREATE INDEX IF NOT EXISTS idx_veiculos_cambio ON veiculos(cambio_norm);
+CREATE INDEX IF NOT EXISTS idx_veiculos_combustivel ON veiculos(combustivel_norm);
+CREATE TABLE IF NOT EXISTS fotos (
+    veiculo INTEGER NOT NULL,
+    ordem INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (veiculo, ordem)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS opcionais (
+    veiculo INTEGER NOT NULL,
+    ordem INTEGER NOT NULL,
+    nome TEXT NOT NULL,
+    PRIMARY KEY (veiculo, ordem)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_opcionais_nome ON opcionais(nome);
+CREATE VIRTUAL TABLE IF NOT EXISTS veiculos_fts USING fts5(
+    titulo, texto, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+_INSERIR_VEICULO = (
+    f"INSERT INTO veiculos (posicao, {', '.join(CAMPOS)}, extras, "
+    f"preco_centavos, km_num, ano_fabricacao, ano_modelo, "
+    f"{', '.join(c + '_norm' for c in CAMPOS_NORMALIZADOS)}) "
+    f"VALUES ({', '.join('?' * (len(CAMPOS) + len(CAMPOS_NORMALIZADOS) + 6))})"
+)
+
+
+def conectar(caminho=ARQUIVO_PADRAO, somente_leitura=False):
+    """Conexão em modo autocommit (transações explícitas); a de escrita cria o esquema e liga o WAL"""
+    if somente_leitura:
+        conexao = sqlite3.connect(f'file:{caminho}?mode=ro', uri=True, isolation_level=None,
+                                  check_same_thread=False)
+    else:
+        conexao = sqlite3.connect(caminho, isolation_level=None)
+        conexao.execute('PRAGMA journal_mode=WAL')
+        conexao.execute('PRAGMA synchronous=NORMAL')
+        conexao.executescript(ESQUEMA)
+    conexao.row_factory = sqlite3.Row
+    return conexao
+
+
+# ==== ESCRITA (scraper) ====
+
+def _linha_veiculo(pos, veiculo):
+    extras = {k: v for k, v in veiculo.items() if k not in CAMPOS and k not in ('fotos', 'opcionais')}
+    anos = ano_para_inteiros(veiculo.get('ano')) or (None, None)
+    return ((pos,) + tuple(veiculo.get(c) for c in CAMPOS)
+            + (json.dumps(extras, ensure_ascii=False) if extras else None,
+               preco_para_centavos(veiculo.get('preco')), km_para_inteiro(veiculo.get('km'))) + anos
+            + tuple(normalizar(veiculo.get(c)) for c in CAMPOS_NORMALIZADOS))
+
+
+def salvar_estoque(veiculos, caminho=ARQUIVO_PADRAO, ultima_atualizacao=None):
+    """Substitui o estoque gravado por `veiculos` numa única transação; retorna o id da execução"""
+    conexao = conectar(caminho)
+    try:
+        conexao.execute('BEGIN IMMEDIATE')
+        try:
+            for tabela in ('fotos', 'opcionais', 'veiculos_fts', 'veiculos'):
+                conexao.execute(f'DELETE FROM {tabela}')
+            conexao.executemany(_INSERIR_VEICULO, (_linha_veiculo(pos, v) for pos, v in enumerate(veiculos)))
+            conexao.executemany('INSERT INTO fotos VALUES (?, ?, ?)', (
+                (pos, i, url) for pos, v in enumerate(veiculos) for i, url in enumerate(v.get('fotos') or [])))
+            conexao.executemany('INSERT INTO opcionais VALUES (?, ?, ?)', (
+                (pos, i, nome) for pos, v in enumerate(veiculos) for i, nome in enumerate(v.get('opcionais') or [])))
+            conexao.executemany('INSERT INTO veiculos_fts (rowid, titulo, texto) VALUES (?, ?, ?)', (
+                (pos, ' '.join(v.get(c) or '' for c in ('marca', 'modelo', 'versao')), texto_estoque.texto_veiculo(v))
+                for pos, v in enumerate(veiculos)))
+            cursor = conexao.execute('INSERT INTO execucoes (ultima_atualizacao, total_veiculos) VALUES (?, ?)',
+                                     (ultima_atualizacao, len(veiculos)))
+            conexao.execute('COMMIT')
+        except BaseException:
+            conexao.execute('ROLLBACK')
+            raise
+        return cursor.lastrowid
+    finally:
+        conexao.close()
+
+
+# ==== LEITURA (API) ====
+
+def _consulta_fts(coluna, termos, operador):
+    """Expressão MATCH do FTS5 com prefixo em cada termo: titulo : ("fiat"* AND "cro"*)"""
+    expressao = f' {operador} '.join('"' + termo + '"*' for termo in termos)
+    return f'{coluna} : ({expressao})'
+
+
+# (posicao, score) da busca aproximada, passados como JSON: [[posicao, score], ...]
+_SELECAO_APROXIMADOS = ("SELECT json_extract(value, '$[0]') AS posicao, json_extract(value, '$[1]') AS score "
+                        "FROM json_each(?)")
+
+
+def _score(bm25):
+    """
+    Score exibido com 4 algarismos significativos: o FTS5 limita o idf de termos presentes em
+    mais da metade dos veículos a 1e-6, e round(score, 4) zeraria esses scores
+    """
+    return float(f'{bm25:.4g}')
+
+
+class EstoqueSQLite:
+    """
+    Consultas da API direto no banco (uma conexão somente leitura por thread).
+    Os métodos de listagem recebem as opções da API (limit/offset/ordenar/campos) e
+    retornam (total, veiculos) com os veículos no mesmo formato do JSON.
+    """
+
+    def __init__(self, caminho=ARQUIVO_PADRAO):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._titulos = None  # (execução, índices de marca/modelo/versao) da busca aproximada
+
+    def _conexao(self):
+        """
+        Conexão somente leitura do thread. Enquanto o scraper não gravou o banco, um banco vazio
+        em memória (estoque vazio, como sem o JSON); o arquivo é procurado de novo a cada requisição
+        """
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is not None:
+            return conexao
+        if os.path.exists(self.caminho):
+            self._local.conexao = conectar(self.caminho, somente_leitura=True)
+            return self._local.conexao
+        vazia = getattr(self._local, 'vazia', None)
+        if vazia is None:
+            vazia = self._local.vazia = conectar(':memory:')
+        return vazia
+
+    @contextmanager
+    def _leitura(self):
+        """Transação de leitura: todas as consultas de uma requisição veem a mesma execução"""
+        conexao = self._conexao()
+        conexao.execute('BEGIN')
+        try:
+            yield conexao
+        finally:
+            conexao.execute('COMMIT')
+
+    def execucao(self):
+        """{id, ultima_atualizacao, total_veiculos} da última execução gravada (None se vazio)"""
+        with self._leitura() as conexao:
+            linha = conexao.execute('SELECT * FROM execucoes ORDER BY id DESC LIMIT 1').fetchone()
+        return dict(linha) if linha else None
+
+    def _montar(self, conexao, posicoes, campos=None):
+        """Veículos (dicts no formato do JSON) das posições, na mesma ordem"""
+        if not posicoes:
+            return []
+        marcadores = ', '.join('?' * len(posicoes))
+        linhas = {l['posicao']: l for l in conexao.execute(
+            f'SELECT * FROM veiculos WHERE posicao IN ({marcadores})', posicoes)}
+        listas = {}
+        for tabela, coluna, chave in (('fotos', 'url', 'fotos'), ('opcionais', 'nome', 'opcionais')):
+            if campos and chave not in campos:
+                continue
+            listas[chave] = {pos: [] for pos in posicoes}
+            for veiculo, valor in conexao.execute(
+                    f'SELECT veiculo, {coluna} FROM {tabela} WHERE veiculo IN ({marcadores}) '
+                    f'ORDER BY veiculo, ordem', posicoes):
+                listas[chave][veiculo].append(valor)
+
+        veiculos = []
+        for pos in posicoes:
+            linha = linhas[pos]
+            v = {c: linha[c] for c in CAMPOS if linha[c] is not None}
+            for chave, valores in listas.items():
+                v[chave] = valores[pos]
+            if linha['extras']:
+                v.update(json.loads(linha['extras']))
+            if campos:
+                v = {c: v[c] for c in campos if c in v}
+            veiculos.append(v)
+        return veiculos
+
+    def _aproximados(self, conexao, consulta):
+        """
+        [(posicao, score)] da busca tolerante a erro de digitação de indices_estoque sobre
+        marca/modelo/versao, para quando o prefixo do FTS5 não acha nada ('civc'). Os índices
+        só dos títulos são montados uma vez por execução gravada
+        """
+        execucao = conexao.execute('SELECT max(id) FROM execucoes').fetchone()[0]
+        with self._lock:
+            titulos = self._titulos
+        if titulos is None or titulos[0] != execucao:
+            veiculos = [dict(linha) for linha in conexao.execute(
+                'SELECT marca, modelo, versao FROM veiculos ORDER BY posicao')]
+            titulos = (execucao, construir_indices(veiculos))
+            with self._lock:
+                self._titulos = titulos
+        return buscar_aproximado(titulos[1], consulta)
+
+    def _listar(self, conexao, selecao, parametros, opcoes):
+        """
+        Pagina/ordena `selecao` (SELECT que devolve posicao, score) e monta os veículos da página.
+        Sem `ordenar`, a ordem é score decrescente e depois a ordem da listagem.
+        """
+        total = conexao.execute(f'SELECT count(*) FROM ({selecao})', parametros).fetchone()[0]
+        if opcoes.get('ordenar'):
+            chave = opcoes['ordenar']
+            coluna = ORDENACOES[chave.lstrip('-')]
+            direcao = 'DESC' if chave.startswith('-') else 'ASC'
+            ordem = f'v.{coluna} IS NULL, v.{coluna} {direcao}, s.posicao'
+        else:
+            ordem = 's.score DESC, s.posicao'
+        limite = opcoes.get('limit')
+        linhas = conexao.execute(
+            f'SELECT s.posicao, s.score FROM ({selecao}) s JOIN veiculos v ON v.posicao = s.posicao '
+            f'ORDER BY {ordem} LIMIT ? OFFSET ?',
+            tuple(parametros) + (-1 if limite is None else limite, opcoes.get('offset') or 0)).fetchall()
+        posicoes = [l['posicao'] for l in linhas]
+        return total, posicoes, {l['posicao']: l['score'] for l in linhas}
+
+    def todos(self, opcoes):
+        with self._leitura() as conexao:
+            total, posicoes, _ = self._listar(conexao, 'SELECT posicao, 0 AS score FROM veiculos', (), opcoes)
+            return total, self._montar(conexao, posicoes, opcoes.get('campos'))
+
+    def por_codigo(self, codigo):
+        with self._leitura() as conexao:
+            linha = conexao.execute('SELECT posicao FROM veiculos WHERE codigo = ? ORDER BY posicao LIMIT 1',
+                                    (codigo,)).fetchone()
+            return self._montar(conexao, [linha['posicao']])[0] if linha else None
+
+    def buscar_modelo(self, consulta, opcoes):
+        """
+        Busca por prefixo (sem acento) em marca/modelo/versao; score = relevância BM25 do FTS5.
+        Sem nenhum resultado, cai na busca aproximada (score = similaridade de 0 a 1, como em memória)
+        """
+        termos = normalizar(consulta).split()
+        if not termos:
+            return 0, []
+        selecao = ('SELECT rowid AS posicao, -bm25(veiculos_fts) AS score FROM veiculos_fts '
+                   'WHERE veiculos_fts MATCH ?')
+        with self._leitura() as conexao:
+            total, posicoes, scores = self._listar(conexao, selecao, (_consulta_fts('titulo', termos, 'AND'),), opcoes)
+            if not total:
+                aproximados = self._aproximados(conexao, consulta)
+                total, posicoes, scores = self._listar(conexao, _SELECAO_APROXIMADOS,
+                                                       (json.dumps(aproximados),), opcoes)
+            veiculos = self._montar(conexao, posicoes, opcoes.get('campos'))
+        for pos, v in zip(posicoes, veiculos):
+            v['score'] = _score(scores[pos])
+        return total, veiculos
+
+    def filtrar(self, categorias, faixas, modelo, opcoes):
+        """
+        categorias: {campo: (valor, exato)}; faixas: [(coluna tipada, 'minimo'|'maximo', valor)];
+        modelo: texto para a busca por prefixo, ou aproximada se o prefixo não achar nada (ou None).
+        Usa os índices das colunas normalizadas/tipadas.
+        """
+        condicoes, parametros = [], []
+        for campo, (valor, exato) in categorias.items():
+            if exato:
+                condicoes.append(f'{campo}_norm = ?')
+                parametros.append(normalizar(valor))
+            else:
+                condicoes.append(f"instr({campo}_norm, ?) > 0")
+                parametros.append(normalizar(valor))
+        for coluna, limite, valor in faixas:
+            condicoes.append(f"{COLUNAS_TIPADAS[coluna]} {'>=' if limite == 'minimo' else '<='} ?")
+            parametros.append(valor)
+        termos = normalizar(modelo).split() if modelo is not None else []
+        with self._leitura() as conexao:
+            if termos:
+                expressao = _consulta_fts('titulo', termos, 'AND')
+                if conexao.execute('SELECT 1 FROM veiculos_fts WHERE veiculos_fts MATCH ? LIMIT 1',
+                                   (expressao,)).fetchone():
+                    condicoes.append('posicao IN (SELECT rowid FROM veiculos_fts WHERE veiculos_fts MATCH ?)')
+                    parametros.append(expressao)
+                else:
+                    condicoes.append(f'posicao IN (SELECT posicao FROM ({_SELECAO_APROXIMADOS}))')
+                    parametros.append(json.dumps(self._aproximados(conexao, modelo)))
+            where = ' WHERE ' + ' AND '.join(condicoes) if condicoes else ''
+            total, posicoes, _ = self._listar(conexao, f'SELECT posicao, 0 AS score FROM veiculos{where}',
+                                              parametros, opcoes)
+            return total, self._montar(conexao, posicoes, opcoes.get('campos'))
+
+    def buscar_texto(self, consulta, opcoes):
+        """
+        Busca nos detalhes/opcionais: radicais de texto_estoque como prefixo no FTS5 (OU entre termos),
+        ranking BM25 e trecho com os termos em *negrito*
+        """
+        termos = list(dict.fromkeys(texto_estoque.termos(consulta)))
+        if not termos:
+            return 0, []
+        expressao = _consulta_fts('texto', termos, 'OR')
+        selecao = ('SELECT rowid AS posicao, -bm25(veiculos_fts, 0.0, 1.0) AS score FROM veiculos_fts '
+                   'WHERE veiculos_fts MATCH ?')
+        with self._leitura() as conexao:
+            total, posicoes, scores = self._listar(conexao, selecao, (expressao,), opcoes)
+            veiculos = self._montar(conexao, posicoes, opcoes.get('campos'))
+            trechos = {}
+            if posicoes:
+                marcadores = ', '.join('?' * len(posicoes))
+                for linha in conexao.execute(
+                        f"SELECT rowid, snippet(veiculos_fts, 1, '*', '*', '…', {texto_estoque.TAMANHO_TRECHO}) "
+                        f"FROM veiculos_fts WHERE veiculos_fts MATCH ? AND rowid IN ({marcadores})",
+                        [expressao] + posicoes):
+                    trechos[linha[0]] = [' '.join(linha[1].split())]
+        for pos, v in zip(posicoes, veiculos):
+            v['score'] = _score(scores[pos])
+            v['trechos'] = trechos.get(pos, [])
+        return total, veiculos
@@ -0,0 +1,147 @@
+"""
+Cache em disco das páginas baixadas pelo motor HTTP
+Requisições condicionais (ETag/Last-Modified) + hash do conteúdo para não
+refazer o parse de páginas que não mudaram
+"""
+
+from datetime import datetime
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+
+INDICE = 'indice.json'
+
+
+class CachePaginas:
+    """
+    Cache de páginas por URL em <diretorio>/<sha1(url)>.html com índice JSON.
+
+    Guarda ETag, Last-Modified, hash SHA-256 do corpo e o resultado do último
+    parse. Se o servidor responde 304 ou o corpo tem o mesmo hash do último
+    parse, o resultado é reaproveitado sem chamar o parser. Remove as páginas
+    menos usadas (LRU) quando o total passa de max_mb.
+    """
+
+    def __init__(self, diretorio='.cache_paginas', max_mb=100):
+        self.diretorio = diretorio
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+        self.indice = self._carregar_indice()
+        # Soma de 'tamanho' do índice, mantida a cada gravação (sem percorrer o índice inteiro)
+        self.total_bytes = sum(e.get('tamanho', 0) for e in self.indice.values())
+        self.estatisticas = {'hits_304': 0, 'hits_conteudo': 0, 'misses': 0, 'evicoes': 0}
+
+    def _carregar_indice(self):
+        try:
+            with open(os.path.join(self.diretorio, INDICE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _caminho(self, url):
+        return os.path.join(self.diretorio, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.html')
+
+    def _ler_corpo(self, url):
+        try:
+            with open(self._caminho(url), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def obter(self, session, url, parser, versao_parser=None, timeout=15):
+        """
+        Baixa `url` (condicional quando já está em cache) e devolve
+        (resultado, html, resposta). `parser(html, url)` só é chamado quando o
+        conteúdo mudou ou versao_parser é diferente da do resultado guardado.
+        """
+        with self.lock:
+            entrada = dict(self.indice.get(url) or {})
+        corpo_cache = self._ler_corpo(url) if entrada else None
+
+        headers = {}
+        if corpo_cache is not None:
+            if entrada.get('etag'):
+                headers['If-None-Match'] = entrada['etag']
+            if entrada.get('last_modified'):
+                headers['If-Modified-Since'] = entrada['last_modified']
+
+        resposta = session.get(url, headers=headers, timeout=timeout)
+        reaproveitavel = (entrada.get('resultado') is not None
+                          and entrada.get('versao_parser') == versao_parser)
+
+        if resposta.status_code == 304 and corpo_cache is not None:
+            html = corpo_cache.decode(entrada.get('encoding') or 'utf-8', errors='replace')
+            tipo = 'hits_304'
+        else:
+            resposta.raise_for_status()
+            corpo = resposta.content
+            html = resposta.text
+            hash_corpo = hashlib.sha256(corpo).hexdigest()
+            if hash_corpo != entrada.get('hash'):
+                reaproveitavel = False
+                with open(self._caminho(url), 'wb') as f:
+                    f.write(corpo)
+            entrada['hash'] = hash_corpo
+            entrada['tamanho'] = len(corpo)
+            entrada['etag'] = resposta.headers.get('ETag')
+            entrada['last_modified'] = resposta.headers.get('Last-Modified')
+            entrada['encoding'] = resposta.encoding
+            tipo = 'hits_conteudo' if reaproveitavel else 'misses'
+
+        if reaproveitavel:
+            resultado = entrada['resultado']
+        else:
+            tipo = 'misses'
+            resultado = parser(html, url)
+            entrada['resultado'] = resultado
+            entrada['versao_parser'] = versao_parser
+        entrada['acesso'] = time.time()
+
+        with self.lock:
+            self.estatisticas[tipo] += 1
+            anterior = self.indice.get(url)
+            self.total_bytes += entrada.get('tamanho', 0) - (anterior.get('tamanho', 0) if anterior else 0)
+            self.indice[url] = entrada
+            self._remover_excesso()
+
+        # Cópia: quem chama pode alterar o resultado (ex: juntar detalhes ao registro)
+        return copy.deepcopy(resultado), html, resposta
+
+    def _remover_excesso(self):
+        """Remove as páginas acessadas há mais tempo até caber em max_bytes (chamar com lock)"""
+        if self.total_bytes <= self.max_bytes:
+            return
+        for url, entrada in sorted(self.indice.items(), key=lambda item: item[1].get('acesso', 0)):
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self._caminho(url))
+            except OSError:
+                pass
+            self.total_bytes -= entrada.get('tamanho', 0)
+            del self.indice[url]
+            self.estatisticas['evicoes'] += 1
+
+    def salvar(self):
+        """Grava o índice (arquivo temporário + rename para não corromper)"""
+        caminho = os.path.join(self.diretorio, INDICE)
+        temporario = caminho + '.tmp'
+        with self.lock:
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(self.indice, f, ensure_ascii=False)
+            os.replace(temporario, caminho)
+
+    def resumo(self):
+        """Estatísticas de hit/miss para o resumo da execução"""
+        with self.lock:
+            e = dict(self.estatisticas)
+            e['paginas_em_cache'] = len(self.indice)
+            e['tamanho_mb'] = self.total_bytes / (1024 * 1024)
+        consultas = e['hits_304'] + e['hits_conteudo'] + e['misses']
+        e['taxa_acerto'] = (e['hits_304'] + e['hits_conteudo']) / consultas if consultas else 0.0
+        e['atualizado_em'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return e
@@ -0,0 +1,147 @@
+"""
+Exportação do estoque em CSV normalizado (planilhas / BI)
+- veiculos.csv: uma linha por veículo, preço/km/anos como números
+- fotos.csv, opcionais.csv, detalhes.csv: uma linha por item (ou linha do texto), ligadas por codigo
+Escrita em streaming (um veículo por vez) num diretório temporário que depois toma o lugar
+do anterior: as quatro tabelas são sempre da mesma execução
+"""
+
+from contextlib import ExitStack
+import argparse
+import csv
+import json
+import os
+import shutil
+
+from indices_estoque import ano_para_inteiros, km_para_inteiro, preco_para_centavos
+from saida_estoque import SUFIXO_TEMPORARIO, escrita_atomica, ler_ndjson
+
+DIRETORIO_PADRAO = 'csv_estoque'
+SUFIXO_ANTIGO = '.antigo'
+
+COLUNAS_VEICULOS = ('codigo', 'marca', 'modelo', 'versao', 'ano_fabricacao', 'ano_modelo', 'preco', 'km',
+                    'cambio', 'combustivel', 'cor', 'num_fotos', 'num_opcionais', 'foto_principal', 'link',
+                    'data_scraping')
+TABELAS = {
+    'veiculos': COLUNAS_VEICULOS,
+    'fotos': ('codigo', 'ordem', 'url'),
+    'opcionais': ('codigo', 'ordem', 'opcional'),
+    'detalhes': ('codigo', 'linha', 'texto'),
+}
+
+
+def _reais(centavos):
+    """7990000 -> '79900.00' (ponto decimal: importa como número em qualquer ferramenta)"""
+    return '' if centavos is None else f'{centavos // 100}.{centavos % 100:02d}'
+
+
+def linha_veiculo(v):
+    """Linha de veiculos.csv com os campos numéricos tipados (vazio se ausente)"""
+    ano_fabricacao, ano_modelo = ano_para_inteiros(v.get('ano')) or ('', '')
+    km = km_para_inteiro(v.get('km'))
+    return {
+        'codigo': v.get('codigo', ''),
+        'marca': v.get('marca', ''),
+        'modelo': v.get('modelo', ''),
+        'versao': v.get('versao', ''),
+        'ano_fabricacao': ano_fabricacao,
+        'ano_modelo': ano_modelo,
+        'preco': _reais(preco_para_centavos(v.get('preco'))),
+        'km': '' if km is None else km,
+        'cambio': v.get('cambio', ''),
+        'combustivel': v.get('combustivel', ''),
+        'cor': v.get('cor', ''),
+        'num_fotos': len(v.get('fotos') or ()),
+        'num_opcionais': len(v.get('opcionais') or ()),
+        'foto_principal': v.get('foto_principal', ''),
+        'link': v.get('link', ''),
+        'data_scraping': v.get('data_scraping', ''),
+    }
+
+
+def _trocar_diretorio(novo, diretorio):
+    """
+    Põe `novo` no lugar de `diretorio` com dois renames (o anterior passa por <diretorio>.antigo).
+    Uma queda entre eles deixa só o conjunto antigo ou só o novo, nunca arquivos misturados.
+    """
+    antigo = diretorio + SUFIXO_ANTIGO
+    shutil.rmtree(antigo, ignore_errors=True)
+    if os.path.isdir(diretorio):
+        os.rename(diretorio, antigo)
+    os.rename(novo, diretorio)
+    shutil.rmtree(antigo, ignore_errors=True)
+
+
+def _recuperar_troca(diretorio):
+    """Execução que caiu entre os dois renames: o conjunto anterior volta para o lugar"""
+    antigo = diretorio + SUFIXO_ANTIGO
+    if not os.path.isdir(diretorio) and os.path.isdir(antigo):
+        os.rename(antigo, diretorio)
+
+
+def exportar(veiculos, diretorio=DIRETORIO_PADRAO):
+    """
+    Grava as quatro tabelas a partir de qualquer iterável de veículos (lista ou gerador de NDJSON).
+    Retorna o número de linhas por tabela.
+    """
+    diretorio = os.path.normpath(diretorio)
+    _recuperar_troca(diretorio)
+    temporario = diretorio + SUFIXO_TEMPORARIO
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+    contagem = dict.fromkeys(TABELAS, 0)
+    try:
+        _gravar_tabelas(veiculos, temporario, contagem)
+        _trocar_diretorio(temporario, diretorio)
+    except BaseException:
+        shutil.rmtree(temporario, ignore_errors=True)
+        raise
+    return contagem
+
+
+def _gravar_tabelas(veiculos, diretorio, contagem):
+    """Uma passada pelos veículos escrevendo as quatro tabelas ao mesmo tempo"""
+    with ExitStack() as pilha:
+        escritores = {}
+        for tabela, colunas in TABELAS.items():
+            f = pilha.enter_context(escrita_atomica(os.path.join(diretorio, f'{tabela}.csv'), newline=''))
+            escritores[tabela] = csv.writer(f)
+            escritores[tabela].writerow(colunas)
+
+        for v in veiculos:
+            codigo = v.get('codigo', '')
+            linha = linha_veiculo(v)
+            escritores['veiculos'].writerow([linha[c] for c in COLUNAS_VEICULOS])
+            filhas = {
+                'fotos': v.get('fotos') or (),
+                'opcionais': v.get('opcionais') or (),
+                # Uma linha do texto por registro: nenhum campo com quebra de linha
+                'detalhes': (v.get('detalhes') or '').splitlines(),
+            }
+            contagem['veiculos'] += 1
+            for tabela, itens in filhas.items():
+                for ordem, item in enumerate(itens, 1):
+                    escritores[tabela].writerow((codigo, ordem, item))
+                contagem[tabela] += len(itens)
+
+
+def _veiculos_do_arquivo(arquivo):
+    """NDJSON é lido um veículo por vez; JSON (estoque_camoes.json) é carregado inteiro"""
+    if arquivo.endswith('.ndjson'):
+        return ler_ndjson(arquivo)
+    with open(arquivo, 'r', encoding='utf-8') as f:
+        return json.load(f)['veiculos']
+
+
+def main(argv=None):
+    """python exportar_csv.py [estoque_camoes.ndjson|estoque_camoes.json] [--diretorio csv_estoque]"""
+    parser = argparse.ArgumentParser(description="Exporta o estoque em CSV normalizado (veiculos/fotos/opcionais/detalhes)")
+    parser.add_argument('arquivo', nargs='?', default='estoque_camoes.json')
+    parser.add_argument('--diretorio', default=DIRETORIO_PADRAO)
+    args = parser.parse_args(argv)
+    contagem = exportar(_veiculos_do_arquivo(args.arquivo), args.diretorio)
+    print(f"💾 CSV normalizado em {args.diretorio}/: " + ', '.join(f"{n} {t}" for t, n in contagem.items()))
+
+
+if __name__ == '__main__':
+    main()
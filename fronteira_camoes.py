@@ -0,0 +1,200 @@
+"""
+Fronteira de crawl para as páginas de detalhes
+Fila de prioridade + limite de taxa por host + backoff exponencial com jitter
+"""
+
+from urllib.parse import urlparse
+import heapq
+import itertools
+import random
+import threading
+import time
+
+# Requisições por segundo por host (token bucket); hosts fora da lista usam TAXA_PADRAO
+TAXAS_POR_HOST = {
+    'camoesmultimarcas.com.br': 4.0,
+}
+TAXA_PADRAO = 2.0
+
+# Prioridades (menor sai primeiro)
+PRIORIDADE_NOVO = 0
+PRIORIDADE_NORMAL = 1
+
+
+def _host(url):
+    host = (urlparse(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class BaldeTokens:
+    """Token bucket thread-safe: até `taxa` requisições/s com rajadas de até `capacidade`"""
+
+    def __init__(self, taxa, capacidade=None):
+        self.taxa = float(taxa)
+        self.capacidade = float(capacidade if capacidade is not None else max(1.0, taxa))
+        self.tokens = self.capacidade
+        self.ultimo = time.monotonic()
+        self.lock = threading.Lock()
+
+    def adquirir(self):
+        """Bloqueia até haver um token disponível"""
+        while True:
+            with self.lock:
+                agora = time.monotonic()
+                self.tokens = min(self.capacidade, self.tokens + (agora - self.ultimo) * self.taxa)
+                self.ultimo = agora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                espera = (1 - self.tokens) / self.taxa
+            time.sleep(espera)
+
+
+class FronteiraCrawl:
+    """
+    Fila de URLs com prioridade, limite de taxa por host e concorrência limitada
+    ao número de processadores (um por navegador/conexão).
+
+    Falhas voltam para a fila com backoff exponencial + jitter até max_tentativas;
+    no fim, as que ainda falharam recebem uma última tentativa (repasse final).
+    ao_falhar(chave, erro) é chamado assim que um item é dado como perdido de vez.
+    """
+
+    def __init__(self, taxas_por_host=None, taxa_padrao=TAXA_PADRAO, max_tentativas=3,
+                 backoff_base=1.0, backoff_max=30.0, repasse_final=True, pausa_repasse=5.0):
+        self.taxas_por_host = dict(TAXAS_POR_HOST if taxas_por_host is None else taxas_por_host)
+        self.taxa_padrao = taxa_padrao
+        self.max_tentativas = max(1, int(max_tentativas))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.repasse_final = repasse_final
+        self.pausa_repasse = pausa_repasse
+
+        self._prontos = []    # heap (prioridade, seq, item)
+        self._atrasados = []  # heap (liberar_em, seq, item)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._em_andamento = 0
+        self._baldes = {}
+        self._ultima_passagem = not repasse_final  # falhas desta passagem são definitivas
+
+        self.resultados = {}
+        self.falhas = {}
+        self.estatisticas = {'sucessos': 0, 'retentativas': 0, 'recuperadas_no_repasse': 0, 'falhas': 0,
+                             'erros_ao_concluir': 0}
+
+    def adicionar(self, chave, url, prioridade=PRIORIDADE_NORMAL):
+        """Enfileira uma URL; `chave` identifica o resultado (ex: índice do card)"""
+        item = {'chave': chave, 'url': url, 'prioridade': prioridade, 'tentativa': 0, 'erro': None}
+        with self._cond:
+            heapq.heappush(self._prontos, (prioridade, next(self._seq), item))
+            self._cond.notify()
+
+    def _balde(self, host):
+        with self._cond:
+            if host not in self._baldes:
+                self._baldes[host] = BaldeTokens(self.taxas_por_host.get(host, self.taxa_padrao))
+            return self._baldes[host]
+
+    def _proximo(self):
+        """Próximo item pronto; None quando não há mais nada a processar"""
+        with self._cond:
+            while True:
+                agora = time.monotonic()
+                while self._atrasados and self._atrasados[0][0] <= agora:
+                    _, _, item = heapq.heappop(self._atrasados)
+                    heapq.heappush(self._prontos, (item['prioridade'], next(self._seq), item))
+                if self._prontos:
+                    _, _, item = heapq.heappop(self._prontos)
+                    self._em_andamento += 1
+                    return item
+                if self._atrasados:
+                    self._cond.wait(self._atrasados[0][0] - agora)
+                elif self._em_andamento:
+                    # Um item em andamento pode falhar e voltar para a fila
+                    self._cond.wait()
+                else:
+                    return None
+
+    def _concluir(self, item, resultado=None, erro=None):
+        """Registra o resultado/erro do item; retorna True se ele falhou de vez"""
+        perdido = False
+        with self._cond:
+            self._em_andamento -= 1
+            if erro is None:
+                self.resultados[item['chave']] = resultado
+                self.estatisticas['sucessos'] += 1
+            else:
+                item['tentativa'] += 1
+                item['erro'] = erro
+                if item['tentativa'] < self.max_tentativas:
+                    self.estatisticas['retentativas'] += 1
+                    atraso = min(self.backoff_max, self.backoff_base * 2 ** (item['tentativa'] - 1))
+                    atraso *= random.uniform(0.5, 1.5)
+                    heapq.heappush(self._atrasados, (time.monotonic() + atraso, next(self._seq), item))
+                else:
+                    self.falhas[item['chave']] = item
+                    perdido = self._ultima_passagem
+            self._cond.notify_all()
+        return perdido
+
+    def _avisar(self, callback, item, valor):
+        """Chama o callback do item; erro nele não pode derrubar o worker (o resto da fila ficaria parado)"""
+        if not callback:
+            return
+        try:
+            callback(item['chave'], valor)
+        except Exception as e:
+            with self._cond:
+                self.estatisticas['erros_ao_concluir'] += 1
+            print(f"\n⚠️ Erro ao processar o resultado de {item['url']}: {e}")
+
+    def _trabalhador(self, processar, ao_concluir, ao_falhar):
+        while True:
+            item = self._proximo()
+            if item is None:
+                return
+            self._balde(_host(item['url'])).adquirir()
+            try:
+                resultado = processar(item['url'])
+            except Exception as e:
+                if self._concluir(item, erro=e):
+                    self._avisar(ao_falhar, item, e)
+                continue
+            self._concluir(item, resultado=resultado)
+            self._avisar(ao_concluir, item, resultado)
+
+    def _rodar(self, processadores, ao_concluir, ao_falhar):
+        threads = [
+            threading.Thread(target=self._trabalhador, args=(p, ao_concluir, ao_falhar), daemon=True)
+            for p in processadores
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def executar(self, processadores, ao_concluir=None, ao_falhar=None):
+        """
+        Processa a fila com um thread por processador (callable url -> resultado).
+        Retorna {chave: resultado}; o que falhou de vez fica em self.falhas.
+        ao_concluir(chave, resultado) e ao_falhar(chave, erro) rodam nos threads dos workers.
+        """
+        self._rodar(processadores, ao_concluir, ao_falhar)
+
+        if self.repasse_final and self.falhas:
+            print(f"\n🔁 Repasse final: {len(self.falhas)} URL(s) com falha voltam para a fila")
+            time.sleep(self.pausa_repasse)
+            with self._cond:
+                pendentes = list(self.falhas.values())
+                self.falhas = {}
+                self._ultima_passagem = True
+                for item in pendentes:
+                    item['tentativa'] = self.max_tentativas - 1  # uma última tentativa
+                    heapq.heappush(self._prontos, (item['prioridade'], next(self._seq), item))
+            recuperadas_antes = self.estatisticas['sucessos']
+            self._rodar(processadores, ao_concluir, ao_falhar)
+            self.estatisticas['recuperadas_no_repasse'] = self.estatisticas['sucessos'] - recuperadas_antes
+
+        self.estatisticas['falhas'] = len(self.falhas)
+        return self.resultados
@@ -0,0 +1,40 @@
+"""
+Configuração do gunicorn com o estoque compartilhado entre os workers
+    gunicorn -c gunicorn.conf.py api_estoque:app
+
+O master publica estoque_camoes.json como snapshot binário em ESTOQUE_COMPARTILHADO
+(padrão: /dev/shm/camoes_estoque), junto com o corpo pronto de /api/estoque, e republica
+quando o arquivo muda; os workers mapeiam/enviam os mesmos arquivos em vez de cada um
+carregar e serializar o estoque inteiro (só os índices de busca/filtro são de cada worker)
+"""
+
+import multiprocessing
+import os
+
+import memoria_compartilhada
+
+ARQUIVO_ESTOQUE = os.environ.get('ESTOQUE_FILE', 'estoque_camoes.json')
+
+# Herdado pelos workers (fork do master): api_estoque entra no modo compartilhado
+DIRETORIO = os.environ.setdefault('ESTOQUE_COMPARTILHADO', memoria_compartilhada.DIRETORIO_PADRAO)
+
+bind = os.environ.get('API_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('API_WORKERS', multiprocessing.cpu_count()))
+timeout = 30
+
+
+def on_starting(server):
+    """Primeira geração publicada antes de subir os workers"""
+    try:
+        geracao = memoria_compartilhada.publicar(ARQUIVO_ESTOQUE, DIRETORIO)
+    except (OSError, ValueError) as e:
+        # Sem estoque ainda: os workers respondem vazio até o observador publicar
+        server.log.warning(f"Estoque não publicado ({e})")
+        return
+    server.log.info(f"Estoque publicado em {DIRETORIO} (geração {geracao})")
+
+
+def when_ready(server):
+    """Republica sempre que o scraper troca o JSON"""
+    intervalo = int(os.environ.get('ESTOQUE_VERIFICAR_MS', '500')) / 1000
+    memoria_compartilhada.iniciar_observador(ARQUIVO_ESTOQUE, DIRETORIO, intervalo)
@@ -0,0 +1,208 @@
+"""
+Histórico de preço e permanência no estoque
+Log append-only (NDJSON) só com as mudanças por código + índice pré-calculado por veículo,
+para responder histórico e dias em estoque sem reler snapshots antigos
+"""
+
+from datetime import datetime
+import argparse
+import json
+import os
+import statistics
+
+from indices_estoque import preco_para_centavos
+from saida_estoque import escrita_atomica
+
+ARQUIVO_LOG = 'historico_estoque.ndjson'
+ARQUIVO_INDICE = 'historico_indice.json'
+FORMATO_DATA = '%Y-%m-%d %H:%M:%S'
+
+# Tipos de evento gravados no log
+ENTRADA = 'entrada'   # primeira vez no estoque
+RETORNO = 'retorno'   # voltou depois de ter saído
+PRECO = 'preco'       # preço mudou
+SAIDA = 'saida'       # sumiu do estoque (vendido/retirado)
+
+
+def _indice_vazio():
+    return {'tamanho_log': 0, 'ultima_execucao': None, 'veiculos': {}}
+
+
+def carregar_indice(caminho=ARQUIVO_INDICE):
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return _indice_vazio()
+
+
+def _gravar_atomico(caminho, dados):
+    """Grava em arquivo temporário, fsync e rename: leitores veem o índice antigo ou o novo"""
+    with escrita_atomica(caminho) as f:
+        json.dump(dados, f, ensure_ascii=False)
+
+
+def _dias(inicio, fim):
+    delta = datetime.strptime(fim, FORMATO_DATA) - datetime.strptime(inicio, FORMATO_DATA)
+    return delta.total_seconds() / 86400
+
+
+def registrar_execucao(veiculos, momento=None, log=ARQUIVO_LOG, indice=ARQUIVO_INDICE):
+    """
+    Compara o estoque atual com o estado do índice e acrescenta ao log só as mudanças
+    (entrada, retorno, preço, saída). Retorna a contagem por tipo de evento.
+    """
+    momento = momento or datetime.now().strftime(FORMATO_DATA)
+    dados = carregar_indice(indice)
+    registros = dados['veiculos']
+
+    # Eventos gravados depois do último índice salvo (execução interrompida) são descartados
+    if os.path.exists(log) and os.path.getsize(log) > dados['tamanho_log']:
+        with open(log, 'r+b') as f:
+            f.truncate(dados['tamanho_log'])
+
+    atuais = {}
+    for v in veiculos:
+        codigo = v.get('codigo')
+        if codigo and not codigo.startswith('CAMOES_'):  # CAMOES_<n> é posição na página, não código estável
+            atuais.setdefault(codigo, v)
+
+    eventos = []
+    for codigo, v in atuais.items():
+        preco = preco_para_centavos(v.get('preco'))
+        registro = registros.get(codigo)
+        if registro is None:
+            eventos.append({'codigo': codigo, 'tipo': ENTRADA, 'preco': preco, 'preco_texto': v.get('preco'),
+                            'modelo': v.get('modelo'), 'km': v.get('km')})
+        elif registro['saida'] is not None:
+            eventos.append({'codigo': codigo, 'tipo': RETORNO, 'preco': preco, 'preco_texto': v.get('preco')})
+        elif preco is not None and preco != registro['preco_atual']:
+            eventos.append({'codigo': codigo, 'tipo': PRECO, 'preco': preco, 'preco_texto': v.get('preco'),
+                            'preco_anterior': registro['preco_atual']})
+    for codigo, registro in registros.items():
+        if registro['saida'] is None and codigo not in atuais:
+            eventos.append({'codigo': codigo, 'tipo': SAIDA, 'preco': registro['preco_atual']})
+
+    contagem = {ENTRADA: 0, RETORNO: 0, PRECO: 0, SAIDA: 0}
+    with open(log, 'ab') as f:
+        for evento in eventos:
+            evento['data'] = momento
+            offset = f.tell()
+            f.write((json.dumps(evento, ensure_ascii=False) + '\n').encode('utf-8'))
+            _aplicar_evento(registros, evento, offset)
+            contagem[evento['tipo']] += 1
+        f.flush()
+        os.fsync(f.fileno())
+        dados['tamanho_log'] = f.tell()
+
+    dados['ultima_execucao'] = momento
+    _gravar_atomico(indice, dados)
+    return contagem
+
+
+def _aplicar_evento(registros, evento, offset):
+    """Atualiza o registro pré-calculado do veículo com um evento do log"""
+    codigo, tipo, data = evento['codigo'], evento['tipo'], evento['data']
+    if tipo == ENTRADA:
+        registros[codigo] = {
+            'modelo': evento.get('modelo'),
+            'primeira_vez': data,
+            'ultima_entrada': data,
+            'saida': None,
+            'dias_anteriores': 0.0,  # dias em estoque de passagens anteriores (antes de um retorno)
+            'preco_inicial': evento['preco'],
+            'preco_atual': evento['preco'],
+            'preco_minimo': evento['preco'],
+            'mudancas_preco': 0,
+            'eventos': [],
+        }
+    registro = registros[codigo]
+    if tipo == RETORNO:
+        registro['dias_anteriores'] += _dias(registro['ultima_entrada'], registro['saida'])
+        registro['ultima_entrada'] = data
+        registro['saida'] = None
+    if tipo in (RETORNO, PRECO) and evento['preco'] is not None:
+        if evento['preco'] != registro['preco_atual']:
+            registro['mudancas_preco'] += 1
+        registro['preco_atual'] = evento['preco']
+        if registro['preco_minimo'] is None or evento['preco'] < registro['preco_minimo']:
+            registro['preco_minimo'] = evento['preco']
+    if tipo == SAIDA:
+        registro['saida'] = data
+    registro['eventos'].append(offset)
+
+
+# ==== CONSULTAS ====
+
+def dias_em_estoque(registro, agora=None):
+    """Dias no estoque somando todas as passagens (até agora, se ainda está à venda)"""
+    fim = registro['saida'] or agora or datetime.now().strftime(FORMATO_DATA)
+    return registro['dias_anteriores'] + _dias(registro['ultima_entrada'], fim)
+
+
+def eventos_veiculo(registro, log=ARQUIVO_LOG):
+    """Eventos do veículo lidos direto nos offsets do log (sem percorrer o arquivo)"""
+    eventos = []
+    with open(log, 'rb') as f:
+        for offset in registro['eventos']:
+            f.seek(offset)
+            eventos.append(json.loads(f.readline()))
+    return eventos
+
+
+def historico_veiculo(indice, codigo, log=ARQUIVO_LOG, agora=None):
+    """Resumo + eventos de um código; None se nunca foi visto"""
+    registro = indice['veiculos'].get(codigo)
+    if registro is None:
+        return None
+    resumo = {k: v for k, v in registro.items() if k not in ('eventos', 'dias_anteriores')}
+    resumo['codigo'] = codigo
+    resumo['em_estoque'] = registro['saida'] is None
+    resumo['dias_em_estoque'] = round(dias_em_estoque(registro, agora), 1)
+    if registro['preco_inicial'] and registro['preco_atual'] is not None:
+        resumo['variacao_preco'] = registro['preco_atual'] - registro['preco_inicial']
+    resumo['eventos'] = eventos_veiculo(registro, log)
+    return resumo
+
+
+def _estatisticas(dias):
+    if not dias:
+        return {'total': 0, 'media_dias': None, 'mediana_dias': None, 'max_dias': None}
+    return {
+        'total': len(dias),
+        'media_dias': round(statistics.fmean(dias), 1),
+        'mediana_dias': round(statistics.median(dias), 1),
+        'max_dias': round(max(dias), 1),
+    }
+
+
+def resumo_permanencia(indice, agora=None):
+    """Dias em estoque dos veículos à venda e dos que já saíram, e quantos tiveram redução de preço"""
+    agora = agora or datetime.now().strftime(FORMATO_DATA)
+    em_estoque, vendidos, com_reducao = [], [], 0
+    for registro in indice['veiculos'].values():
+        (vendidos if registro['saida'] else em_estoque).append(dias_em_estoque(registro, agora))
+        if (registro['preco_inicial'] is not None and registro['preco_atual'] is not None
+                and registro['preco_atual'] < registro['preco_inicial']):
+            com_reducao += 1
+    return {
+        'ultima_execucao': indice['ultima_execucao'],
+        'em_estoque': _estatisticas(em_estoque),
+        'vendidos': _estatisticas(vendidos),
+        'com_reducao_de_preco': com_reducao,
+    }
+
+
+def main(argv=None):
+    """Registra um estoque JSON já salvo no histórico: python historico_estoque.py estoque_camoes.json"""
+    parser = argparse.ArgumentParser(description="Registra um estoque JSON no histórico de preços")
+    parser.add_argument('arquivo', nargs='?', default='estoque_camoes.json')
+    args = parser.parse_args(argv)
+    with open(args.arquivo, 'r', encoding='utf-8') as f:
+        estoque = json.load(f)
+    contagem = registrar_execucao(estoque['veiculos'], estoque.get('ultima_atualizacao'))
+    print(f"📈 Histórico atualizado: {contagem}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""
+Índices em memória do estoque para a API
+Construídos uma vez por snapshot carregado; as consultas não varrem a lista de veículos
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+import heapq
+import re
+import unicodedata
+
+CAMPOS_TEXTO = ('marca', 'modelo', 'versao')
+CAMPOS_CATEGORICOS = ('marca', 'cor', 'cambio', 'combustivel')
+# Campos lidos para montar os índices (o resto do veículo nunca é tocado)
+CAMPOS_INDEXADOS = tuple(dict.fromkeys(('codigo',) + CAMPOS_TEXTO + CAMPOS_CATEGORICOS + ('preco', 'km', 'ano')))
+COLUNAS_NUMERICAS = ('preco', 'km', 'ano_fabricacao', 'ano_modelo')
+SEM_VALOR = -1  # valor ausente/inválido nas colunas tipadas
+LIMIAR_SIMILARIDADE = 0.5  # similaridade mínima (Dice sobre trigramas) para um token casar com o termo
+
+# Ordenações aceitas pela API (prefixo '-' = decrescente) -> coluna tipada
+ORDENACOES = {'preco': 'preco', 'km': 'km', 'ano': 'ano_fabricacao'}
+
+
+# ==== NORMALIZAÇÃO DE CAMPOS NUMÉRICOS ====
+
+def preco_para_centavos(texto):
+    """'R$ 79.900,00' -> 7990000 (None se não houver número)"""
+    digitos = re.sub(r'[^\d,]', '', texto or '')
+    if not digitos:
+        return None
+    inteiro, _, centavos = digitos.partition(',')
+    if not inteiro:
+        return None
+    return int(inteiro) * 100 + int((centavos + '00')[:2])
+
+
+def km_para_inteiro(texto):
+    """'46.633' / '12.000 km' -> 46633 (None se não houver número)"""
+    digitos = re.sub(r'\D', '', texto or '')
+    return int(digitos) if digitos else None
+
+
+def ano_para_inteiros(texto):
+    """'2019/2020' -> (2019, 2020); '2024' -> (2024, 2024); None se inválido"""
+    anos = [int(a) for a in re.findall(r'\d{4}', texto or '')]
+    if not anos:
+        return None
+    return anos[0], anos[-1]
+
+
+def campos_por_veiculo(veiculos, campos):
+    """
+    Gera, por veículo, um dict só com `campos` (None se ausente). No snapshot binário lê
+    as colunas (valores(campo)) em vez de montar cada veículo inteiro
+    """
+    if hasattr(veiculos, 'valores'):
+        colunas = [veiculos.valores(campo) for campo in campos]
+    else:
+        colunas = [[v.get(campo) for v in veiculos] for campo in campos]
+    for valores in zip(*colunas):
+        yield dict(zip(campos, valores))
+
+
+def _valores_numericos(veiculo):
+    """Valores tipados do veículo na ordem de COLUNAS_NUMERICAS (None se ausente)"""
+    anos = ano_para_inteiros(veiculo.get('ano')) or (None, None)
+    return (preco_para_centavos(veiculo.get('preco')), km_para_inteiro(veiculo.get('km'))) + anos
+
+
+# ==== BITMAPS (int do Python: bit i = veículo na posição i) ====
+
+def bitmap_de(posicoes, total):
+    bits = bytearray((total + 7) // 8)
+    for pos in posicoes:
+        bits[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def posicoes_do_bitmap(bitmap):
+    """Posições com bit ligado, em ordem crescente"""
+    posicoes = []
+    while bitmap:
+        menor = bitmap & -bitmap
+        posicoes.append(menor.bit_length() - 1)
+        bitmap ^= menor
+    return posicoes
+
+
+# ==== CONSTRUÇÃO ====
+
+def normalizar(texto):
+    """Minúsculas sem acento; pontuação (exceto '.') vira espaço: 'CITROËN C4-Cactus' -> 'citroen c4 cactus'"""
+    sem_acento = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9.]+', ' ', sem_acento.lower()).strip()
+
+
+def tokenizar(texto):
+    return normalizar(texto).split()
+
+
+def trigramas(termo):
+    """Trigramas do termo com bordas marcadas ('  hb20 ' -> '  h', ' hb', 'hb2', 'b20', '20 ')"""
+    texto = f'  {termo} '
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def _tokens_busca(texto):
+    """Tokens normalizados + junções de tokens vizinhos ('hb 20' também vira 'hb20')"""
+    tokens = tokenizar(texto)
+    return tokens + [a + b for a, b in zip(tokens, tokens[1:])]
+
+
+def construir_indices(veiculos):
+    """
+    Índices de uma lista de veículos (posições = índices na lista):
+    - por_codigo: {codigo: posicao}
+    - tokens: {token normalizado: [posicoes]} sobre marca/modelo/versao
+    - trigramas: {trigrama: [tokens]} e trigramas_por_token: {token: quantidade} para a busca aproximada
+    - categorias: {campo: {valor normalizado: bitmap}} para marca/cor/cambio/combustivel
+    - colunas: {coluna: array('q')} com preço em centavos, km e anos (SEM_VALOR se ausente)
+    - ordenados: {coluna: (valores ordenados, posicoes na mesma ordem)} sobre as colunas
+    - ordens: {'preco' / '-preco'...: (posicoes na ordem, posto de cada posicao)}
+    """
+    total = len(veiculos)
+    por_codigo = {}
+    tokens = {}
+    categorias = {campo: {} for campo in CAMPOS_CATEGORICOS}
+    colunas = {coluna: array('q', bytes(8 * total)) for coluna in COLUNAS_NUMERICAS}
+
+    for pos, v in enumerate(campos_por_veiculo(veiculos, CAMPOS_INDEXADOS)):
+        codigo = v.get('codigo')
+        if codigo is not None and codigo not in por_codigo:
+            por_codigo[codigo] = pos
+
+        vistos = set()
+        for campo in CAMPOS_TEXTO:
+            for token in _tokens_busca(v.get(campo)):
+                if token not in vistos:
+                    vistos.add(token)
+                    tokens.setdefault(token, []).append(pos)
+
+        for campo in CAMPOS_CATEGORICOS:
+            categorias[campo].setdefault(normalizar(v.get(campo)), []).append(pos)
+
+        for coluna, valor in zip(COLUNAS_NUMERICAS, _valores_numericos(v)):
+            colunas[coluna][pos] = SEM_VALOR if valor is None else valor
+
+    for campo, valores in categorias.items():
+        for valor, posicoes in valores.items():
+            valores[valor] = bitmap_de(posicoes, total)
+
+    ordenados = {}
+    for coluna, valores in colunas.items():
+        posicoes = sorted((pos for pos in range(total) if valores[pos] != SEM_VALOR), key=valores.__getitem__)
+        ordenados[coluna] = (array('q', (valores[pos] for pos in posicoes)), array('q', posicoes))
+
+    trigramas_vocab = {}
+    trigramas_por_token = {}
+    for token in tokens:
+        grams = trigramas(token)
+        trigramas_por_token[token] = len(grams)
+        for gram in grams:
+            trigramas_vocab.setdefault(gram, []).append(token)
+
+    ordens = {}
+    for chave, coluna in ORDENACOES.items():
+        valores = colunas[coluna]
+        for sinal in (1, -1):
+            # Sem valor vai para o fim; empates mantêm a ordem da listagem
+            ordem = sorted(range(total), key=lambda pos: (valores[pos] == SEM_VALOR, sinal * valores[pos], pos))
+            posto = array('q', bytes(8 * total))
+            for i, pos in enumerate(ordem):
+                posto[pos] = i
+            ordens[chave if sinal == 1 else '-' + chave] = (array('q', ordem), posto)
+
+    return {
+        'total': total,
+        'todos': (1 << total) - 1,
+        'por_codigo': por_codigo,
+        'tokens': tokens,
+        'trigramas': trigramas_vocab,
+        'trigramas_por_token': trigramas_por_token,
+        'categorias': categorias,
+        'colunas': colunas,
+        'ordenados': ordenados,
+        'ordens': ordens,
+    }
+
+
+# ==== CONSULTAS ====
+
+def _uma_edicao(a, b):
+    """True se `a` vira `b` com no máximo uma inserção, remoção, troca ou transposição"""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    i = 0
+    while i < min(len(a), len(b)) and a[i] == b[i]:
+        i += 1
+    return (a[i + 1:] == b[i + 1:]                                  # troca
+            or a[i + 1:] == b[i:] or a[i:] == b[i + 1:]             # remoção / inserção
+            or (a[i:i + 2] == b[i:i + 2][::-1] and a[i + 2:] == b[i + 2:]))  # transposição
+
+
+def _similaridade(termo, token, comuns, tamanho_termo, indices, aproximado):
+    if token == termo:
+        return 1.0
+    if token.startswith(termo):
+        return 0.95
+    if termo in token:
+        return 0.9
+    if not aproximado:
+        return 0.0
+    if len(termo) >= 4 and _uma_edicao(termo, token):
+        return 0.8
+    return 2 * comuns / (tamanho_termo + indices['trigramas_por_token'][token])
+
+
+def _pontuar_termo(indices, termo, aproximado=True):
+    """
+    {posicao: melhor similaridade} dos veículos com algum token parecido com `termo`.
+    Números ('1.0', '2020') e termos com aproximado=False só casam por prefixo/trecho.
+    """
+    aproximado = aproximado and not termo.replace('.', '').isdigit()
+    grams = trigramas(termo)
+    comuns = {}
+    for gram in grams:
+        for token in indices['trigramas'].get(gram, ()):
+            comuns[token] = comuns.get(token, 0) + 1
+    if len(termo) < 3:
+        # Com as bordas, os trigramas de um termo curto só cobrem início/fim do token ('b2' em 'hb20' não):
+        # varre o vocabulário atrás do trecho
+        for token in indices['tokens']:
+            if termo in token:
+                comuns.setdefault(token, 0)
+
+    pontos = {}
+    for token, quantidade in comuns.items():
+        similaridade = _similaridade(termo, token, quantidade, len(grams), indices, aproximado)
+        if similaridade < LIMIAR_SIMILARIDADE:
+            continue
+        for pos in indices['tokens'][token]:
+            if similaridade > pontos.get(pos, 0.0):
+                pontos[pos] = similaridade
+    return pontos
+
+
+def _pontuar_termos(indices, termos, aproximado=True):
+    """Média das similaridades; o veículo precisa casar com todos os termos"""
+    total = None
+    for termo in termos:
+        pontos = _pontuar_termo(indices, termo, aproximado)
+        if total is None:
+            total = pontos
+        else:
+            total = {pos: total[pos] + s for pos, s in pontos.items() if pos in total}
+        if not total:
+            return {}
+    return {pos: s / len(termos) for pos, s in total.items()}
+
+
+def buscar_aproximado(indices, consulta):
+    """
+    Busca tolerante a acento, espaço e erro de digitação sobre marca/modelo/versao.
+    Retorna [(posicao, score)] do mais parecido para o menos (empate: ordem da listagem).
+    """
+    termos = tokenizar(consulta)
+    if not termos:
+        return []
+    pontos = _pontuar_termos(indices, termos)
+    if len(termos) > 1:
+        # Espaço não importa: 'hb 20' também é procurado (sem aproximação) como 'hb20'
+        for pos, s in _pontuar_termos(indices, [''.join(termos)], aproximado=False).items():
+            if s > pontos.get(pos, 0.0):
+                pontos[pos] = s
+    return sorted(((pos, round(s, 4)) for pos, s in pontos.items()), key=lambda item: (-item[1], item[0]))
+
+
+def bitmap_categoria(indices, campo, valor, exato=False):
+    """Bitmap dos veículos cujo campo é `valor` (ou o contém), sem acento/caixa; varre só os valores distintos"""
+    valor = normalizar(valor)
+    bitmap = 0
+    for existente, bits in indices['categorias'][campo].items():
+        if existente == valor or (not exato and valor in existente):
+            bitmap |= bits
+    return bitmap
+
+
+def bitmap_faixa(indices, coluna, minimo=None, maximo=None):
+    """Bitmap dos veículos com minimo <= coluna <= maximo (busca binária na coluna ordenada)"""
+    valores, posicoes = indices['ordenados'][coluna]
+    inicio = bisect_left(valores, minimo) if minimo is not None else 0
+    fim = bisect_right(valores, maximo) if maximo is not None else len(valores)
+    return bitmap_de(posicoes[inicio:fim], indices['total'])
+
+
+def ordenar(indices, posicoes, ordenacao, quantidade=None):
+    """
+    Posições na ordem pedida ('preco', '-ano'...) pelas ordens pré-calculadas.
+    Com `quantidade`, calcula só os primeiros (heap parcial em vez de ordenar tudo).
+    """
+    ordem, posto = indices['ordens'][ordenacao]
+    if len(posicoes) == indices['total']:
+        return list(ordem[:quantidade])
+    if quantidade is not None and quantidade < len(posicoes):
+        return heapq.nsmallest(quantidade, posicoes, key=posto.__getitem__)
+    return sorted(posicoes, key=posto.__getitem__)
@@ -0,0 +1,192 @@
+"""
+Snapshot compartilhado entre os workers do gunicorn
+Um único processo (o master, via gunicorn.conf.py) converte o JSON no snapshot binário de
+uma nova geração e só depois avança o contador de geração; os workers mapeiam o mesmo
+arquivo (páginas compartilhadas pelo SO, sem cópia por worker) e leem o contador, também
+mapeado em memória, a cada requisição: todos trocam de estoque assim que ele avança.
+O corpo de /api/estoque (e as variantes comprimidas) também é gravado uma vez por geração:
+os workers enviam os arquivos direto do cache de páginas em vez de cada um serializar o seu.
+Os índices de busca/filtro não são publicados: cada worker monta os seus no primeiro uso
+"""
+
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+
+from saida_estoque import escrita_atomica
+import snapshot_binario
+
+try:
+    import brotli  # opcional: pip install brotli
+except ImportError:
+    brotli = None
+
+DIRETORIO_PADRAO = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'camoes_estoque')
+ARQUIVO_GERACAO = 'geracao'
+GERACOES_MANTIDAS = 2  # gerações antigas mantidas no diretório (workers atrasados ainda podem abri-las)
+_CONTADOR = struct.Struct('<Q')
+# Sufixo do arquivo de cada variante do corpo de /api/estoque (Content-Encoding -> arquivo)
+SUFIXOS_VARIANTES = {'identity': 'json', 'gzip': 'json.gz', 'br': 'json.br'}
+
+
+def arquivo_geracao(diretorio, geracao, sufixo='bin'):
+    return os.path.join(diretorio, f'estoque.{geracao}.{sufixo}')
+
+
+def preparar_respostas(estoque):
+    """JSON do estoque completo serializado uma vez, com variantes comprimidas e ETag pelo conteúdo"""
+    corpo = json.dumps(dict(estoque, veiculos=list(estoque['veiculos'])), ensure_ascii=False).encode('utf-8')
+    variantes = {'identity': corpo, 'gzip': gzip.compress(corpo, compresslevel=6)}
+    if brotli is not None:
+        variantes['br'] = brotli.compress(corpo, quality=9)
+    # ETag pelo conteúdo: igual entre workers/reinícios enquanto o estoque não muda
+    return {'etag': hashlib.sha256(corpo).hexdigest()[:20], 'variantes': variantes}
+
+
+class ContadorGeracao:
+    """Lado dos workers: lê a geração atual direto da memória mapeada (sem syscall por requisição)"""
+
+    def __init__(self, diretorio=DIRETORIO_PADRAO):
+        self.diretorio = diretorio
+        self._mm = None
+
+    def geracao(self):
+        """Geração publicada (None enquanto nada foi publicado)"""
+        if self._mm is None:
+            try:
+                with open(os.path.join(self.diretorio, ARQUIVO_GERACAO), 'rb') as f:
+                    self._mm = mmap.mmap(f.fileno(), _CONTADOR.size, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                return None
+        return _CONTADOR.unpack_from(self._mm, 0)[0] or None
+
+    def abrir(self, geracao):
+        return snapshot_binario.abrir(arquivo_geracao(self.diretorio, geracao))
+
+    def respostas(self, geracao):
+        """
+        {'etag', 'arquivos': {codificação: arquivo aberto}} do corpo pré-serializado da geração.
+        Abrir junto com o binário, na troca de geração: arquivos abertos continuam legíveis
+        depois que _limpar apaga a geração (um worker atrasado nunca encontra o arquivo sumido)
+        """
+        with open(arquivo_geracao(self.diretorio, geracao, 'respostas'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        arquivos = {}
+        try:
+            for c in meta['variantes']:
+                arquivos[c] = open(arquivo_geracao(self.diretorio, geracao, SUFIXOS_VARIANTES[c]), 'rb')
+        except OSError:
+            for f in arquivos.values():
+                f.close()
+            raise
+        return {'etag': meta['etag'], 'arquivos': arquivos}
+
+
+def _limpar(diretorio, geracao):
+    """Apaga as gerações antigas (quem ainda tem o arquivo mapeado continua lendo normalmente)"""
+    for caminho in glob.glob(os.path.join(diretorio, 'estoque.*')):
+        m = re.search(r'estoque\.(\d+)\.[\w.]+$', caminho)
+        if m and int(m.group(1)) <= geracao - GERACOES_MANTIDAS:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+
+
+def _gravar_respostas(estoque, diretorio, geracao):
+    """Corpo de /api/estoque da geração: uma variante por arquivo + meta com ETag (gravada por último)"""
+    veiculos = estoque['veiculos']
+    preparada = preparar_respostas({
+        'ultima_atualizacao': estoque.get('ultima_atualizacao'),
+        'total_veiculos': estoque.get('total_veiculos', len(veiculos)),
+        'veiculos': veiculos,
+    })
+    for codificacao, corpo in preparada['variantes'].items():
+        with escrita_atomica(arquivo_geracao(diretorio, geracao, SUFIXOS_VARIANTES[codificacao]), binario=True) as f:
+            f.write(corpo)
+    with escrita_atomica(arquivo_geracao(diretorio, geracao, 'respostas')) as f:
+        json.dump({'etag': preparada['etag'], 'variantes': list(preparada['variantes'])}, f)
+
+
+def publicar(arquivo_json='estoque_camoes.json', diretorio=DIRETORIO_PADRAO):
+    """Publica o estoque (snapshot binário + corpo de /api/estoque) como nova geração; retorna o número"""
+    with open(arquivo_json, 'r', encoding='utf-8') as f:
+        estoque = json.load(f)
+
+    os.makedirs(diretorio, exist_ok=True)
+    caminho_contador = os.path.join(diretorio, ARQUIVO_GERACAO)
+    if not os.path.exists(caminho_contador):
+        with open(caminho_contador, 'wb') as f:
+            f.write(_CONTADOR.pack(0))
+
+    with open(caminho_contador, 'r+b') as f, mmap.mmap(f.fileno(), _CONTADOR.size) as contador:
+        geracao = _CONTADOR.unpack_from(contador, 0)[0] + 1
+        snapshot_binario.gerar(estoque, arquivo_geracao(diretorio, geracao))
+        _gravar_respostas(estoque, diretorio, geracao)
+        # Arquivos completos no lugar: só agora os workers passam a ver a nova geração
+        _CONTADOR.pack_into(contador, 0, geracao)
+        contador.flush()
+    _limpar(diretorio, geracao)
+    return geracao
+
+
+def _assinatura(caminho):
+    try:
+        st = os.stat(caminho)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+
+def observar(arquivo_json='estoque_camoes.json', diretorio=DIRETORIO_PADRAO, intervalo=0.5, parar=None):
+    """Republica sempre que o JSON muda (mtime/inode/tamanho); roda até `parar` (threading.Event) ser ligado"""
+    parar = parar or threading.Event()
+    publicada = _assinatura(arquivo_json)
+    while not parar.wait(intervalo):
+        assinatura = _assinatura(arquivo_json)
+        if assinatura is None or assinatura == publicada:
+            continue
+        try:
+            geracao = publicar(arquivo_json, diretorio)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Estoque não publicado ({e}); tentando de novo")
+            continue
+        publicada = assinatura
+        print(f"🔄 Estoque publicado para os workers: geração {geracao}")
+
+
+def iniciar_observador(arquivo_json='estoque_camoes.json', diretorio=DIRETORIO_PADRAO, intervalo=0.5):
+    """Observador em thread daemon (no master do gunicorn); retorna o Event que o encerra"""
+    parar = threading.Event()
+    threading.Thread(target=observar, args=(arquivo_json, diretorio, intervalo, parar), daemon=True).start()
+    return parar
+
+
+def main(argv=None):
+    """Publicação fora do gunicorn: python memoria_compartilhada.py --observar"""
+    parser = argparse.ArgumentParser(description="Publica o estoque para os workers da API (snapshot compartilhado)")
+    parser.add_argument('arquivo', nargs='?', default='estoque_camoes.json')
+    parser.add_argument('--diretorio', default=DIRETORIO_PADRAO,
+                        help=f"Diretório compartilhado com os workers (padrão: {DIRETORIO_PADRAO})")
+    parser.add_argument('--observar', action='store_true',
+                        help="Continua rodando e republica sempre que o arquivo muda")
+    parser.add_argument('--intervalo', type=float, default=0.5)
+    args = parser.parse_args(argv)
+    print(f"📤 Geração {publicar(args.arquivo, args.diretorio)} publicada em {args.diretorio}")
+    if args.observar:
+        try:
+            observar(args.arquivo, args.diretorio, args.intervalo)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Feed de mudanças entre execuções do scraper (veículos novos, removidos, preço/km alterados)
+Cada execução com mudanças vira uma entrada numerada em mudancas_estoque.json; a API
+serve as entradas a partir de uma versão e o diff pode ser enviado para um webhook (N8N)
+"""
+
+from datetime import datetime
+import json
+
+import requests
+
+from saida_estoque import escrita_atomica
+
+ARQUIVO_FEED = 'mudancas_estoque.json'
+MAX_ENTRADAS = 200  # entradas mantidas no arquivo (clientes mais atrasados refazem a carga completa)
+CAMPOS_COMPARADOS = ('preco', 'km')
+CAMPOS_RESUMO = ('codigo', 'modelo', 'ano', 'preco', 'km', 'link', 'foto_principal')
+
+
+def _codigo_estavel(codigo):
+    return bool(codigo) and not codigo.startswith('CAMOES_')  # CAMOES_<n> é posição na página
+
+
+def _resumo(veiculo):
+    return {campo: veiculo.get(campo) for campo in CAMPOS_RESUMO}
+
+
+def calcular_mudancas(anteriores, atuais):
+    """
+    Diff por código entre o snapshot anterior ({codigo: veiculo}) e a lista atual:
+    {'adicionados': [...], 'removidos': [...], 'alterados': [{codigo, modelo, mudancas: {campo: {de, para}}}]}
+    """
+    por_codigo = {}
+    for v in atuais:
+        if _codigo_estavel(v.get('codigo')):
+            por_codigo.setdefault(v['codigo'], v)
+
+    adicionados, alterados = [], []
+    for codigo, v in por_codigo.items():
+        anterior = anteriores.get(codigo)
+        if anterior is None:
+            adicionados.append(_resumo(v))
+            continue
+        mudancas = {
+            campo: {'de': anterior.get(campo), 'para': v.get(campo)}
+            for campo in CAMPOS_COMPARADOS if anterior.get(campo) != v.get(campo)
+        }
+        if mudancas:
+            alterados.append({'codigo': codigo, 'modelo': v.get('modelo'), 'mudancas': mudancas})
+    removidos = [_resumo(v) for codigo, v in anteriores.items()
+                 if _codigo_estavel(codigo) and codigo not in por_codigo]
+    return {'adicionados': adicionados, 'removidos': removidos, 'alterados': alterados}
+
+
+def tem_mudancas(diff):
+    return bool(diff['adicionados'] or diff['removidos'] or diff['alterados'])
+
+
+def carregar_feed(caminho=ARQUIVO_FEED):
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'versao_atual': 0, 'entradas': []}
+
+
+def registrar_mudancas(diff, caminho=ARQUIVO_FEED, momento=None):
+    """Acrescenta o diff ao feed com a próxima versão (grava por rename); retorna a entrada"""
+    feed = carregar_feed(caminho)
+    entrada = {
+        'versao': feed['versao_atual'] + 1,
+        'data': momento or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        **diff,
+    }
+    feed['versao_atual'] = entrada['versao']
+    feed['entradas'] = (feed['entradas'] + [entrada])[-MAX_ENTRADAS:]
+
+    with escrita_atomica(caminho) as f:
+        json.dump(feed, f, ensure_ascii=False)
+    return entrada
+
+
+def mudancas_desde(feed, desde=0):
+    """
+    Entradas com versão > desde. 'completo' é False quando o cliente está tão atrasado que
+    entradas intermediárias já saíram do arquivo (deve recarregar /api/estoque inteiro).
+    """
+    entradas = [e for e in feed['entradas'] if e['versao'] > desde]
+    mais_antiga = feed['entradas'][0]['versao'] if feed['entradas'] else feed['versao_atual'] + 1
+    return {
+        'versao_atual': feed['versao_atual'],
+        'desde': desde,
+        'completo': desde >= mais_antiga - 1,
+        'entradas': entradas,
+    }
+
+
+def enviar_webhook(url, entrada, timeout=10):
+    """POST da entrada do feed no webhook; falhas só são registradas (não interrompem o scraper)"""
+    try:
+        resposta = requests.post(url, json=entrada, timeout=timeout)
+        resposta.raise_for_status()
+    except requests.RequestException as e:
+        print(f"⚠️ Webhook de mudanças falhou ({e})")
+        return False
+    print(f"📨 Mudanças (versão {entrada['versao']}) enviadas para o webhook")
+    return True
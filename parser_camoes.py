@@ -0,0 +1,413 @@
+"""
+Parser HTML (lxml) do estoque Camões Automóveis
+Mesmos seletores do scraper Selenium, aplicados ao HTML estático
+"""
+
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+from lxml import html as lxml_html
+
+DOMINIO = "https://camoesmultimarcas.com.br"
+
+# Incrementar ao mudar seletores/regras: invalida resultados guardados no cache de páginas
+VERSAO_PARSER = 1
+
+COMBUSTIVEIS = ['FLEX', 'GASOLINA', 'DIESEL', 'ETANOL', 'ELÉTRICO', 'HÍBRIDO']
+
+# Tags que quebram linha no texto renderizado (aproxima o .text do Selenium)
+_TAGS_BLOCO = {
+    'br', 'div', 'p', 'li', 'ul', 'ol', 'tr', 'table', 'section',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+}
+
+
+def _classe(*nomes):
+    """Predicado XPath equivalente ao seletor CSS .classe1.classe2"""
+    return ' and '.join(
+        f"contains(concat(' ', normalize-space(@class), ' '), ' {nome} ')" for nome in nomes
+    )
+
+
+def _texto(elemento):
+    """Texto de um elemento com espaços normalizados (uma linha)"""
+    return ' '.join(elemento.text_content().split())
+
+
+def _texto_visivel(elemento):
+    """Texto de um elemento preservando as quebras de linha de blocos e <br>"""
+    partes = []
+    # Espaços e quebras do código-fonte contam como um espaço (como no innerText)
+    espacos = re.compile(r'\s+')
+
+    def visitar(no):
+        if no.tag in _TAGS_BLOCO:
+            partes.append('\n')
+        if no.text:
+            partes.append(espacos.sub(' ', no.text))
+        for filho in no:
+            if isinstance(filho.tag, str) and filho.tag not in ('script', 'style'):
+                visitar(filho)
+            if filho.tail:
+                partes.append(espacos.sub(' ', filho.tail))
+        if no.tag in _TAGS_BLOCO:
+            partes.append('\n')
+
+    visitar(elemento)
+    linhas = (' '.join(linha.split()) for linha in ''.join(partes).split('\n'))
+    return '\n'.join(linha for linha in linhas if linha)
+
+
+def _primeiro(elemento, xpath):
+    """Primeiro resultado de um XPath ou None"""
+    encontrados = elemento.xpath(xpath)
+    return encontrados[0] if encontrados else None
+
+
+def _documento(html, base_url):
+    """Faz o parse do HTML e resolve links relativos (como o get_attribute do Selenium)"""
+    doc = lxml_html.fromstring(html)
+    doc.make_links_absolute(base_url, resolve_base_href=True)
+    return doc
+
+
+# ==== LISTAGEM ====
+
+def cards_brutos(html, base_url=DOMINIO + "/multipla"):
+    """
+    Extrai os campos brutos de cada card 'carro col-md-12' da listagem.
+    Retorna uma lista de dicts no formato aceito por montar_veiculo.
+    """
+    doc = _documento(html, base_url)
+    return [_card_bruto(card) for card in doc.xpath("//div[contains(@class, 'carro col-md-12')]")]
+
+
+def _card_bruto(card):
+    """Campos brutos de um card (None quando o elemento não existe)"""
+    link = _primeiro(card, f".//div[{_classe('carro-img')}]//a")
+    titulo = _primeiro(card, ".//h2//a")
+    img_alt = _primeiro(card, f".//img[{_classe('lazy')} or {_classe('img-responsive')}]")
+    preco = _primeiro(card, f".//h3[{_classe('preco')}]")
+    valor = _primeiro(card, ".//span[@id='valor_veic']")
+    ano = _primeiro(card, f".//h2//span[{_classe('grey-text', 'text-darken-2')}]")
+    km = _primeiro(card, f".//span[{_classe('resumo', 'km')}]")
+    cambio = _primeiro(card, f".//span[{_classe('resumo', 'cambio34')}]")
+    img = _primeiro(card, f".//div[{_classe('carro-img')}]//img")
+
+    return {
+        'href': link.get('href') if link is not None else None,
+        'titulo': _texto(titulo) if titulo is not None else None,
+        'img_alt': (img_alt.get('alt') or '') if img_alt is not None else None,
+        'preco': _texto(preco) if preco is not None else None,
+        'valor': _texto(valor) if valor is not None else None,
+        'ano': _texto(ano) if ano is not None else None,
+        'resumos': [_texto(s) for s in card.xpath(f".//span[{_classe('resumo', 'black-tx')}]")],
+        'km': _texto(km) if km is not None else None,
+        'cambio': _texto(cambio) if cambio is not None else None,
+        'foto': (img.get('data-src') or img.get('src')) if img is not None else None,
+    }
+
+
+def montar_veiculo(bruto, index):
+    """
+    Monta o dict do veículo a partir dos campos brutos de um card.
+    Mesmas regras de CamoesEstoqueFinal._extrair_dados_veiculo; None se faltar modelo ou preço.
+    """
+    dados = {'data_scraping': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+    href = bruto.get('href')
+
+    # ==== CÓDIGO/ID ====
+    match = re.search(r'-(\d+)\.html$', href or '')
+    dados['codigo'] = match.group(1) if match else f'CAMOES_{index}'
+
+    # ==== MODELO/TÍTULO ====
+    if bruto.get('titulo') is not None:
+        partes = bruto['titulo'].strip().split()
+        if partes and partes[0].isdigit() and len(partes[0]) == 4:
+            dados['modelo'] = ' '.join(partes[1:])
+        else:
+            dados['modelo'] = ' '.join(partes)
+        partes_modelo = dados['modelo'].split()
+        dados['marca'] = partes_modelo[0] if partes_modelo else ''
+        dados['versao'] = ' '.join(partes_modelo[2:]) if len(partes_modelo) > 2 else ''
+    elif bruto.get('img_alt') is not None:
+        dados['modelo'] = bruto['img_alt']
+        partes = dados['modelo'].split()
+        dados['marca'] = partes[0] if partes else ''
+        dados['versao'] = ''
+    else:
+        return None  # Sem modelo, pula
+
+    # ==== PREÇO ====
+    if bruto.get('preco') is not None:
+        dados['preco'] = bruto['preco'].strip().replace('\n', ' ').replace('  ', ' ')
+    elif bruto.get('valor') is not None:
+        dados['preco'] = f"R$ {bruto['valor'].strip()}"
+    else:
+        dados['preco'] = ''
+
+    if not dados.get('modelo') or not dados.get('preco'):
+        return None
+
+    resumos = bruto.get('resumos') or []
+
+    # ==== ANO ====
+    if bruto.get('ano') is not None:
+        dados['ano'] = bruto['ano'].strip()
+    elif resumos and resumos[0].strip().isdigit() and len(resumos[0].strip()) == 4:
+        dados['ano'] = resumos[0].strip()
+    else:
+        dados['ano'] = ''
+
+    # ==== QUILOMETRAGEM / CÂMBIO ====
+    dados['km'] = (bruto.get('km') or '').strip()
+    dados['cambio'] = (bruto.get('cambio') or '').strip()
+
+    # ==== COMBUSTÍVEL ====
+    dados['combustivel'] = ''
+    for texto in resumos:
+        if texto.strip().upper() in COMBUSTIVEIS:
+            dados['combustivel'] = texto.strip().upper()
+            break
+
+    # ==== COR ==== (apenas na página de detalhes)
+    dados['cor'] = ''
+
+    # ==== FOTO ====
+    foto = bruto.get('foto')
+    if foto and 'lazy.gif' not in foto.lower() and 'placeholder' not in foto.lower():
+        dados['foto_principal'] = foto
+    else:
+        dados['foto_principal'] = ''
+
+    # ==== LINK ====
+    if href and not href.startswith('javascript:'):
+        dados['link'] = href if href.startswith('http') else f"{DOMINIO}{href}"
+    else:
+        dados['link'] = ''
+
+    return dados
+
+
+def parse_listagem(html, base_url=DOMINIO + "/multipla"):
+    """
+    Extrai os veículos de uma página de listagem.
+    Retorna (registros, total_cards) com registros = [(idx, dados), ...].
+    """
+    brutos = cards_brutos(html, base_url)
+    registros = []
+    for idx, bruto in enumerate(brutos, 1):
+        dados = montar_veiculo(bruto, idx)
+        if dados:
+            registros.append((idx, dados))
+    return registros, len(brutos)
+
+
+# ==== PÁGINA DE DETALHES ====
+
+def detalhes_brutos(html, base_url=DOMINIO):
+    """Extrai os campos brutos de uma página de detalhes (formato de montar_detalhes)"""
+    doc = _documento(html, base_url)
+    principal = _primeiro(doc, "//*[@id='veiculo_foto']//img")
+    itens = []
+    for item in doc.xpath(f"//li[{_classe('rela-det5')}]"):
+        valor = _primeiro(item, f".//strong[{_classe('font-det03')}]")
+        itens.append({
+            'texto': _texto_visivel(item),
+            'valor': _texto(valor) if valor is not None else None,
+        })
+
+    return {
+        'thumbs': [img.get('ref') or img.get('src') for img in doc.xpath("//*[@id='SlideShowThumbs']//img")],
+        'foto_principal': principal.get('src') if principal is not None else None,
+        'itens': itens,
+        'blocos': [_texto_visivel(b) for b in doc.xpath(f"//div[{_classe('bloco')}]")],
+        'spoilers': [_texto_visivel(s) for s in doc.xpath(f"//div[{_classe('spoiler')}]")],
+    }
+
+
+def montar_detalhes(bruto):
+    """
+    Monta fotos/cor/detalhes/opcionais a partir dos campos brutos da página de detalhes.
+    Mesmas regras de CamoesEstoqueFinal._extrair_detalhes_veiculo.
+    """
+    detalhes = {'fotos': [], 'cor': '', 'detalhes': '', 'opcionais': []}
+
+    # 1. Fotos da galeria (atributo 'ref' contém o link da imagem grande)
+    for url_foto in bruto.get('thumbs') or []:
+        if url_foto and 'lazy.gif' not in url_foto:
+            detalhes['fotos'].append(url_foto)
+    if not detalhes['fotos'] and bruto.get('foto_principal'):
+        detalhes['fotos'].append(bruto['foto_principal'])
+
+    # 2. Cor (primeiro li.rela-det5 que menciona "Cor")
+    for item in bruto.get('itens') or []:
+        if "Cor" in (item.get('texto') or ''):
+            if item.get('valor') is not None:
+                detalhes['cor'] = item['valor'].strip()
+            break
+
+    # 3. Detalhes (div.bloco), sem repetições nem blocos contidos em outros
+    textos_detalhes = []
+    for texto in bruto.get('blocos') or []:
+        texto = (texto or '').strip()
+        if texto.startswith("Detalhes"):
+            texto = texto.replace("Detalhes", "", 1).strip()
+        if not texto or texto in textos_detalhes:
+            continue
+        if any(texto in t_existente for t_existente in textos_detalhes):
+            continue
+        for i, t_existente in enumerate(textos_detalhes):
+            if t_existente in texto:
+                textos_detalhes[i] = texto
+                break
+        else:
+            textos_detalhes.append(texto)
+    detalhes['detalhes'] = ' | '.join(textos_detalhes) if textos_detalhes else ''
+
+    # 4. Opcionais (div.spoiler, separados por vírgula)
+    lista_opcionais = []
+    for texto_spoiler in bruto.get('spoilers') or []:
+        texto_spoiler = (texto_spoiler or '').strip()
+        for item in texto_spoiler.split(',') if texto_spoiler else []:
+            item_limpo = item.strip()
+            # Remover o cabeçalho "Opcionais" que pode vir no primeiro item
+            if '\n' in item_limpo:
+                item_limpo = item_limpo.split('\n')[-1].strip()
+            if item_limpo and item_limpo not in lista_opcionais:
+                lista_opcionais.append(item_limpo)
+    detalhes['opcionais'] = lista_opcionais
+
+    return detalhes
+
+
+def parse_detalhes(html, base_url=DOMINIO):
+    """Extrai fotos, cor, detalhes e opcionais de uma página de detalhes"""
+    return montar_detalhes(detalhes_brutos(html, base_url))
+
+
+def aplicar_detalhes(dados, detalhes):
+    """Junta fotos/cor/detalhes/opcionais da página interna ao registro da listagem"""
+    if detalhes is not None:
+        dados['fotos'] = detalhes['fotos']
+        if detalhes['cor']:
+            dados['cor'] = detalhes['cor']
+        dados['detalhes'] = detalhes.get('detalhes', '')
+        dados['opcionais'] = detalhes.get('opcionais', [])
+    else:
+        dados['fotos'] = []
+        dados['detalhes'] = ''
+        dados['opcionais'] = []
+    return dados
+
+
+# ==== ARQUIVO DE HTML POR EXECUÇÃO ====
+
+MANIFESTO = 'manifesto.json'
+
+
+class ArquivoExecucao:
+    """
+    Guarda o HTML bruto de uma execução do scraper para reprocessamento offline:
+    <raiz>/<AAAAMMDD_HHMMSS>/listagem.html, detalhes/*.html e manifesto.json
+    """
+
+    def __init__(self, raiz):
+        self.diretorio = os.path.join(raiz, datetime.now().strftime('%Y%m%d_%H%M%S'))
+        os.makedirs(os.path.join(self.diretorio, 'detalhes'), exist_ok=True)
+        self.manifesto = {
+            'inicio': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'base_url': None,
+            'listagem': None,
+            'detalhes': {},
+        }
+
+    def _gravar(self, relativo, html):
+        with open(os.path.join(self.diretorio, relativo), 'w', encoding='utf-8') as f:
+            f.write(html)
+
+    def salvar_listagem(self, html, base_url):
+        self._gravar('listagem.html', html)
+        self.manifesto['base_url'] = base_url
+        self.manifesto['listagem'] = 'listagem.html'
+
+    def salvar_detalhe(self, link, html):
+        # Nome pelo código do veículo; hash do link se a URL não tiver código
+        match = re.search(r'-(\d+)\.html$', link)
+        nome = match.group(1) if match else hashlib.md5(link.encode('utf-8')).hexdigest()[:12]
+        relativo = os.path.join('detalhes', f'{nome}.html')
+        self._gravar(relativo, html)
+        self.manifesto['detalhes'][link] = relativo
+
+    def fechar(self):
+        """Grava o manifesto (chamado no fim da execução)"""
+        with open(os.path.join(self.diretorio, MANIFESTO), 'w', encoding='utf-8') as f:
+            json.dump(self.manifesto, f, ensure_ascii=False, indent=2)
+        print(f"🗄️ HTML da execução arquivado em {self.diretorio}")
+
+
+def _parse_detalhes_arquivo(tarefa):
+    """Worker do pool de processos: (link, caminho) -> (link, detalhes)"""
+    link, caminho = tarefa
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return link, parse_detalhes(f.read(), link)
+
+
+def reprocessar_execucao(diretorio, processos=None):
+    """
+    Refaz a extração de uma execução arquivada sem acessar o site.
+    processos=N distribui as páginas de detalhes entre N processos.
+    Retorna a lista de veículos no mesmo formato de buscar_estoque.
+    """
+    with open(os.path.join(diretorio, MANIFESTO), 'r', encoding='utf-8') as f:
+        manifesto = json.load(f)
+
+    with open(os.path.join(diretorio, manifesto['listagem']), 'r', encoding='utf-8') as f:
+        registros, _ = parse_listagem(f.read(), manifesto['base_url'] or DOMINIO + "/multipla")
+
+    tarefas = [
+        (dados['link'], os.path.join(diretorio, manifesto['detalhes'][dados['link']]))
+        for _, dados in registros if dados.get('link') in manifesto['detalhes']
+    ]
+    if processos and processos > 1 and len(tarefas) > 1:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            detalhes_por_link = dict(executor.map(_parse_detalhes_arquivo, tarefas, chunksize=8))
+    else:
+        detalhes_por_link = dict(map(_parse_detalhes_arquivo, tarefas))
+
+    return [aplicar_detalhes(dados, detalhes_por_link.get(dados.get('link'))) for _, dados in registros]
+
+
+def main(argv=None):
+    """Reprocessa uma execução arquivada e grava o JSON do estoque"""
+    parser = argparse.ArgumentParser(description="Reprocessa o HTML arquivado de uma execução do scraper")
+    parser.add_argument('diretorio', help="Diretório da execução (ex: html_execucoes/20260302_054732)")
+    parser.add_argument('--processos', type=int, default=os.cpu_count(),
+                        help="Processos para as páginas de detalhes (padrão: núcleos da CPU)")
+    parser.add_argument('--saida', default='estoque_reprocessado.json', help="Arquivo JSON de saída")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    estoque = reprocessar_execucao(args.diretorio, args.processos)
+    duracao = time.perf_counter() - inicio
+
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump({
+            'ultima_atualizacao': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'total_veiculos': len(estoque),
+            'veiculos': estoque
+        }, f, ensure_ascii=False, indent=2)
+    print(f"✅ {len(estoque)} veículos reprocessados em {duracao * 1000:.0f} ms → {args.saida}")
+
+
+if __name__ == '__main__':
+    if sys.platform == 'win32':
+        sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+    main()
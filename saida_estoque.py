@@ -0,0 +1,114 @@
+"""
+Gravação segura dos arquivos de saída do scraper
+- escrita_atomica: arquivo temporário + fsync + rename (leitores nunca veem arquivo pela metade)
+- SaidaNDJSON: um veículo por linha assim que a página de detalhes termina; se a execução
+  cair, o .parcial fica no disco e a próxima execução reaproveita os detalhes já coletados
+"""
+
+from contextlib import contextmanager
+import json
+import os
+import threading
+
+SUFIXO_PARCIAL = '.parcial'
+SUFIXO_TEMPORARIO = '.tmp'
+
+
+def _fsync_diretorio(caminho):
+    """Garante que o rename foi para o disco (no Windows não há fsync de diretório)"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(caminho)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def escrita_atomica(caminho, newline=None, binario=False):
+    """
+    with escrita_atomica('estoque_camoes.json') as f: ...
+    Escreve em <caminho>.tmp e só troca pelo arquivo final se o bloco terminar sem erro
+    (binario=True abre em 'wb')
+    """
+    temporario = caminho + SUFIXO_TEMPORARIO
+    if binario:
+        f = open(temporario, 'wb')
+    else:
+        f = open(temporario, 'w', encoding='utf-8', newline=newline)
+    try:
+        yield f
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        os.replace(temporario, caminho)
+    except BaseException:
+        f.close()
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
+    _fsync_diretorio(caminho)
+
+
+class SaidaNDJSON:
+    """
+    Grava os veículos em NDJSON, um por linha, na ordem em que ficam prontos (a ordem da
+    listagem fica só no JSON/CSV finais). Durante a execução o arquivo é <arquivo>.parcial;
+    finalizar() faz fsync e rename para <arquivo>. Thread-safe (workers chamam concluir).
+    """
+
+    def __init__(self, arquivo, total):
+        self.arquivo = arquivo
+        self.parcial = arquivo + SUFIXO_PARCIAL
+        self.total = total
+        self.gravados = 0
+        self._lock = threading.Lock()
+        self._f = open(self.parcial, 'w', encoding='utf-8')
+
+    def concluir(self, veiculo):
+        """Grava a linha do veículo na hora (flush: sobrevive a uma queda do processo)"""
+        linha = json.dumps(veiculo, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._f.write(linha)
+            self._f.flush()
+            self.gravados += 1
+
+    def fechar(self):
+        """Fecha mantendo o .parcial (execução interrompida)"""
+        with self._lock:
+            if not self._f.closed:
+                self._f.flush()
+                os.fsync(self._f.fileno())
+                self._f.close()
+
+    def finalizar(self):
+        """Fecha e publica o NDJSON completo; falha se algum veículo não foi concluído"""
+        if self.gravados < self.total:
+            raise RuntimeError(f"NDJSON incompleto: {self.gravados} de {self.total} veículos gravados")
+        self.fechar()
+        os.replace(self.parcial, self.arquivo)
+        _fsync_diretorio(self.arquivo)
+
+
+def ler_ndjson(caminho):
+    """Veículos de um NDJSON, um por vez; uma última linha truncada (queda no meio da escrita) é ignorada"""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        for linha in f:
+            try:
+                yield json.loads(linha)
+            except ValueError:
+                return
+
+
+def recuperar_parcial(arquivo):
+    """
+    {codigo: veiculo} do <arquivo>.parcial deixado por uma execução interrompida ({} se não houver).
+    Veículos gravados sem fotos (página de detalhes falhou) ficam de fora para serem buscados de novo.
+    """
+    try:
+        return {v['codigo']: v for v in ler_ndjson(arquivo + SUFIXO_PARCIAL) if v.get('codigo') and v.get('fotos')}
+    except OSError:
+        return {}
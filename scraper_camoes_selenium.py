@@ -17,20 +17,249 @@ import time
 import re
 import sys
 import io
+import os
+import threading
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+import parser_camoes
+import armazenamento_sqlite
+import exportar_csv
+import historico_estoque
+import mudancas_estoque
+import saida_estoque
+import snapshot_binario
+from cache_paginas import CachePaginas
+from fronteira_camoes import FronteiraCrawl, PRIORIDADE_NOVO, PRIORIDADE_NORMAL
 
 # Configurar encoding UTF-8 para stdout (necessário no Windows)
 if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+HTTP_TIMEOUT = 15  # segundos por requisição no motor HTTP
+MOTORES = ('selenium', 'http')
+# Campos da listagem que, se mudarem, exigem rever a página de detalhes
+CAMPOS_INCREMENTAIS = ('preco', 'km', 'foto_principal')
+EXTRACOES = ('script', 'elementos')
+
+# Perfil enxuto do Chrome (bloquear_recursos=True)
+FLAGS_ENXUTAS = [
+    "--blink-settings=imagesEnabled=false",
+    "--disable-extensions",
+    "--disable-gpu",
+    "--mute-audio",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+    "--autoplay-policy=user-gesture-required",
+]
+
+# Padrões bloqueados via CDP Network.setBlockedURLs (só lemos data-src/ref do DOM)
+URLS_BLOQUEADAS = [
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.svg", "*.ico", "*.avif",
+    "*.mp4", "*.webm", "*.mp3", "*.ogg",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googleadservices.com*", "*googlesyndication.com*", "*facebook.net*",
+    "*facebook.com/tr*", "*connect.facebook.net*", "*hotjar.com*", "*clarity.ms*",
+    "*tiktok.com*", "*analytics.tiktok.com*", "*youtube.com*", "*ytimg.com*",
+]
+
+JS_TEMPO_CARREGAMENTO = """
+const nav = performance.getEntriesByType('navigation')[0];
+return nav ? Math.max(0, (nav.loadEventEnd || nav.domContentLoadedEventEnd) - nav.startTime) : null;
+"""
+
+JS_TOTAL_CARDS = "return document.querySelectorAll('div.carro').length;"
+JS_ESTADO_REDE = "return [document.readyState, performance.getEntriesByType('resource').length];"
+
+# Extração em uma única chamada execute_script: devolve os campos brutos de
+# todos os cards (mesmo formato de parser_camoes.cards_brutos)
+JS_CARDS = """
+const texto = el => el ? el.innerText : null;
+return Array.from(document.querySelectorAll('div'))
+    .filter(div => (div.getAttribute('class') || '').includes('carro col-md-12'))
+    .map(card => {
+        const link = card.querySelector('div.carro-img a');
+        const img = card.querySelector('div.carro-img img');
+        const imgAlt = card.querySelector('img.lazy, img.img-responsive');
+        return {
+            href: link ? link.href : null,
+            titulo: texto(card.querySelector('h2 a')),
+            img_alt: imgAlt ? (imgAlt.getAttribute('alt') || '') : null,
+            preco: texto(card.querySelector('h3.preco')),
+            valor: texto(card.querySelector('span#valor_veic')),
+            ano: texto(card.querySelector('h2 span.grey-text.text-darken-2')),
+            resumos: Array.from(card.querySelectorAll('span.resumo.black-tx')).map(s => s.innerText),
+            km: texto(card.querySelector('span.resumo.km')),
+            cambio: texto(card.querySelector('span.resumo.cambio34')),
+            foto: img ? (img.getAttribute('data-src') || img.src) : null,
+        };
+    });
+"""
+
+# Idem para a página de detalhes (formato de parser_camoes.detalhes_brutos)
+JS_DETALHES = """
+const principal = document.querySelector('#veiculo_foto img');
+return {
+    thumbs: Array.from(document.querySelectorAll('#SlideShowThumbs img'))
+        .map(img => img.getAttribute('ref') || img.src),
+    foto_principal: principal ? principal.src : null,
+    itens: Array.from(document.querySelectorAll('li.rela-det5')).map(li => {
+        const valor = li.querySelector('strong.font-det03');
+        return {texto: li.innerText, valor: valor ? valor.innerText : null};
+    }),
+    blocos: Array.from(document.querySelectorAll('div.bloco')).map(b => b.innerText),
+    spoilers: Array.from(document.querySelectorAll('div.spoiler')).map(s => s.innerText),
+};
+"""
+
+def _rss_arvore_proc(pid_raiz):
+    """Soma o RSS (bytes) de um processo e descendentes lendo /proc (Linux, sem psutil)"""
+    filhos = {}
+    rss = {}
+    tamanho_pagina = os.sysconf('SC_PAGE_SIZE')
+    for entrada in os.listdir('/proc'):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entrada}/stat') as f:
+                # O nome do processo pode ter espaços: o ppid vem logo após o ')'
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            with open(f'/proc/{entrada}/statm') as f:
+                rss[int(entrada)] = int(f.read().split()[1]) * tamanho_pagina
+        except (OSError, ValueError, IndexError):
+            continue
+        filhos.setdefault(ppid, []).append(int(entrada))
+    
+    total, pendentes = 0, [pid_raiz]
+    while pendentes:
+        pid = pendentes.pop()
+        total += rss.get(pid, 0)
+        pendentes.extend(filhos.get(pid, []))
+    return total
+
+
+def memoria_navegador_mb(driver):
+    """RSS em MB do chromedriver + processos do Chrome (None se não for possível medir)"""
+    try:
+        pid = driver.service.process.pid
+    except AttributeError:
+        return None
+    
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    
+    if psutil is not None:
+        try:
+            raiz = psutil.Process(pid)
+            processos = [raiz] + raiz.children(recursive=True)
+            total = 0
+            for proc in processos:
+                try:
+                    total += proc.memory_info().rss
+                except psutil.Error:
+                    pass
+            return total / (1024 * 1024)
+        except psutil.Error:
+            return None
+    
+    if os.path.isdir('/proc'):
+        return _rss_arvore_proc(pid) / (1024 * 1024)
+    return None
+
+
 class CamoesEstoqueFinal:
-    def __init__(self, headless=True):
+    def __init__(self, headless=True, detail_workers=1, motor='selenium', extracao='script',
+                 arquivar_html=None, incremental=False, snapshot_anterior='estoque_camoes.json',
+                 timeout_pagina=20, janela_scroll=1.5, timeout_scroll=60, janela_rede=0.5,
+                 timeout_detalhe=12, bloquear_recursos=False, medir=False, max_tentativas=3,
+                 cache_paginas=None, cache_max_mb=100, saida_ndjson='estoque_camoes.ndjson'):
         """
         Inicializa o scraper com Selenium
         headless=True roda sem abrir janela do navegador
+        detail_workers=N usa N navegadores (ou conexões HTTP) em paralelo para as páginas de detalhes
+        motor='http' baixa as páginas com requests + lxml e só abre o Chrome se
+        o HTML estático não tiver os cards de veículos
+        extracao='script' lê cada página com um único execute_script;
+        'elementos' usa find_element campo a campo (modo antigo)
+        arquivar_html='dir' guarda o HTML bruto de cada execução para reprocessar
+        offline com parser_camoes.reprocessar_execucao
+        incremental=True reaproveita fotos/cor/detalhes/opcionais do snapshot_anterior
+        para veículos cujo preço, km e foto principal não mudaram
+        
+        Esperas (segundos): timeout_pagina para o primeiro card aparecer;
+        janela_scroll sem cards novos encerra o scroll (timeout_scroll no total);
+        janela_rede sem requisições novas conta como rede ociosa;
+        timeout_detalhe por página de detalhes
+        
+        bloquear_recursos=True não baixa imagens, mídia, fontes nem rastreadores
+        (só usamos atributos do DOM) e usa flags enxutas do Chrome
+        medir=True registra bytes de rede, tempo de carregamento e memória do
+        navegador por execução (para comparar com e sem bloqueio)
+        max_tentativas: tentativas por página de detalhes antes do repasse final
+        cache_paginas='dir' (motor HTTP) guarda as páginas em disco, usa requisições
+        condicionais e não refaz o parse de páginas com o mesmo conteúdo
+        saida_ndjson='arquivo' grava cada veículo (NDJSON) assim que os detalhes ficam
+        prontos; se a execução cair, a próxima reaproveita o que ficou em arquivo.parcial
+        (None desliga)
         """
+        if motor not in MOTORES:
+            raise ValueError(f"Motor inválido: {motor} (use {', '.join(MOTORES)})")
+        if extracao not in EXTRACOES:
+            raise ValueError(f"Extração inválida: {extracao} (use {', '.join(EXTRACOES)})")
         self.base_url = "https://camoesmultimarcas.com.br/multipla"
         self.estoque = []
-        self.driver = self._iniciar_driver(headless)
+        self.headless = headless
+        self.detail_workers = max(1, int(detail_workers))
+        self.motor = motor
+        self.extracao = extracao
+        self.arquivar_html = arquivar_html
+        self.arquivo_html = None
+        self.incremental = incremental
+        self.snapshot_anterior = snapshot_anterior
+        self.saida_ndjson = saida_ndjson
+        self.estatisticas = {}
+        self.mudancas = None
+        self.timeout_pagina = timeout_pagina
+        self.janela_scroll = janela_scroll
+        self.timeout_scroll = timeout_scroll
+        self.janela_rede = janela_rede
+        self.timeout_detalhe = timeout_detalhe
+        self.bloquear_recursos = bloquear_recursos
+        self.medir = medir
+        self.max_tentativas = max_tentativas
+        self.cache = CachePaginas(cache_paginas, cache_max_mb) if cache_paginas and motor == 'http' else None
+        self._lock_metricas = threading.Lock()
+        self.session = self._iniciar_sessao() if motor == 'http' else None
+        self.driver = self._iniciar_driver(headless) if motor == 'selenium' else None
+    
+    def _iniciar_sessao(self):
+        """Sessão HTTP com pool de conexões reaproveitadas entre as páginas"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(10, self.detail_workers))
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept-Language': 'pt-BR,pt;q=0.9',
+        })
+        return session
+    
+    def _garantir_driver(self):
+        """Inicia o Chrome sob demanda (motor HTTP só abre o navegador no fallback)"""
+        if self.driver is None:
+            print("🌐 Iniciando navegador Chrome...")
+            self.driver = self._iniciar_driver(self.headless)
+        return self.driver
     
     def _iniciar_driver(self, headless):
         """Configura e inicia o Chrome WebDriver"""
@@ -40,13 +269,27 @@ class CamoesEstoqueFinal:
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--disable-dev-shm-usage")
         chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-        chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+        chrome_options.add_argument(f"--user-agent={USER_AGENT}")
         chrome_options.add_argument("--window-size=1920,1080")
         
         # Desabilitar detecção de automação
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option('useAutomationExtension', False)
         
+        if self.bloquear_recursos:
+            # Perfil enxuto: sem imagens nem serviços de fundo do Chrome
+            for flag in FLAGS_ENXUTAS:
+                chrome_options.add_argument(flag)
+            chrome_options.add_experimental_option("prefs", {
+                "profile.managed_default_content_settings.images": 2,
+                "profile.default_content_setting_values.notifications": 2,
+                "profile.default_content_setting_values.media_stream": 2,
+            })
+        
+        if self.medir:
+            # Log de performance do Chrome: bytes reais de cada resposta (inclusive cross-origin)
+            chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        
         # A partir do Selenium 4.6, o driver é gerenciado automaticamente
         # Não é mais necessário usar ChromeDriverManager().install()
         try:
@@ -55,97 +298,163 @@ class CamoesEstoqueFinal:
             # Fallback forçado caso o path precise ser explícito no ambiente
             driver = webdriver.Chrome(options=chrome_options)
         driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        self._aplicar_bloqueios(driver)
         
         return driver
     
+    def _aplicar_bloqueios(self, driver):
+        """Bloqueia via CDP as URLs de imagens, mídia, fontes e rastreadores na aba atual"""
+        if not self.bloquear_recursos:
+            return
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': URLS_BLOQUEADAS})
+        except Exception as e:
+            print(f"⚠️ Não foi possível bloquear recursos via CDP: {e}")
+    
+    def _registrar_pagina(self, bytes_rede, carregamento_ms):
+        """Acumula as métricas de uma página carregada (thread-safe)"""
+        with self._lock_metricas:
+            self.estatisticas['paginas'] = self.estatisticas.get('paginas', 0) + 1
+            self.estatisticas['bytes_rede'] = self.estatisticas.get('bytes_rede', 0) + bytes_rede
+            if carregamento_ms is not None:
+                self.estatisticas['carregamento_ms_total'] = (
+                    self.estatisticas.get('carregamento_ms_total', 0) + carregamento_ms)
+    
+    def _medir_pagina_navegador(self, driver):
+        """Lê do log de performance os bytes recebidos desde a última medição e o tempo de carregamento"""
+        if not self.medir:
+            return
+        try:
+            bytes_rede = 0
+            for entrada in driver.get_log('performance'):
+                mensagem = json.loads(entrada['message'])['message']
+                if mensagem.get('method') == 'Network.loadingFinished':
+                    bytes_rede += mensagem['params'].get('encodedDataLength', 0)
+            self._registrar_pagina(bytes_rede, driver.execute_script(JS_TEMPO_CARREGAMENTO))
+        except Exception as e:
+            print(f"⚠️ Falha ao medir página: {e}")
+    
+    def _medir_memoria(self, chave, drivers):
+        """Guarda o RSS somado (MB) dos navegadores informados"""
+        if not self.medir:
+            return
+        medidas = [memoria_navegador_mb(d) for d in drivers if d is not None]
+        medidas = [m for m in medidas if m is not None]
+        if medidas:
+            with self._lock_metricas:
+                self.estatisticas[chave] = max(self.estatisticas.get(chave, 0), sum(medidas))
+    
+    def resumo_metricas(self):
+        """Imprime as métricas de rede/latência/memória da última execução"""
+        e = self.estatisticas
+        paginas = e.get('paginas', 0)
+        if not paginas:
+            return
+        media = e.get('carregamento_ms_total', 0) / paginas
+        print(f"📶 Rede: {e.get('bytes_rede', 0) / (1024 * 1024):.2f} MB em {paginas} páginas "
+              f"| ⏱️ Carregamento médio: {media:.0f} ms "
+              f"| 🚫 Bloqueio de recursos: {'ativo' if self.bloquear_recursos else 'inativo'}")
+        for chave, rotulo in (('memoria_navegador_mb', 'navegador principal'), ('memoria_pool_mb', 'pool de detalhes')):
+            if chave in e:
+                print(f"🧠 Memória ({rotulo}): {e[chave]:.0f} MB")
+    
     def buscar_estoque(self):
         """Busca o estoque completo de veículos"""
+        saida = None
         try:
             print(f"🔍 Iniciando scraping em {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
             print(f"🌐 Acessando: {self.base_url}")
             
-            self.driver.get(self.base_url)
+            self.estoque = []
+            self.estatisticas = {}
+            self.mudancas = None
+            if self.arquivar_html:
+                self.arquivo_html = parser_camoes.ArquivoExecucao(self.arquivar_html)
             
-            # Aguardar página carregar
-            print("⏳ Aguardando carregamento da página...")
-            time.sleep(5)
+            # Motor desta execução: o fallback não muda self.motor (a instância é reaproveitada
+            # pelo agendador, e a próxima execução volta a tentar o HTTP)
+            motor = self.motor
+            listagem = None
+            if motor == 'http':
+                listagem = self._listagem_http()
+                if listagem is None:
+                    print("⚠️ HTML estático sem cards 'carro col-md-12', usando Selenium como fallback")
+                    motor = 'selenium'
             
-            # Scroll para carregar todos os veículos (lazy loading)
-            self._scroll_pagina()
+            if listagem is None:
+                listagem = self._listagem_selenium()
+                if listagem is None:
+                    return []
             
-            # BUSCAR TODOS OS DIVS E FILTRAR POR grid-item
-            print("🔎 Procurando cards de veículos...")
+            registros, total = listagem
             
-            try:
-                WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located((By.TAG_NAME, "div"))
-                )
-                
-                # Pegar TODOS os divs
-                todos_divs = self.driver.find_elements(By.TAG_NAME, "div")
-                print(f"DEBUG: Total de divs na página: {len(todos_divs)}")
-                print("\n🔍 DEBUG: Procurando classes de cards...")
-                classes_unicas = set()
-                for i, div in enumerate(todos_divs[:50]):  # Primeiros 50 divs
-                    classes = div.get_attribute('class') or ''
-                    if classes:
-                        classes_unicas.add(classes)
-                print("Classes encontradas nos primeiros 50 divs:")
-                for classe in sorted(classes_unicas):
-                    if 'item' in classe or 'vehicle' in classe or 'car' in classe or 'grid' in classe:
-                        print(f"  → '{classe}'")
-                
-                # FILTRAR só os que tem grid-item na classe
-                veiculos = []
-                for div in todos_divs:
-                    classes = div.get_attribute('class') or ''
-                    if 'carro col-md-12' in classes:
-                        veiculos.append(div)
-                
-                print(f"✅ Encontrados {len(veiculos)} cards com classe 'grid-item'!")
-                
-                if len(veiculos) == 0:
-                    print("⚠️ Nenhum grid-item encontrado. Salvando HTML para debug...")
-                    with open('debug_page.html', 'w', encoding='utf-8') as f:
-                        f.write(self.driver.page_source)
-                    print("💾 HTML salvo em debug_page.html")
-                    return []
-                
-            except TimeoutException:
-                print("⚠️ Timeout ao aguardar elementos")
-                return []
+            # Snapshot anterior: reaproveitamento (incremental) e prioridade dos veículos novos
+            anteriores = self._carregar_snapshot_anterior(silencioso=not self.incremental)
             
-            print(f"📋 Processando {len(veiculos)} veículos encontrados...")
+            # Execução anterior interrompida: detalhes já gravados no .parcial são reaproveitados
+            recuperados = saida_estoque.recuperar_parcial(self.saida_ndjson) if self.saida_ndjson else {}
+            if recuperados:
+                print(f"♻️ {len(recuperados)} veículo(s) recuperados da execução interrompida")
             
-            for idx, veiculo in enumerate(veiculos, 1):
-                try:
-                    dados_veiculo = self._extrair_dados_veiculo(veiculo, idx)
-                    
-                    if dados_veiculo:
-                        # Extrair detalhes adicionais (fotos e cor) da página interna
-                        link_detalhes = dados_veiculo.get('link')
-                        if link_detalhes:
-                            print(f"   → [{idx}/{len(veiculos)}] Coletando fotos e detalhes...", end='\r')
-                            detalhes = self._extrair_detalhes_veiculo(link_detalhes)
-                            dados_veiculo['fotos'] = detalhes['fotos']
-                            if detalhes['cor']:
-                                dados_veiculo['cor'] = detalhes['cor']
-                            # Adicionar detalhes e opcionais extraídos
-                            dados_veiculo['detalhes'] = detalhes.get('detalhes', '')
-                            dados_veiculo['opcionais'] = detalhes.get('opcionais', [])
-                        else:
-                            dados_veiculo['fotos'] = []
-                            dados_veiculo['detalhes'] = ''
-                            dados_veiculo['opcionais'] = []
-
-                        self.estoque.append(dados_veiculo)
-                        num_fotos = len(dados_veiculo.get('fotos', []))
-                        print(f" ✓ [{idx}/{len(veiculos)}] {dados_veiculo.get('modelo', 'N/A')} - {dados_veiculo.get('preco', 'N/A')} ({num_fotos} fotos)")
-                except Exception as e:
-                    print(f" ✗ [{idx}/{len(veiculos)}] Erro ao processar: {e}")
-                    continue
+            # Modo incremental: reaproveitar detalhes de veículos sem mudança
+            reaproveitaveis = {**anteriores, **recuperados} if self.incremental else recuperados
+            detalhes_por_idx = self._reaproveitar_detalhes(registros, reaproveitaveis)
+            
+            # Cada veículo vai para o NDJSON assim que seus detalhes ficam prontos (ou falham de vez)
+            dados_por_idx = dict(registros)
+            if self.saida_ndjson:
+                saida = saida_estoque.SaidaNDJSON(self.saida_ndjson, len(registros))
+            
+            def concluir(idx, detalhes):
+                parser_camoes.aplicar_detalhes(dados_por_idx[idx], detalhes)
+                if saida:
+                    saida.concluir(dados_por_idx[idx])
             
+            for idx, dados in registros:
+                if idx in detalhes_por_idx:
+                    concluir(idx, detalhes_por_idx[idx])
+                elif not dados.get('link'):
+                    concluir(idx, None)
+            
+            # Páginas de detalhes via fronteira de crawl (veículos novos primeiro)
+            tarefas = [
+                (idx, dados['link'],
+                 PRIORIDADE_NOVO if anteriores and dados.get('codigo') not in anteriores else PRIORIDADE_NORMAL)
+                for idx, dados in registros
+                if dados.get('link') and idx not in detalhes_por_idx
+            ]
+            self.estatisticas['detalhes_buscados'] = len(tarefas)
+            self.estatisticas['detalhes_reaproveitados'] = len(detalhes_por_idx)
+            detalhes_por_idx.update(self._coletar_detalhes(tarefas, total, motor, ao_concluir=concluir))
+            
+            # JSON/CSV seguem a ordem da listagem (falhas ficam sem detalhes)
+            for idx, dados_veiculo in registros:
+                self.estoque.append(dados_veiculo)
+                num_fotos = len(dados_veiculo.get('fotos', []))
+                print(f" ✓ [{idx}/{total}] {dados_veiculo.get('modelo', 'N/A')} - {dados_veiculo.get('preco', 'N/A')} ({num_fotos} fotos)")
+            if saida:
+                saida.finalizar()
+                print(f"💾 {saida.gravados} veículos gravados em {self.saida_ndjson}")
+            
+            # Diff com o snapshot anterior (sem anterior, tudo seria "novo": não há o que avisar)
+            if anteriores:
+                self.mudancas = mudancas_estoque.calcular_mudancas(anteriores, self.estoque)
+                print(f"🔄 Mudanças: {len(self.mudancas['adicionados'])} novo(s), "
+                      f"{len(self.mudancas['removidos'])} removido(s), {len(self.mudancas['alterados'])} alterado(s)")
+            
+            self._medir_memoria('memoria_navegador_mb', [self.driver])
             print(f"\n✅ Scraping concluído! {len(self.estoque)} veículos extraídos com sucesso")
+            if self.medir:
+                self.resumo_metricas()
+            if self.cache:
+                c = self.cache.resumo()
+                print(f"🗃️ Cache de páginas: {c['hits_304']} respostas 304, {c['hits_conteudo']} com mesmo conteúdo, "
+                      f"{c['misses']} parses ({c['taxa_acerto']:.0%} de acerto, {c['evicoes']} evicções, "
+                      f"{c['tamanho_mb']:.1f} MB em disco)")
+            if self.incremental:
+                print(f"♻️ Páginas de detalhes: {self.estatisticas['detalhes_buscados']} buscadas, "
+                      f"{self.estatisticas['detalhes_reaproveitados']} reaproveitadas do snapshot anterior")
             return self.estoque
             
         except Exception as e:
@@ -154,187 +463,316 @@ class CamoesEstoqueFinal:
             traceback.print_exc()
             return []
         finally:
-            pass  # Não fechar aqui, fechar manualmente depois
+            # Não fechar o navegador aqui, fechar manualmente depois
+            if self.cache:
+                self.cache.salvar()
+                self.estatisticas['cache'] = self.cache.resumo()
+            if self.arquivo_html:
+                self.arquivo_html.fechar()
+                self.arquivo_html = None
+            if saida:
+                saida.fechar()
     
-    def _scroll_pagina(self):
-        """Faz scroll na página para carregar conteúdo lazy loading"""
-        print("📜 Fazendo scroll para carregar todos os veículos...")
-        last_height = self.driver.execute_script("return document.body.scrollHeight")
-        scroll_attempts = 0
-        max_attempts = 10
+    def _carregar_snapshot_anterior(self, silencioso=False):
+        """Veículos do snapshot anterior indexados por código ({} se não existir)"""
+        try:
+            with open(self.snapshot_anterior, 'r', encoding='utf-8') as f:
+                veiculos = json.load(f).get('veiculos', [])
+        except (OSError, ValueError) as e:
+            if not silencioso:
+                print(f"⚠️ Snapshot anterior indisponível ({e}), buscando todos os detalhes")
+            return {}
+        return {v['codigo']: v for v in veiculos if v.get('codigo')}
+    
+    def _reaproveitar_detalhes(self, registros, anteriores):
+        """
+        Compara os cards com o snapshot anterior pelo código.
+        Retorna {idx: detalhes} para os veículos que não precisam abrir a página interna.
+        """
+        reaproveitados = {}
+        for idx, dados in registros:
+            codigo = dados.get('codigo', '')
+            anterior = anteriores.get(codigo)
+            # Códigos CAMOES_<n> são só a posição no card; sem fotos = página de detalhes falhou antes
+            if anterior is None or codigo.startswith('CAMOES_') or not anterior.get('fotos'):
+                continue
+            if all(anterior.get(campo) == dados.get(campo) for campo in CAMPOS_INCREMENTAIS):
+                reaproveitados[idx] = {
+                    'fotos': anterior.get('fotos', []),
+                    'cor': anterior.get('cor', ''),
+                    'detalhes': anterior.get('detalhes', ''),
+                    'opcionais': anterior.get('opcionais', []),
+                }
+        return reaproveitados
+    
+    def _listagem_http(self):
+        """
+        Baixa a listagem via requests e extrai os cards com lxml.
+        Retorna (registros, total_cards) ou None se o HTML estático não tiver cards.
+        """
+        try:
+            (registros, total), html, resposta = self._baixar_e_extrair(
+                self.base_url, parser_camoes.parse_listagem)
+        except requests.RequestException as e:
+            print(f"⚠️ Erro ao baixar a listagem via HTTP: {e}")
+            return None
         
-        while scroll_attempts < max_attempts:
-            # Scroll até o final
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
-            
-            # Calcular nova altura
-            new_height = self.driver.execute_script("return document.body.scrollHeight")
-            
-            if new_height == last_height:
-                break
-                
-            last_height = new_height
-            scroll_attempts += 1
+        if self.arquivo_html:
+            self.arquivo_html.salvar_listagem(html, self.base_url)
+        if total == 0:
+            return None
         
-        print(f"   Scroll concluído após {scroll_attempts} tentativas")
+        # Registros vindos do cache: restaurar tuplas e a data desta execução
+        agora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        registros = [(idx, dict(dados, data_scraping=agora)) for idx, dados in registros]
+        print(f"✅ Encontrados {total} cards no HTML estático ({len(html) / 1024:.0f} KB)")
+        return registros, total
     
-    def _extrair_dados_veiculo(self, elemento, index):
-        """Extrai dados de um elemento de veículo - VERSÃO CORRIGIDA COM SELETORES REAIS"""
-        dados = {'data_scraping': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+    def _baixar_e_extrair(self, url, parser):
+        """
+        GET + parse de uma página no motor HTTP, passando pelo cache de páginas
+        quando habilitado. Retorna (resultado, html, resposta).
+        """
+        if self.cache:
+            resultado, html, resposta = self.cache.obter(
+                self.session, url, parser, parser_camoes.VERSAO_PARSER, timeout=HTTP_TIMEOUT)
+        else:
+            resposta = self.session.get(url, timeout=HTTP_TIMEOUT)
+            resposta.raise_for_status()
+            html = resposta.text
+            resultado = parser(html, url)
+        if self.medir:
+            self._registrar_pagina(len(resposta.content), resposta.elapsed.total_seconds() * 1000)
+        return resultado, html, resposta
+    
+    def _listagem_selenium(self):
+        """
+        Carrega a listagem no navegador e extrai os cards.
+        Retorna (registros, total_cards) ou None se não encontrar veículos.
+        """
+        self._garantir_driver()
+        self.driver.get(self.base_url)
+        
+        # Aguardar os cards aparecerem e a rede ficar ociosa
+        print("⏳ Aguardando carregamento da página...")
+        self._aguardar_cards()
+        
+        # Scroll para carregar todos os veículos (lazy loading)
+        self._scroll_pagina()
+        
+        self._medir_pagina_navegador(self.driver)
+        
+        if self.arquivo_html:
+            self.arquivo_html.salvar_listagem(self.driver.page_source, self.base_url)
+        
+        if self.extracao == 'script':
+            return self._listagem_script()
+        
+        # BUSCAR TODOS OS DIVS E FILTRAR POR grid-item
+        print("🔎 Procurando cards de veículos...")
         
-        # ==== CÓDIGO/ID ====
-        # Extrair do ID do elemento ou do link
-        try:
-            link_elem = elemento.find_element(By.CSS_SELECTOR, 'div.carro-img a')
-            href = link_elem.get_attribute('href') or ''
-            # Extrair ID do final da URL (ex: 6861249)
-            import re
-            match = re.search(r'-(\d+)\.html$', href)
-            dados['codigo'] = match.group(1) if match else f'CAMOES_{index}'
-        except:
-            dados['codigo'] = f'CAMOES_{index}'
-        
-        # ==== MODELO/TÍTULO ====
         try:
-            # O modelo está no h2 > a, junto com o ano em um span
-            h2_elem = elemento.find_element(By.CSS_SELECTOR, 'h2 a')
-            texto_completo = h2_elem.text.strip()
+            WebDriverWait(self.driver, 10).until(
+                EC.presence_of_element_located((By.TAG_NAME, "div"))
+            )
             
-            # Remover o ano do início se estiver lá (formato: "2024 MARCA MODELO...")
-            partes = texto_completo.split()
-            if partes and partes[0].isdigit() and len(partes[0]) == 4:
-                # Primeiro item é o ano, remover
-                dados['modelo'] = ' '.join(partes[1:])
-            else:
-                dados['modelo'] = texto_completo
+            # Pegar TODOS os divs
+            todos_divs = self.driver.find_elements(By.TAG_NAME, "div")
+            print(f"DEBUG: Total de divs na página: {len(todos_divs)}")
+            print("\n🔍 DEBUG: Procurando classes de cards...")
+            classes_unicas = set()
+            for i, div in enumerate(todos_divs[:50]):  # Primeiros 50 divs
+                classes = div.get_attribute('class') or ''
+                if classes:
+                    classes_unicas.add(classes)
+            print("Classes encontradas nos primeiros 50 divs:")
+            for classe in sorted(classes_unicas):
+                if 'item' in classe or 'vehicle' in classe or 'car' in classe or 'grid' in classe:
+                    print(f"  → '{classe}'")
             
-            # Extrair marca (primeira palavra do modelo)
-            partes_modelo = dados['modelo'].split()
-            dados['marca'] = partes_modelo[0] if partes_modelo else ''
-            dados['versao'] = ' '.join(partes_modelo[2:]) if len(partes_modelo) > 2 else ''
-        except:
-            # Fallback: tentar pegar do alt da imagem
-            try:
-                img = elemento.find_element(By.CSS_SELECTOR, 'img.lazy, img.img-responsive')
-                dados['modelo'] = img.get_attribute('alt') or ''
-                partes = dados['modelo'].split()
-                dados['marca'] = partes[0] if partes else ''
-                dados['versao'] = ''
-            except:
-                return None  # Sem modelo, pula
-        
-        # ==== PREÇO ====
-        try:
-            # Preço está em h3.preco com span#valor_veic
-            preco_elem = elemento.find_element(By.CSS_SELECTOR, 'h3.preco')
-            preco_texto = preco_elem.text.strip()
-            # Garantir formato "R$ XX.XXX,XX"
-            dados['preco'] = preco_texto.replace('\n', ' ').replace('  ', ' ')
-        except:
+            # FILTRAR só os que tem grid-item na classe
+            veiculos = []
+            for div in todos_divs:
+                classes = div.get_attribute('class') or ''
+                if 'carro col-md-12' in classes:
+                    veiculos.append(div)
+            
+            print(f"✅ Encontrados {len(veiculos)} cards com classe 'grid-item'!")
+            
+            if len(veiculos) == 0:
+                print("⚠️ Nenhum grid-item encontrado. Salvando HTML para debug...")
+                with open('debug_page.html', 'w', encoding='utf-8') as f:
+                    f.write(self.driver.page_source)
+                print("💾 HTML salvo em debug_page.html")
+                return None
+            
+        except TimeoutException:
+            print("⚠️ Timeout ao aguardar elementos")
+            return None
+        
+        print(f"📋 Processando {len(veiculos)} veículos encontrados...")
+        
+        registros = []
+        for idx, veiculo in enumerate(veiculos, 1):
             try:
-                # Tentar pegar só o valor
-                valor_elem = elemento.find_element(By.CSS_SELECTOR, 'span#valor_veic')
-                dados['preco'] = f"R$ {valor_elem.text.strip()}"
-            except:
-                dados['preco'] = ''
-        
-        # Se não tem modelo OU preço, pula
-        if not dados.get('modelo') or not dados.get('preco'):
+                dados_veiculo = self._extrair_dados_veiculo(veiculo, idx)
+                if dados_veiculo:
+                    registros.append((idx, dados_veiculo))
+            except Exception as e:
+                print(f" ✗ [{idx}/{len(veiculos)}] Erro ao processar: {e}")
+        
+        return registros, len(veiculos)
+    
+    def _listagem_script(self):
+        """
+        Extrai todos os cards com um único execute_script (uma ida e volta ao
+        WebDriver em vez de uma por div e por campo).
+        Retorna (registros, total_cards) ou None se não encontrar veículos.
+        """
+        print("🔎 Procurando cards de veículos...")
+        brutos = self.driver.execute_script(JS_CARDS) or []
+        print(f"✅ Encontrados {len(brutos)} cards com classe 'carro col-md-12'!")
+        
+        if not brutos:
+            print("⚠️ Nenhum card encontrado. Salvando HTML para debug...")
+            with open('debug_page.html', 'w', encoding='utf-8') as f:
+                f.write(self.driver.page_source)
+            print("💾 HTML salvo em debug_page.html")
             return None
         
-        # ==== ANO ====
-        try:
-            # Ano está em span.grey-text.text-darken-2 dentro do h2
-            ano_elem = elemento.find_element(By.CSS_SELECTOR, 'h2 span.grey-text.text-darken-2')
-            dados['ano'] = ano_elem.text.strip()
-        except:
+        print(f"📋 Processando {len(brutos)} veículos encontrados...")
+        registros = []
+        for idx, bruto in enumerate(brutos, 1):
             try:
-                # Fallback: primeiro span.resumo.black-tx (na seção de detalhes)
-                spans = elemento.find_elements(By.CSS_SELECTOR, 'span.resumo.black-tx')
-                if spans:
-                    texto = spans[0].text.strip()
-                    if texto.isdigit() and len(texto) == 4:
-                        dados['ano'] = texto
-                    else:
-                        dados['ano'] = ''
-                else:
-                    dados['ano'] = ''
-            except:
-                dados['ano'] = ''
-        
-        # ==== QUILOMETRAGEM ====
-        try:
-            # KM está em span.resumo.km.black-tx
-            km_elem = elemento.find_element(By.CSS_SELECTOR, 'span.resumo.km')
-            dados['km'] = km_elem.text.strip()
-        except:
-            dados['km'] = ''
+                dados_veiculo = parser_camoes.montar_veiculo(bruto, idx)
+                if dados_veiculo:
+                    registros.append((idx, dados_veiculo))
+            except Exception as e:
+                print(f" ✗ [{idx}/{len(brutos)}] Erro ao processar: {e}")
         
-        # ==== CÂMBIO ====
+        return registros, len(brutos)
+    
+    def _contar_cards(self):
+        """Número de cards div.carro já presentes no DOM"""
+        return self.driver.execute_script(JS_TOTAL_CARDS) or 0
+    
+    def _aguardar_cards(self):
+        """Espera o primeiro card aparecer e a rede ficar ociosa (em vez de um sleep fixo)"""
         try:
-            # Câmbio está em span.resumo.cambio34.black-tx
-            cambio_elem = elemento.find_element(By.CSS_SELECTOR, 'span.resumo.cambio34')
-            dados['cambio'] = cambio_elem.text.strip()
-        except:
-            dados['cambio'] = ''
+            WebDriverWait(self.driver, self.timeout_pagina, poll_frequency=0.2).until(
+                lambda d: self._contar_cards() > 0
+            )
+        except TimeoutException:
+            print(f"⚠️ Nenhum card apareceu em {self.timeout_pagina}s")
+            return
+        self._aguardar_rede_ociosa()
+    
+    def _aguardar_rede_ociosa(self):
+        """
+        Espera document.readyState == 'complete' e nenhuma requisição nova
+        durante janela_rede segundos (limitado a timeout_pagina)
+        """
+        limite = time.monotonic() + self.timeout_pagina
+        ultimo_total = -1
+        desde = time.monotonic()
+        while time.monotonic() < limite:
+            estado, total = self.driver.execute_script(JS_ESTADO_REDE)
+            agora = time.monotonic()
+            if estado != 'complete' or total != ultimo_total:
+                ultimo_total = total
+                desde = agora
+            elif agora - desde >= self.janela_rede:
+                return True
+            time.sleep(0.1)
+        return False
+    
+    def _scroll_pagina(self):
+        """
+        Faz scroll na página para carregar conteúdo lazy loading.
+        Para assim que o número de cards deixa de crescer dentro de janela_scroll.
+        """
+        print("📜 Fazendo scroll para carregar todos os veículos...")
+        cards = self._contar_cards()
+        rolagens = 0
+        limite = time.monotonic() + self.timeout_scroll
         
-        # ==== COMBUSTÍVEL ====
-        try:
-            # Combustível: buscar nos spans.resumo.black-tx pelo padrão
-            spans = elemento.find_elements(By.CSS_SELECTOR, 'span.resumo.black-tx')
-            combustiveis = ['FLEX', 'GASOLINA', 'DIESEL', 'ETANOL', 'ELÉTRICO', 'HÍBRIDO']
-            dados['combustivel'] = ''
-            for span in spans:
-                texto = span.text.strip().upper()
-                if texto in combustiveis:
-                    dados['combustivel'] = texto
-                    break
-        except:
-            dados['combustivel'] = ''
-        
-        # ==== COR ====
-        # A cor não está disponível na listagem principal, apenas na página de detalhes
-        dados['cor'] = ''
-        
-        # ==== FOTO ====
-        try:
-            # Imagem com classe lazy ou img-responsive, priorizar data-src
-            img = elemento.find_element(By.CSS_SELECTOR, 'div.carro-img img')
-            foto = img.get_attribute('data-src') or img.get_attribute('src')
-            # Ignorar placeholder/lazy.gif
-            if foto and 'lazy.gif' not in foto.lower() and 'placeholder' not in foto.lower():
-                dados['foto_principal'] = foto
-            else:
-                dados['foto_principal'] = ''
-        except:
-            dados['foto_principal'] = ''
+        while True:
+            if time.monotonic() >= limite:
+                print(f"⚠️ Scroll interrompido após {self.timeout_scroll}s com {cards} cards "
+                      f"(a listagem pode estar incompleta, aumente --timeout-scroll)")
+                break
+            
+            # Scroll até o final e esperar novos cards
+            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            rolagens += 1
+            try:
+                WebDriverWait(self.driver, self.janela_scroll, poll_frequency=0.1).until(
+                    lambda d: self._contar_cards() > cards
+                )
+            except TimeoutException:
+                break
+            cards = self._contar_cards()
         
-        # ==== LINK ====
+        print(f"   Scroll concluído após {rolagens} rolagens ({cards} cards)")
+    
+    def _extrair_dados_veiculo(self, elemento, index):
+        """Extrai dados de um card via find_element (regras de montagem em parser_camoes)"""
+        return parser_camoes.montar_veiculo(self._card_bruto_elementos(elemento), index)
+    
+    @staticmethod
+    def _buscar(elemento, seletor):
+        """find_element que devolve None em vez de levantar exceção"""
         try:
-            link_elem = elemento.find_element(By.CSS_SELECTOR, 'div.carro-img a')
-            href = link_elem.get_attribute('href')
-            if href and not href.startswith('javascript:'):
-                # Garantir URL absoluta
-                if not href.startswith('http'):
-                    dados['link'] = f"https://camoesmultimarcas.com.br{href}"
-                else:
-                    dados['link'] = href
-            else:
-                dados['link'] = ''
-        except:
-            dados['link'] = ''
-        
-        return dados
+            return elemento.find_element(By.CSS_SELECTOR, seletor)
+        except NoSuchElementException:
+            return None
+    
+    def _card_bruto_elementos(self, elemento):
+        """Campos brutos de um card lidos campo a campo (formato de parser_camoes.cards_brutos)"""
+        texto = lambda el: el.text if el is not None else None
+        link = self._buscar(elemento, 'div.carro-img a')
+        img = self._buscar(elemento, 'div.carro-img img')
+        img_alt = self._buscar(elemento, 'img.lazy, img.img-responsive')
+        return {
+            'href': (link.get_attribute('href') or '') if link is not None else None,
+            'titulo': texto(self._buscar(elemento, 'h2 a')),
+            'img_alt': (img_alt.get_attribute('alt') or '') if img_alt is not None else None,
+            'preco': texto(self._buscar(elemento, 'h3.preco')),
+            'valor': texto(self._buscar(elemento, 'span#valor_veic')),
+            'ano': texto(self._buscar(elemento, 'h2 span.grey-text.text-darken-2')),
+            'resumos': [s.text for s in elemento.find_elements(By.CSS_SELECTOR, 'span.resumo.black-tx')],
+            'km': texto(self._buscar(elemento, 'span.resumo.km')),
+            'cambio': texto(self._buscar(elemento, 'span.resumo.cambio34')),
+            'foto': (img.get_attribute('data-src') or img.get_attribute('src')) if img is not None else None,
+        }
+    
+    def _detalhes_brutos_elementos(self, driver):
+        """Campos brutos da página de detalhes lidos campo a campo (formato de parser_camoes.detalhes_brutos)"""
+        principal = self._buscar(driver, '#veiculo_foto img')
+        itens = []
+        for item in driver.find_elements(By.CSS_SELECTOR, "li.rela-det5"):
+            valor = self._buscar(item, "strong.font-det03")
+            itens.append({'texto': item.text, 'valor': valor.text if valor is not None else None})
+        return {
+            'thumbs': [img.get_attribute('ref') or img.get_attribute('src')
+                       for img in driver.find_elements(By.CSS_SELECTOR, "#SlideShowThumbs img")],
+            'foto_principal': principal.get_attribute('src') if principal is not None else None,
+            'itens': itens,
+            'blocos': [b.text for b in driver.find_elements(By.CSS_SELECTOR, "div.bloco")],
+            'spoilers': [sp.text for sp in driver.find_elements(By.CSS_SELECTOR, "div.spoiler")],
+        }
     
     def tirar_screenshot(self, arquivo='screenshot_estoque.png'):
         """Tira screenshot da página (útil para debug)"""
+        if self.driver is None:
+            print("⚠️ Navegador não iniciado (motor HTTP), screenshot indisponível")
+            return
         self.driver.save_screenshot(arquivo)
         print(f"📸 Screenshot salva em {arquivo}")
     
     def salvar_json(self, arquivo='estoque_camoes.json'):
-        """Salva o estoque em formato JSON"""
-        with open(arquivo, 'w', encoding='utf-8') as f:
+        """Salva o estoque em formato JSON (troca atômica: a API nunca lê o arquivo pela metade)"""
+        with saida_estoque.escrita_atomica(arquivo) as f:
             json.dump({
                 'ultima_atualizacao': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                 'total_veiculos': len(self.estoque),
@@ -342,149 +780,269 @@ class CamoesEstoqueFinal:
             }, f, ensure_ascii=False, indent=2)
         print(f"💾 Dados salvos em {arquivo}")
     
+    def salvar_sqlite(self, arquivo=armazenamento_sqlite.ARQUIVO_PADRAO):
+        """Grava o estoque no SQLite (tabelas normalizadas + FTS5) numa única transação"""
+        execucao = armazenamento_sqlite.salvar_estoque(
+            self.estoque, arquivo, ultima_atualizacao=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        print(f"💾 Dados salvos em {arquivo} (execução {execucao})")
+    
+    def salvar_binario(self, arquivo=snapshot_binario.ARQUIVO_PADRAO):
+        """Salva o snapshot binário (colunar, mapeado em memória pela API com ESTOQUE_FORMATO=binario)"""
+        snapshot_binario.gerar({
+            'ultima_atualizacao': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'total_veiculos': len(self.estoque),
+            'veiculos': self.estoque
+        }, arquivo)
+        print(f"💾 Dados salvos em {arquivo}")
+    
+    def registrar_historico(self):
+        """Acrescenta ao histórico de preços só o que mudou desde a última execução"""
+        contagem = historico_estoque.registrar_execucao(self.estoque)
+        print(f"📈 Histórico: {contagem['entrada']} entrada(s), {contagem['preco']} mudança(s) de preço, "
+              f"{contagem['saida']} saída(s), {contagem['retorno']} retorno(s)")
+    
+    def publicar_mudancas(self, webhook=None, arquivo=mudancas_estoque.ARQUIVO_FEED):
+        """Grava o diff da execução no feed de mudanças e, se configurado, envia para o webhook"""
+        if not self.mudancas or not mudancas_estoque.tem_mudancas(self.mudancas):
+            return None
+        entrada = mudancas_estoque.registrar_mudancas(self.mudancas, arquivo)
+        print(f"🔄 Feed de mudanças: versão {entrada['versao']} em {arquivo}")
+        if webhook:
+            mudancas_estoque.enviar_webhook(webhook, entrada)
+        return entrada
+    
     def salvar_csv(self, arquivo='estoque_camoes.csv'):
-        """Salva o estoque em formato CSV"""
+        """Salva o estoque em formato CSV (troca atômica)"""
         if not self.estoque:
             print("⚠️ Nenhum veículo para salvar")
             return
         
-        with open(arquivo, 'w', newline='', encoding='utf-8') as f:
+        with saida_estoque.escrita_atomica(arquivo, newline='') as f:
             writer = csv.DictWriter(f, fieldnames=self.estoque[0].keys())
             writer.writeheader()
             writer.writerows(self.estoque)
         print(f"💾 Dados salvos em {arquivo}")
     
-    def _extrair_detalhes_veiculo(self, link):
-        """Acessa a página de detalhes para extrair todas as fotos e a cor"""
+    def salvar_csv_normalizado(self, diretorio=exportar_csv.DIRETORIO_PADRAO):
+        """CSV para planilhas/BI: veiculos.csv com preço/km/anos numéricos + fotos/opcionais/detalhes por codigo"""
+        contagem = exportar_csv.exportar(self.estoque, diretorio)
+        print(f"💾 CSV normalizado salvo em {diretorio}/ ({contagem['veiculos']} veículos, "
+              f"{contagem['fotos']} fotos, {contagem['opcionais']} opcionais)")
+    
+    def _coletar_detalhes(self, tarefas, total, motor, ao_concluir=None):
+        """
+        Coleta as páginas de detalhes de uma lista de (idx, link, prioridade).
+        Retorna {idx: detalhes}. Os links passam pela fronteira de crawl (limite de
+        taxa por host, retentativas com backoff); detail_workers define a concorrência.
+        ao_concluir(idx, detalhes) é chamado (nos threads dos workers) a cada página pronta
+        e com detalhes=None assim que a fronteira desiste de uma página.
+        `motor` é o desta execução ('selenium' depois do fallback da listagem).
+        """
+        if not tarefas:
+            return {}
+        
+        fronteira = FronteiraCrawl(max_tentativas=self.max_tentativas)
+        for idx, link, prioridade in tarefas:
+            fronteira.adicionar(idx, link, prioridade)
+        
+        def progresso(idx, detalhes):
+            if ao_concluir:
+                ao_concluir(idx, detalhes)
+            print(f"   → [{len(fronteira.resultados)}/{len(tarefas)}] Coletando fotos e detalhes...", end='\r')
+        
+        def falha(idx, erro):
+            if ao_concluir:
+                ao_concluir(idx, None)
+        
+        num_workers = min(self.detail_workers, len(tarefas))
+        if motor == 'http':
+            # A sessão tem pool de conexões: N threads compartilham a mesma sessão
+            resultados = fronteira.executar([self._extrair_detalhes_http] * num_workers, progresso, falha)
+        elif num_workers <= 1:
+            resultados = fronteira.executar([self._extrair_detalhes_veiculo], progresso, falha)
+        else:
+            resultados = self._coletar_detalhes_em_paralelo(fronteira, num_workers, progresso, falha)
+        
+        e = fronteira.estatisticas
+        self.estatisticas['detalhes_retentativas'] = e['retentativas']
+        self.estatisticas['detalhes_falhas'] = e['falhas']
+        self.estatisticas['detalhes_erros_ao_concluir'] = e['erros_ao_concluir']
+        if e['retentativas'] or e['falhas']:
+            print(f"\n🔁 Detalhes: {e['retentativas']} retentativas, "
+                  f"{e['recuperadas_no_repasse']} recuperadas no repasse final, {e['falhas']} falhas")
+            for item in fronteira.falhas.values():
+                print(f"   ✗ {item['url']}: {item['erro']}")
+        return resultados
+    
+    def _extrair_detalhes_http(self, link):
+        """
+        Versão HTTP de _extrair_detalhes_veiculo (requests + lxml, mesmos seletores).
+        Erros de rede/HTTP sobem para a fronteira tentar de novo.
+        """
         if not link or not link.startswith('http'):
             return {'fotos': [], 'cor': ''}
-            
+        
+        detalhes, html, _ = self._baixar_e_extrair(link, parser_camoes.parse_detalhes)
+        if self.arquivo_html:
+            self.arquivo_html.salvar_detalhe(link, html)
+        return detalhes
+    
+    def _coletar_detalhes_em_paralelo(self, fronteira, num_workers, progresso, falha):
+        """Processa a fronteira com um pool de N navegadores (um thread por navegador)"""
+        print(f"🚀 Iniciando pool com {num_workers} navegadores para as páginas de detalhes...")
+        
+        # Subir os navegadores em paralelo (o cold start do Chrome é o mais caro)
+        drivers = []
         try:
-            # Abrir link em nova aba para não perder a página principal
-            self.driver.execute_script(f"window.open('{link}', '_blank');")
-            self.driver.switch_to.window(self.driver.window_handles[-1])
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                futuros = [executor.submit(self._iniciar_driver, self.headless) for _ in range(num_workers)]
+                for futuro in futuros:
+                    try:
+                        drivers.append(futuro.result())
+                    except Exception as e:
+                        print(f"⚠️ Falha ao iniciar navegador do pool: {e}")
             
-            # Aguardar elementos da página de detalhes
-            try:
-                WebDriverWait(self.driver, 7).until(
-                    EC.presence_of_element_located((By.ID, "SlideShowThumbs"))
-                )
-            except:
-                # Se não encontrar thumbs, tenta esperar pelo título pelo menos
-                WebDriverWait(self.driver, 5).until(
-                    EC.presence_of_element_located((By.TAG_NAME, "h2"))
-                )
+            if not drivers:
+                # Sem navegadores extras: cai para o modo serial no driver principal
+                print("⚠️ Pool indisponível, coletando detalhes no navegador principal")
+                return fronteira.executar([self._extrair_detalhes_veiculo], progresso, falha)
             
-            detalhes = {'fotos': [], 'cor': '', 'detalhes': '', 'opcionais': []}
+            processadores = [
+                (lambda link, d=d: self._extrair_detalhes_veiculo(link, driver=d)) for d in drivers
+            ]
+            resultados = fronteira.executar(processadores, progresso, falha)
+            self._medir_memoria('memoria_pool_mb', drivers)
+        finally:
+            for d in drivers:
+                try:
+                    d.quit()
+                except Exception:
+                    pass
+        
+        return resultados
+    
+    def _extrair_detalhes_veiculo(self, link, driver=None):
+        """
+        Acessa a página de detalhes para extrair todas as fotos e a cor.
+        Sem driver usa uma nova aba do navegador principal; com driver
+        (worker do pool) navega diretamente nele. Timeouts e erros sobem
+        para a fronteira de crawl tentar de novo.
+        """
+        if not link or not link.startswith('http'):
+            return {'fotos': [], 'cor': ''}
+        
+        nova_aba = driver is None
+        driver = driver or self.driver
             
-            # 1. Extrair todas as fotos da galeria (atributo 'ref' contém o link da imagem grande)
-            try:
-                thumbs = self.driver.find_elements(By.CSS_SELECTOR, "#SlideShowThumbs img")
-                for img in thumbs:
-                    url_foto = img.get_attribute('ref') or img.get_attribute('src')
-                    if url_foto and 'lazy.gif' not in url_foto:
-                        detalhes['fotos'].append(url_foto)
-                
-                # Fallback se não encontrar no SlideShowThumbs (pegar a principal)
-                if not detalhes['fotos']:
-                    img_principal = self.driver.find_element(By.CSS_SELECTOR, "#veiculo_foto img")
-                    url_p = img_principal.get_attribute('src')
-                    if url_p: detalhes['fotos'].append(url_p)
-            except:
-                pass
+        try:
+            if nova_aba:
+                # Abrir nova aba para não perder a página principal; os bloqueios
+                # CDP valem por aba, então são aplicados antes de navegar
+                driver.execute_script("window.open('about:blank', '_blank');")
+                driver.switch_to.window(driver.window_handles[-1])
+                self._aplicar_bloqueios(driver)
+            driver.get(link)
             
-            # 2. Extrair a Cor do veículo (disponível apenas na página interna)
-            try:
-                # Estrutura: li > div.det-div88 > strong.tit-det66 (Marca/Modelo/Cor...)
-                items = self.driver.find_elements(By.CSS_SELECTOR, "li.rela-det5")
-                for item in items:
-                    texto_item = item.text
-                    if "Cor" in texto_item:
-                        # O valor da cor está no segundo strong ou após o br
-                        valor_cor = item.find_element(By.CSS_SELECTOR, "strong.font-det03").text.strip()
-                        detalhes['cor'] = valor_cor
-                        break
-            except:
-                pass
+            # Aguardar a galeria ou, se a página não tiver galeria, o fim do carregamento
+            WebDriverWait(driver, self.timeout_detalhe, poll_frequency=0.1).until(EC.any_of(
+                EC.presence_of_element_located((By.ID, "SlideShowThumbs")),
+                lambda d: d.execute_script("return document.readyState") == 'complete'
+                          and d.find_elements(By.TAG_NAME, "h2")
+            ))
             
-            # 3. Extrair Detalhes do veículo (div.bloco)
-            try:
-                blocos = self.driver.find_elements(By.CSS_SELECTOR, "div.bloco")
-                textos_detalhes = []
-                for bloco in blocos:
-                    texto = bloco.text.strip()
-                    if texto:
-                        # Limpeza: Remover prefixo redundante "Detalhes" se houver
-                        if texto.startswith("Detalhes"):
-                            texto = texto.replace("Detalhes", "", 1).strip()
-                        
-                        # Adicionar apenas se for conteúdo novo (ignora repetições exatas)
-                        if texto and texto not in textos_detalhes:
-                            # Verificação adicional: se o texto já estiver contido em algum bloco anterior ou vice-versa
-                            # Isso ajuda se um bloco for apenas parte de outro maior
-                            ja_existe = False
-                            for t_existente in textos_detalhes:
-                                if texto in t_existente:
-                                    ja_existe = True
-                                    break
-                            
-                            if not ja_existe:
-                                # Se o novo texto for maior e contiver um anterior, substitui o anterior
-                                for i, t_existente in enumerate(textos_detalhes):
-                                    if t_existente in texto:
-                                        textos_detalhes[i] = texto
-                                        ja_existe = True
-                                        break
-                                
-                                if not ja_existe:
-                                    textos_detalhes.append(texto)
-                
-                # Juntar todos os blocos de detalhes únicos
-                detalhes['detalhes'] = ' | '.join(textos_detalhes) if textos_detalhes else ''
-            except:
-                pass
+            self._medir_pagina_navegador(driver)
+            if self.arquivo_html:
+                self.arquivo_html.salvar_detalhe(link, driver.page_source)
             
-            # 4. Extrair Opcionais do veículo (div.spoiler)
-            try:
-                spoilers = self.driver.find_elements(By.CSS_SELECTOR, "div.spoiler")
-                lista_opcionais = []
-                for spoiler in spoilers:
-                    texto_spoiler = spoiler.text.strip()
-                    if texto_spoiler:
-                        # Os opcionais vêm separados por vírgula no texto
-                        # Exemplo: "ABS, Airbag, Apoio De Braço, Ar-condicionado, ..."
-                        itens = [item.strip() for item in texto_spoiler.split(',')]
-                        for item in itens:
-                            # Limpar e adicionar apenas se não estiver vazio e não for duplicado
-                            item_limpo = item.strip()
-                            # Remover o cabeçalho "Opcionais" que pode vir no primeiro item
-                            if '\n' in item_limpo:
-                                item_limpo = item_limpo.split('\n')[-1].strip()
-                            if item_limpo and item_limpo not in lista_opcionais:
-                                lista_opcionais.append(item_limpo)
-                
-                detalhes['opcionais'] = lista_opcionais
-            except:
-                pass
-                
-            return detalhes
+            if self.extracao == 'script':
+                # Todos os campos em uma única ida e volta ao WebDriver
+                bruto = driver.execute_script(JS_DETALHES)
+            else:
+                bruto = self._detalhes_brutos_elementos(driver)
+            return parser_camoes.montar_detalhes(bruto)
             
-        except Exception as e:
-            # Silencioso para não poluir o log, já que é um detalhe
-            return {'fotos': [], 'cor': ''}
         finally:
             # Fechar aba e voltar para a principal
-            if len(self.driver.window_handles) > 1:
-                self.driver.close()
-                self.driver.switch_to.window(self.driver.window_handles[0])
+            if nova_aba and len(driver.window_handles) > 1:
+                driver.close()
+                driver.switch_to.window(driver.window_handles[0])
+    
+    def navegador_saudavel(self):
+        """Verifica se o navegador ainda responde (usado para reaproveitá-lo entre execuções)"""
+        if self.driver is None:
+            return False
+        try:
+            return self.driver.execute_script("return 1;") == 1
+        except Exception:
+            return False
+    
+    def preparar_proxima_execucao(self):
+        """Deixa o navegador aquecido em estado limpo: uma aba só, em about:blank"""
+        if self.driver is None:
+            return
+        for handle in self.driver.window_handles[1:]:
+            self.driver.switch_to.window(handle)
+            self.driver.close()
+        self.driver.switch_to.window(self.driver.window_handles[0])
+        self.driver.get("about:blank")
+    
     def fechar(self):
-        """Fecha o navegador"""
+        """Fecha o navegador e a sessão HTTP"""
+        if self.session:
+            self.session.close()
+            self.session = None
         if self.driver:
             self.driver.quit()
+            self.driver = None
             print("\n🔒 Navegador fechado")
 
-def main():
+def _parse_args(argv=None):
+    """Argumentos de linha de comando do scraper"""
+    parser = argparse.ArgumentParser(description="Scraper do estoque Camões Automóveis")
+    parser.add_argument('--detail-workers', type=int, default=1,
+                        help="Número de navegadores em paralelo para as páginas de detalhes (padrão: 1)")
+    parser.add_argument('--motor', choices=MOTORES, default='selenium',
+                        help="'http' usa requests + lxml e só abre o Chrome como fallback (padrão: selenium)")
+    parser.add_argument('--arquivar-html', metavar='DIR', default=None,
+                        help="Guarda o HTML bruto da execução em DIR/<data>/ para reprocessamento offline")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Só abre as páginas de detalhes de veículos novos ou alterados (usa estoque_camoes.json anterior)")
+    parser.add_argument('--timeout-pagina', type=float, default=20,
+                        help="Segundos para o primeiro card aparecer na listagem (padrão: 20)")
+    parser.add_argument('--janela-scroll', type=float, default=1.5,
+                        help="Segundos sem cards novos para encerrar o scroll (padrão: 1.5)")
+    parser.add_argument('--timeout-scroll', type=float, default=60,
+                        help="Tempo máximo total de scroll em segundos (padrão: 60)")
+    parser.add_argument('--bloquear-recursos', action='store_true',
+                        help="Não baixa imagens, mídia, fontes e rastreadores; flags enxutas do Chrome")
+    parser.add_argument('--metricas', action='store_true',
+                        help="Mostra bytes de rede, tempo de carregamento e memória do navegador da execução")
+    parser.add_argument('--max-tentativas', type=int, default=3,
+                        help="Tentativas por página de detalhes, com backoff, antes do repasse final (padrão: 3)")
+    parser.add_argument('--cache-paginas', metavar='DIR', default=None,
+                        help="Motor HTTP: cache em disco das páginas com requisições condicionais")
+    parser.add_argument('--cache-max-mb', type=float, default=100,
+                        help="Tamanho máximo do cache de páginas em MB (padrão: 100)")
+    parser.add_argument('--extracao', choices=EXTRACOES, default='script',
+                        help="'script' extrai cada página com um único execute_script; 'elementos' campo a campo (padrão: script)")
+    parser.add_argument('--csv-normalizado', metavar='DIR', nargs='?', const=exportar_csv.DIRETORIO_PADRAO, default=None,
+                        help=f"Também grava veiculos.csv + fotos/opcionais/detalhes.csv em DIR (padrão: {exportar_csv.DIRETORIO_PADRAO})")
+    parser.add_argument('--sqlite', metavar='ARQUIVO', nargs='?', const=armazenamento_sqlite.ARQUIVO_PADRAO, default=None,
+                        help=f"Também grava o estoque em SQLite para a API (padrão: {armazenamento_sqlite.ARQUIVO_PADRAO})")
+    parser.add_argument('--binario', metavar='ARQUIVO', nargs='?', const=snapshot_binario.ARQUIVO_PADRAO, default=None,
+                        help=f"Também grava o snapshot binário para a API (padrão: {snapshot_binario.ARQUIVO_PADRAO})")
+    parser.add_argument('--sem-historico', action='store_true',
+                        help=f"Não registra as mudanças de preço/estoque em {historico_estoque.ARQUIVO_LOG}")
+    parser.add_argument('--sem-ndjson', action='store_true',
+                        help="Não grava estoque_camoes.ndjson durante a coleta (sem recuperação de execução interrompida)")
+    parser.add_argument('--webhook-mudancas', metavar='URL', default=os.environ.get('WEBHOOK_MUDANCAS'),
+                        help="POST do diff da execução (novos/removidos/preço e km alterados) nesta URL "
+                             "(padrão: variável WEBHOOK_MUDANCAS)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Função principal"""
+    args = _parse_args(argv)
     print("""
 ╔════════════════════════════════════════════════════════════╗
 ║                                                            ║
@@ -498,7 +1056,14 @@ def main():
     
     # headless=False para ver o navegador funcionando (debug)
     # headless=True para rodar em background (produção)
-    scraper = CamoesEstoqueFinal(headless=True)
+    scraper = CamoesEstoqueFinal(headless=True, detail_workers=args.detail_workers, motor=args.motor,
+                                 extracao=args.extracao, arquivar_html=args.arquivar_html,
+                                 incremental=args.incremental, timeout_pagina=args.timeout_pagina,
+                                 janela_scroll=args.janela_scroll, timeout_scroll=args.timeout_scroll,
+                                 bloquear_recursos=args.bloquear_recursos, medir=args.metricas,
+                                 max_tentativas=args.max_tentativas, cache_paginas=args.cache_paginas,
+                                 cache_max_mb=args.cache_max_mb,
+                                 saida_ndjson=None if args.sem_ndjson else 'estoque_camoes.ndjson')
     
     try:
         # Buscar estoque
@@ -508,13 +1073,31 @@ def main():
             # Salvar em JSON e CSV
             scraper.salvar_json('estoque_camoes.json')
             scraper.salvar_csv('estoque_camoes.csv')
+            if args.csv_normalizado:
+                scraper.salvar_csv_normalizado(args.csv_normalizado)
+            if args.sqlite:
+                scraper.salvar_sqlite(args.sqlite)
+            if args.binario:
+                scraper.salvar_binario(args.binario)
+            if not args.sem_historico:
+                scraper.registrar_historico()
+            scraper.publicar_mudancas(args.webhook_mudancas)
             
             print(f"\n{'='*60}")
             print(f"📊 RESUMO FINAL")
             print(f"{'='*60}")
             print(f"  Total de veículos: {len(estoque)}")
+            if args.incremental:
+                print(f"  Detalhes reaproveitados: {scraper.estatisticas.get('detalhes_reaproveitados', 0)} "
+                      f"(buscados: {scraper.estatisticas.get('detalhes_buscados', 0)})")
             print(f"  Arquivo JSON: estoque_camoes.json")
             print(f"  Arquivo CSV: estoque_camoes.csv")
+            if args.csv_normalizado:
+                print(f"  CSV normalizado: {args.csv_normalizado}/")
+            if args.sqlite:
+                print(f"  Banco SQLite: {args.sqlite}")
+            if args.binario:
+                print(f"  Snapshot binário: {args.binario}")
             print(f"  Última atualização: {estoque[0]['data_scraping'] if estoque else 'N/A'}")
             
             # Mostrar preview dos primeiros 3 veículos
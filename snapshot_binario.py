@@ -0,0 +1,281 @@
+"""
+Snapshot binário do estoque para partida rápida da API (ex: Vercel)
+Layout colunar com strings internadas: a API mapeia o arquivo em memória (mmap) sem
+fazer parse e só monta o dict de um veículo quando ele é pedido
+
+Arquivo: preâmbulo struct '<8sII' (MAGICA, versão do formato, tamanho do cabeçalho),
+cabeçalho JSON e seções alinhadas em 8 bytes (arrays de uint32 na ordem de bytes do cabeçalho)
+"""
+
+from array import array
+from collections.abc import Sequence
+import argparse
+import json
+import mmap
+import os
+import statistics
+import struct
+import sys
+import time
+
+from saida_estoque import escrita_atomica
+
+ARQUIVO_PADRAO = 'estoque_camoes.bin'
+MAGICA = b'CAMOESBN'
+VERSAO_FORMATO = 1
+_PREAMBULO = struct.Struct('<8sII')
+ALINHAMENTO = 8
+NULO = 0xFFFFFFFF  # id de string que representa None
+
+# Tipos de coluna
+TEXTO = 'texto'  # str ou None: um id da tabela de strings por veículo
+LISTA = 'lista'  # lista de str: ids contíguos em <campo>:itens, fatiados por <campo>:inicios
+JSON = 'json'    # outros valores: JSON internado como string
+
+
+def _tipo_coluna(valores):
+    if all(v is None or isinstance(v, str) for v in valores):
+        return TEXTO
+    if all(isinstance(v, list) and all(isinstance(x, str) for x in v) for v in valores):
+        return LISTA
+    return JSON
+
+
+def _alinhar(tamanho):
+    return -tamanho % ALINHAMENTO
+
+
+class _TabelaStrings:
+    """Cada string distinta é guardada uma vez; as colunas guardam só o id"""
+
+    def __init__(self):
+        self.ids = {}
+        self.textos = []
+
+    def id(self, texto):
+        if texto is None:
+            return NULO
+        i = self.ids.get(texto)
+        if i is None:
+            i = self.ids[texto] = len(self.textos)
+            self.textos.append(texto)
+        return i
+
+
+def gerar(estoque, caminho=ARQUIVO_PADRAO):
+    """Grava o estoque ({ultima_atualizacao, total_veiculos, veiculos}) no formato binário (troca atômica)"""
+    veiculos = estoque['veiculos']
+    campos = list(dict.fromkeys(campo for v in veiculos for campo in v))
+    tipos = {campo: _tipo_coluna([v[campo] for v in veiculos if campo in v]) for campo in campos}
+    strings = _TabelaStrings()
+
+    # Ordem das chaves de cada veículo (quase sempre a mesma): o dict montado sai igual ao original
+    layouts = {}
+    secoes = {'layout': array('I', (layouts.setdefault(tuple(v), len(layouts)) for v in veiculos))}
+    for campo in campos:
+        if tipos[campo] == LISTA:
+            inicios, itens = array('I', [0]), array('I')
+            for v in veiculos:
+                itens.extend(strings.id(x) for x in v.get(campo) or ())
+                inicios.append(len(itens))
+            secoes[f'{campo}:inicios'] = inicios
+            secoes[f'{campo}:itens'] = itens
+        elif tipos[campo] == JSON:
+            secoes[campo] = array('I', (
+                strings.id(None if v.get(campo) is None else json.dumps(v[campo], ensure_ascii=False))
+                for v in veiculos))
+        else:
+            secoes[campo] = array('I', (strings.id(v.get(campo)) for v in veiculos))
+
+    codificados = [t.encode('utf-8') for t in strings.textos]
+    offsets = array('I', [0])
+    for b in codificados:
+        offsets.append(offsets[-1] + len(b))
+    secoes['strings:offsets'] = offsets
+    secoes['strings'] = b''.join(codificados)
+
+    descricao, posicao = {}, 0
+    for nome, dados in secoes.items():
+        tamanho = len(dados) * dados.itemsize if isinstance(dados, array) else len(dados)
+        descricao[nome] = [posicao, tamanho, dados.typecode if isinstance(dados, array) else 'B']
+        posicao += tamanho + _alinhar(tamanho)
+
+    cabecalho = json.dumps({
+        'ultima_atualizacao': estoque.get('ultima_atualizacao'),
+        'total_veiculos': estoque.get('total_veiculos', len(veiculos)),
+        'total': len(veiculos),
+        'ordem_bytes': sys.byteorder,
+        'campos': [[campo, tipos[campo]] for campo in campos],
+        'layouts': [list(layout) for layout in layouts],
+        'secoes': descricao,
+    }, ensure_ascii=False).encode('utf-8')
+    cabecalho += b' ' * _alinhar(_PREAMBULO.size + len(cabecalho))
+
+    with escrita_atomica(caminho, binario=True) as f:
+        f.write(_PREAMBULO.pack(MAGICA, VERSAO_FORMATO, len(cabecalho)))
+        f.write(cabecalho)
+        for nome, dados in secoes.items():
+            bruto = dados.tobytes() if isinstance(dados, array) else dados
+            f.write(bruto + b'\0' * _alinhar(len(bruto)))
+
+
+class SnapshotBinario:
+    """
+    Snapshot aberto com mmap: colunas lidas direto do arquivo (memoryview, sem cópia),
+    strings decodificadas e veículos montados a cada acesso (nada fica guardado por processo)
+    """
+
+    def __init__(self, caminho=ARQUIVO_PADRAO):
+        with open(caminho, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magica, versao, tamanho = _PREAMBULO.unpack_from(self._mm, 0)
+        if magica != MAGICA:
+            raise ValueError(f'{caminho} não é um snapshot binário do estoque')
+        if versao != VERSAO_FORMATO:
+            raise ValueError(f'{caminho}: versão do formato {versao} (esperada {VERSAO_FORMATO})')
+        inicio = _PREAMBULO.size + tamanho
+        cabecalho = json.loads(self._mm[_PREAMBULO.size:inicio])
+
+        self.ultima_atualizacao = cabecalho['ultima_atualizacao']
+        self.total_veiculos = cabecalho['total_veiculos']
+        self.total = cabecalho['total']
+        self._trocar_bytes = cabecalho['ordem_bytes'] != sys.byteorder
+        self._dados = memoryview(self._mm)[inicio:]
+        self._secoes = cabecalho['secoes']
+        self._layouts = [tuple(layout) for layout in cabecalho['layouts']]
+        self._layout = self._secao('layout')
+        self._offsets = self._secao('strings:offsets')
+        self._strings = self._secao('strings')
+        self._colunas = {}
+        for campo, tipo in cabecalho['campos']:
+            if tipo == LISTA:
+                self._colunas[campo] = (tipo, (self._secao(f'{campo}:inicios'), self._secao(f'{campo}:itens')))
+            else:
+                self._colunas[campo] = (tipo, self._secao(campo))
+        self.veiculos = VeiculosBinarios(self)
+
+    def _secao(self, nome):
+        posicao, tamanho, tipo = self._secoes[nome]
+        bruto = self._dados[posicao:posicao + tamanho]
+        if tipo == 'B':
+            return bruto
+        if self._trocar_bytes:  # arquivo gerado em máquina com outra ordem de bytes: copia e converte
+            convertido = array(tipo, bruto.tobytes())
+            convertido.byteswap()
+            return convertido
+        return bruto.cast(tipo)
+
+    def _texto(self, i):
+        if i == NULO:
+            return None
+        return str(self._strings[self._offsets[i]:self._offsets[i + 1]], 'utf-8')
+
+    def _valor(self, campo, pos):
+        tipo, dados = self._colunas[campo]
+        if tipo == LISTA:
+            inicios, itens = dados
+            return [self._texto(i) for i in itens[inicios[pos]:inicios[pos + 1]]]
+        texto = self._texto(dados[pos])
+        if tipo == JSON and texto is not None:
+            return json.loads(texto)
+        return texto
+
+    def veiculo(self, pos):
+        """Dict do veículo na posição `pos`, com as chaves na ordem original"""
+        return {campo: self._valor(campo, pos) for campo in self._layouts[self._layout[pos]]}
+
+    def valores(self, campo):
+        """Coluna inteira sem montar os veículos (None onde o campo não existe)"""
+        if campo not in self._colunas:
+            return [None] * self.total
+        return [self._valor(campo, pos) for pos in range(self.total)]
+
+
+class VeiculosBinarios(Sequence):
+    """Lista somente leitura dos veículos; cada acesso monta um dict novo (só das posições pedidas)"""
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+
+    def __len__(self):
+        return self._snapshot.total
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self[i] for i in range(self._snapshot.total)[pos]]
+        pos = range(self._snapshot.total)[pos]  # IndexError e índices negativos como numa lista
+        return self._snapshot.veiculo(pos)
+
+    def valores(self, campo):
+        return self._snapshot.valores(campo)
+
+
+def abrir(caminho=ARQUIVO_PADRAO):
+    return SnapshotBinario(caminho)
+
+
+# ==== LINHA DE COMANDO ====
+
+def _mediana_ms(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def benchmark(arquivo_json='estoque_camoes.json', arquivo_binario=ARQUIVO_PADRAO, repeticoes=50):
+    """Tempo de partida (mediana em ms): json.load do JSON indentado x mmap do binário"""
+    def carregar_json():
+        with open(arquivo_json, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def primeiro_veiculo():
+        snapshot = abrir(arquivo_binario)
+        return snapshot.veiculos[0] if snapshot.total else None
+
+    def todos_veiculos():
+        return list(abrir(arquivo_binario).veiculos)
+
+    original = carregar_json()
+    if list(abrir(arquivo_binario).veiculos) != original['veiculos']:
+        raise ValueError(f'{arquivo_binario} não corresponde a {arquivo_json} (gere de novo)')
+
+    resultados = {
+        'json_load': _mediana_ms(carregar_json, repeticoes),
+        'binario_abrir': _mediana_ms(lambda: abrir(arquivo_binario), repeticoes),
+        'binario_primeiro_veiculo': _mediana_ms(primeiro_veiculo, repeticoes),
+        'binario_todos_veiculos': _mediana_ms(todos_veiculos, repeticoes),
+    }
+    print(f"📦 {arquivo_json}: {os.path.getsize(arquivo_json) / 1024:.1f} KB | "
+          f"{arquivo_binario}: {os.path.getsize(arquivo_binario) / 1024:.1f} KB "
+          f"({len(original['veiculos'])} veículos, mediana de {repeticoes} execuções)")
+    print(f"   json.load                       {resultados['json_load']:8.3f} ms")
+    print(f"   binário: abrir (mmap)           {resultados['binario_abrir']:8.3f} ms")
+    print(f"   binário: abrir + 1º veículo     {resultados['binario_primeiro_veiculo']:8.3f} ms")
+    print(f"   binário: abrir + todos          {resultados['binario_todos_veiculos']:8.3f} ms")
+    return resultados
+
+
+def main(argv=None):
+    """
+    python snapshot_binario.py gerar [estoque_camoes.json] [estoque_camoes.bin]
+    python snapshot_binario.py benchmark [estoque_camoes.json] [estoque_camoes.bin]
+    """
+    parser = argparse.ArgumentParser(description="Snapshot binário do estoque (partida rápida da API)")
+    parser.add_argument('comando', choices=('gerar', 'benchmark'))
+    parser.add_argument('json', nargs='?', default='estoque_camoes.json')
+    parser.add_argument('binario', nargs='?', default=ARQUIVO_PADRAO)
+    parser.add_argument('--repeticoes', type=int, default=50)
+    args = parser.parse_args(argv)
+    if args.comando == 'gerar':
+        with open(args.json, 'r', encoding='utf-8') as f:
+            gerar(json.load(f), args.binario)
+        print(f"💾 Snapshot binário salvo em {args.binario}")
+    else:
+        benchmark(args.json, args.binario, args.repeticoes)
+
+
+if __name__ == '__main__':
+    main()
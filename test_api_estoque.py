@@ -0,0 +1,262 @@
+"""
+Testes da API (pytest, cliente de teste do Flask): paginação, validação dos parâmetros e cache
+"""
+
+import gzip
+import json
+import threading
+
+import pytest
+
+import api_estoque
+import armazenamento_sqlite
+import historico_estoque
+import memoria_compartilhada
+import mudancas_estoque
+
+VEICULOS = [
+    {'codigo': '1', 'marca': 'Toyota', 'modelo': 'Corolla', 'versao': 'XEi 2.0', 'preco': 'R$ 90.000,00',
+     'km': '30.000 km', 'ano': '2020/2021', 'cor': 'Prata', 'cambio': 'Automático', 'combustivel': 'Flex',
+     'detalhes': 'Único dono, teto solar.', 'opcionais': ['Teto solar'], 'fotos': ['1.jpg']},
+    {'codigo': '2', 'marca': 'Honda', 'modelo': 'Civic', 'versao': 'EXL', 'preco': 'R$ 110.000,00',
+     'km': '10.000 km', 'ano': '2022/2022', 'cor': 'Preto', 'cambio': 'Automático', 'combustivel': 'Flex',
+     'detalhes': 'Revisado na concessionária.', 'opcionais': [], 'fotos': ['2.jpg']},
+    {'codigo': '3', 'marca': 'Fiat', 'modelo': 'Uno', 'versao': 'Way', 'preco': 'R$ 35.000,00',
+     'km': '80.000 km', 'ano': '2015/2016', 'cor': 'Branco', 'cambio': 'Manual', 'combustivel': 'Flex',
+     'detalhes': '', 'opcionais': [], 'fotos': ['3.jpg']},
+]
+
+
+def _gravar_estoque(caminho, veiculos=VEICULOS):
+    caminho.write_text(json.dumps({'ultima_atualizacao': '2024-05-01 10:00:00', 'total_veiculos': len(veiculos),
+                                   'veiculos': veiculos}, ensure_ascii=False), encoding='utf-8')
+
+
+@pytest.fixture
+def arquivo(tmp_path, monkeypatch):
+    caminho = tmp_path / 'estoque.json'
+    _gravar_estoque(caminho)
+    monkeypatch.setattr(api_estoque, 'ESTOQUE_FILE', str(caminho))
+    monkeypatch.setattr(api_estoque, 'ARQUIVO_SNAPSHOT', str(caminho))
+    api_estoque.limpar_cache()
+    yield caminho
+    api_estoque.limpar_cache()
+
+
+@pytest.fixture
+def cliente(arquivo):
+    return api_estoque.app.test_client()
+
+
+def test_paginacao_com_ordenacao_e_campos(cliente):
+    resposta = cliente.get('/api/estoque?limit=2&offset=0&ordenar=-preco&campos=codigo,preco')
+    assert resposta.status_code == 200
+    dados = resposta.get_json()
+    assert dados['total_veiculos'] == 3
+    assert dados['veiculos'] == [{'codigo': '2', 'preco': 'R$ 110.000,00'}, {'codigo': '1', 'preco': 'R$ 90.000,00'}]
+    assert dados['paginacao'] == {'offset': 0, 'limit': 2, 'retornados': 2, 'proximo_offset': 2}
+
+    ultima = cliente.get('/api/estoque?limit=2&offset=2&ordenar=-preco&campos=codigo').get_json()
+    assert ultima['veiculos'] == [{'codigo': '3'}]
+    assert ultima['paginacao']['proximo_offset'] is None
+
+
+def test_paginacao_no_filtrar_pelo_body(cliente):
+    dados = cliente.post('/api/estoque/filtrar', json={'combustivel': 'Flex', 'ordenar': 'km', 'limit': 1,
+                                                       'campos': ['codigo']}).get_json()
+    assert dados['total_encontrados'] == 3
+    assert dados['veiculos'] == [{'codigo': '2'}]
+    assert dados['paginacao']['proximo_offset'] == 1
+
+
+@pytest.mark.parametrize('consulta', ['limit=-1', 'offset=abc', 'ordenar=cor', 'ordenar=--preco'])
+def test_parametros_de_listagem_invalidos_na_query(cliente, consulta):
+    resposta = cliente.get(f'/api/estoque?{consulta}')
+    assert resposta.status_code == 400
+    assert 'erro' in resposta.get_json()
+
+
+@pytest.mark.parametrize('opcoes', [{'ordenar': 5}, {'ordenar': ['preco']}, {'campos': 5},
+                                    {'campos': {'codigo': True}}, {'campos': ['codigo', 1]}, {'limit': [1]}])
+def test_parametros_de_listagem_com_tipo_errado_no_body(cliente, opcoes):
+    resposta = cliente.post('/api/estoque/filtrar', json=opcoes)
+    assert resposta.status_code == 400
+    assert 'erro' in resposta.get_json()
+
+
+def test_filtro_de_texto_com_numero_ou_lista(cliente):
+    assert cliente.post('/api/estoque/filtrar', json={'marca': 5}).get_json()['total_encontrados'] == 0
+    assert cliente.post('/api/estoque/filtrar', json={'modelo': 2.0}).status_code == 200
+    for filtros in ({'marca': ['Toyota']}, {'cor': {'nome': 'Prata'}}, {'modelo': None}, {'cambio': True}):
+        resposta = cliente.post('/api/estoque/filtrar', json=filtros)
+        assert resposta.status_code == 400
+        assert 'erro' in resposta.get_json()
+
+
+def test_busca_texto_ordenada_com_trechos(cliente):
+    dados = cliente.get('/api/estoque/texto?q=teto solar.&campos=codigo').get_json()
+    assert dados['total_encontrados'] == 1
+    veiculo, = dados['veiculos']
+    assert veiculo['codigo'] == '1' and veiculo['score'] > 0
+    assert any('*solar*' in trecho for trecho in veiculo['trechos'])
+
+    assert cliente.get('/api/estoque/texto?q=revisada').get_json()['veiculos'][0]['codigo'] == '2'
+    assert cliente.get('/api/estoque/texto').status_code == 400
+
+
+def test_historico_por_codigo_e_resumo(cliente, tmp_path, monkeypatch):
+    arquivos = {'log': str(tmp_path / 'historico.ndjson'), 'indice': str(tmp_path / 'indice.json')}
+    monkeypatch.setattr(api_estoque, 'HISTORICO_LOG', arquivos['log'])
+    monkeypatch.setattr(api_estoque, 'HISTORICO_INDICE', arquivos['indice'])
+    historico_estoque.registrar_execucao(VEICULOS, '2024-05-01 10:00:00', **arquivos)
+    historico_estoque.registrar_execucao(VEICULOS[:2], '2024-05-03 10:00:00', **arquivos)
+
+    dados = cliente.get('/api/estoque/historico/3').get_json()
+    assert [e['tipo'] for e in dados['eventos']] == ['entrada', 'saida']
+    assert dados['em_estoque'] is False
+    assert cliente.get('/api/estoque/historico/999').status_code == 404
+    resumo = cliente.get('/api/estoque/historico').get_json()
+    assert resumo['vendidos']['total'] == 1 and resumo['em_estoque']['total'] == 2
+
+
+def test_mudancas_desde_a_versao_do_cliente(cliente, tmp_path, monkeypatch):
+    caminho = str(tmp_path / 'mudancas.json')
+    monkeypatch.setattr(api_estoque, 'MUDANCAS_FEED', caminho)
+    anteriores = {v['codigo']: v for v in VEICULOS}
+    for atuais in (VEICULOS[:2], VEICULOS[:1]):
+        mudancas_estoque.registrar_mudancas(mudancas_estoque.calcular_mudancas(anteriores, atuais), caminho)
+        anteriores = {v['codigo']: v for v in atuais}
+
+    dados = cliente.get('/api/estoque/mudancas?desde=1').get_json()
+    assert dados['versao_atual'] == 2 and dados['completo'] is True
+    assert [v['codigo'] for e in dados['entradas'] for v in e['removidos']] == ['2']
+    assert cliente.get('/api/estoque/mudancas?desde=2').get_json()['entradas'] == []
+    assert cliente.get('/api/estoque/mudancas?desde=abc').status_code == 400
+
+
+def test_arquivo_reescrito_recarrega_uma_vez_so(cliente, arquivo, monkeypatch):
+    monkeypatch.setattr(api_estoque, 'INTERVALO_VERIFICACAO_MS', 0)
+    assert cliente.get('/api/status').status_code == 200
+    recargas = api_estoque._cache['recargas']
+    _gravar_estoque(arquivo, VEICULOS[:2])
+
+    largada = threading.Barrier(16)
+    totais = []
+
+    def consultar():
+        cliente_thread = api_estoque.app.test_client()
+        largada.wait()
+        for _ in range(5):
+            totais.append(cliente_thread.get('/api/estoque?limit=1').get_json()['total_veiculos'])
+
+    threads = [threading.Thread(target=consultar) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert api_estoque._cache['recargas'] == recargas + 1
+    assert len(totais) == 80 and set(totais) <= {2, 3}  # antigo até a troca, novo depois
+    assert cliente.get('/api/estoque?limit=1').get_json()['total_veiculos'] == 2
+
+
+def _conferir_estoque_completo(cliente):
+    resposta = cliente.get('/api/estoque')
+    assert resposta.status_code == 200
+    assert resposta.headers['Vary'] == 'Accept-Encoding'
+    etag = resposta.headers['ETag']
+    dados = json.loads(resposta.get_data())
+    assert [v['codigo'] for v in dados['veiculos']] == ['1', '2', '3']
+
+    revalidada = cliente.get('/api/estoque', headers={'If-None-Match': etag})
+    assert revalidada.status_code == 304 and revalidada.get_data() == b''
+    assert revalidada.headers['ETag'] == etag and revalidada.headers['Vary'] == 'Accept-Encoding'
+
+    comprimida = cliente.get('/api/estoque', headers={'Accept-Encoding': 'gzip'})
+    assert comprimida.headers['Content-Encoding'] == 'gzip'
+    assert comprimida.headers['ETag'] == etag
+    assert json.loads(gzip.decompress(comprimida.get_data())) == dados
+    return etag
+
+
+def test_estoque_completo_etag_gzip_e_vary(cliente):
+    _conferir_estoque_completo(cliente)
+
+
+def test_estoque_completo_do_arquivo_compartilhado(cliente, arquivo, tmp_path, monkeypatch):
+    # Modo gunicorn: o corpo vem dos arquivos publicados pelo master, com o mesmo ETag
+    etag = _conferir_estoque_completo(cliente)
+    diretorio = str(tmp_path / 'shm')
+    memoria_compartilhada.publicar(str(arquivo), diretorio)
+    monkeypatch.setattr(api_estoque, '_compartilhado', memoria_compartilhada.ContadorGeracao(diretorio))
+    api_estoque.limpar_cache()
+    assert _conferir_estoque_completo(cliente) == etag
+
+
+def test_lru_de_consultas_remove_a_mais_antiga_e_zera_com_snapshot_novo(cliente, arquivo, monkeypatch):
+    monkeypatch.setattr(api_estoque, 'TAMANHO_LRU_CONSULTAS', 2)
+    monkeypatch.setattr(api_estoque, 'INTERVALO_VERIFICACAO_MS', 0)
+    contadores = dict(api_estoque._cache['consultas'])
+    for modelo in ('corola', 'civic', 'CÍVIC', 'uno'):  # 'CÍVIC' normaliza para a mesma chave
+        cliente.get(f'/api/estoque/buscar?modelo={modelo}')
+    lru = api_estoque.obter_snapshot()['consultas']
+    assert list(lru) == ['civic', 'uno']
+    assert api_estoque._cache['consultas'] == {'hits': contadores['hits'] + 1, 'misses': contadores['misses'] + 3}
+    assert [pos for pos, _ in lru['civic']] == [1]
+
+    _gravar_estoque(arquivo, VEICULOS[:2])
+    assert cliente.get('/api/estoque/buscar?modelo=civic').get_json()['total_encontrados'] == 1
+    assert list(api_estoque.obter_snapshot()['consultas']) == ['civic']
+    assert api_estoque.obter_snapshot()['consultas'] is not lru
+
+
+@pytest.fixture
+def cliente_sqlite(tmp_path, monkeypatch):
+    caminho = tmp_path / 'estoque.db'
+    monkeypatch.setattr(api_estoque, '_sqlite', armazenamento_sqlite.EstoqueSQLite(str(caminho)))
+    api_estoque.limpar_cache()
+    yield api_estoque.app.test_client(), caminho
+    api_estoque.limpar_cache()
+
+
+def test_sqlite_sem_banco_responde_estoque_vazio(cliente_sqlite):
+    cliente, caminho = cliente_sqlite
+    assert not caminho.exists()
+    estoque = cliente.get('/api/estoque')
+    assert estoque.status_code == 200 and estoque.get_json()['veiculos'] == []
+    assert cliente.get('/api/status').get_json()['total_veiculos'] == 0
+    assert cliente.get('/api/estoque/buscar?modelo=civic').get_json()['total_encontrados'] == 0
+    assert cliente.get('/api/estoque/codigo/1').status_code == 404
+    assert not caminho.exists()  # só o scraper cria o banco
+
+    armazenamento_sqlite.salvar_estoque(VEICULOS, str(caminho), '2024-05-01 10:00:00')
+    assert cliente.get('/api/status').get_json()['total_veiculos'] == 3
+    assert len(cliente.get('/api/estoque').get_json()['veiculos']) == 3
+
+
+def test_sqlite_score_de_termo_comum_nao_zera(cliente_sqlite):
+    cliente, caminho = cliente_sqlite
+    # 'ar condicionado' em todos: o FTS5 dá idf 1e-6 e o score fica na casa de 1e-6
+    veiculos = [{'codigo': str(i), 'modelo': 'Onix', 'detalhes': 'Ar condicionado' + ' revisado' * i}
+                for i in range(4)]
+    armazenamento_sqlite.salvar_estoque(veiculos, str(caminho))
+    scores = [v['score'] for v in cliente.get('/api/estoque/texto?q=ar condicionado').get_json()['veiculos']]
+    assert len(scores) == 4 and all(s > 0 for s in scores)
+    assert scores == sorted(scores, reverse=True) and scores[0] > scores[-1]
+
+
+def test_sqlite_erro_de_digitacao_cai_na_busca_aproximada(cliente_sqlite, cliente):
+    cliente_banco, caminho = cliente_sqlite
+    armazenamento_sqlite.salvar_estoque(VEICULOS, str(caminho))
+    prefixo = cliente_banco.get('/api/estoque/buscar?modelo=cor').get_json()
+    assert [v['codigo'] for v in prefixo['veiculos']] == ['1']
+
+    # 'civc' não é prefixo de nada: mesmo resultado e score da busca em memória
+    aproximada = cliente_banco.get('/api/estoque/buscar?modelo=civc&campos=codigo').get_json()
+    assert aproximada['total_encontrados'] == 1
+    em_memoria = api_estoque.buscar_memorizado(api_estoque.obter_snapshot(), 'civc')
+    assert [v['score'] for v in aproximada['veiculos']] == [score for _, score in em_memoria]
+    assert [v['codigo'] for v in aproximada['veiculos']] == ['2']
+
+    filtrados = cliente_banco.post('/api/estoque/filtrar', json={'modelo': 'civc', 'cor': 'preto'}).get_json()
+    assert [v['codigo'] for v in filtrados['veiculos']] == ['2']
+    assert cliente_banco.get('/api/estoque/buscar?modelo=xyzw').get_json()['total_encontrados'] == 0
@@ -0,0 +1,101 @@
+"""
+Testes do cache de páginas do motor HTTP (pytest): hit/miss, revalidação 304 e remoção LRU
+"""
+
+import os
+
+from cache_paginas import CachePaginas
+
+
+class _Resposta:
+    def __init__(self, status_code, corpo=b'', etag=None):
+        self.status_code = status_code
+        self.content = corpo
+        self.text = corpo.decode('utf-8')
+        self.encoding = 'utf-8'
+        self.headers = {'ETag': etag} if etag else {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f'HTTP {self.status_code}')
+
+
+class _Servidor:
+    """Sessão falsa: responde 304 quando o If-None-Match bate com o ETag da página"""
+
+    def __init__(self, paginas):
+        self.paginas = paginas
+        self.pedidos = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.pedidos.append((url, dict(headers or {})))
+        corpo = self.paginas[url]
+        etag = f'"{len(corpo)}-{hash(corpo)}"'
+        if (headers or {}).get('If-None-Match') == etag:
+            return _Resposta(304)
+        return _Resposta(200, corpo, etag)
+
+
+class _Parser:
+    def __init__(self):
+        self.chamadas = 0
+
+    def __call__(self, html, url):
+        self.chamadas += 1
+        return {'url': url, 'tamanho': len(html)}
+
+
+def test_miss_depois_304_sem_parse(tmp_path):
+    servidor = _Servidor({'http://x/a': b'<html>a</html>'})
+    parser = _Parser()
+    cache = CachePaginas(str(tmp_path), max_mb=1)
+
+    resultado, html, _ = cache.obter(servidor, 'http://x/a', parser, versao_parser=1)
+    assert resultado == {'url': 'http://x/a', 'tamanho': 14} and html == '<html>a</html>'
+    resultado['alterado'] = True  # cópia: não mexe no resultado guardado
+
+    resultado, html, resposta = cache.obter(servidor, 'http://x/a', parser, versao_parser=1)
+    assert resposta.status_code == 304 and 'If-None-Match' in servidor.pedidos[1][1]
+    assert html == '<html>a</html>'  # corpo lido do disco
+    assert resultado == {'url': 'http://x/a', 'tamanho': 14}
+    assert parser.chamadas == 1
+    assert cache.estatisticas == {'hits_304': 1, 'hits_conteudo': 0, 'misses': 1, 'evicoes': 0}
+
+
+def test_conteudo_igual_reaproveita_e_versao_nova_refaz_o_parse(tmp_path):
+    servidor = _Servidor({'http://x/a': b'<html>a</html>'})
+    parser = _Parser()
+    cache = CachePaginas(str(tmp_path), max_mb=1)
+    cache.obter(servidor, 'http://x/a', parser, versao_parser=1)
+
+    # Servidor sem ETag: o hash do corpo evita o parse
+    cache.indice['http://x/a']['etag'] = None
+    cache.obter(servidor, 'http://x/a', parser, versao_parser=1)
+    assert cache.estatisticas['hits_conteudo'] == 1 and parser.chamadas == 1
+
+    cache.obter(servidor, 'http://x/a', parser, versao_parser=2)
+    assert parser.chamadas == 2
+
+    servidor.paginas['http://x/a'] = b'<html>mudou</html>'
+    resultado, _, _ = cache.obter(servidor, 'http://x/a', parser, versao_parser=2)
+    assert resultado['tamanho'] == 18 and parser.chamadas == 3
+
+
+def test_remove_as_paginas_menos_usadas(tmp_path):
+    corpo = b'x' * 400
+    servidor = _Servidor({f'http://x/{i}': corpo for i in range(4)})
+    cache = CachePaginas(str(tmp_path), max_mb=1000 / (1024 * 1024))  # cabem 2 páginas
+    for i in (0, 1):
+        cache.obter(servidor, f'http://x/{i}', _Parser())
+    cache.obter(servidor, 'http://x/0', _Parser())  # 0 passa a ser a mais recente
+    cache.obter(servidor, 'http://x/2', _Parser())
+    assert set(cache.indice) == {'http://x/0', 'http://x/2'}
+    assert cache.total_bytes == 800 and cache.estatisticas['evicoes'] == 1
+    assert not os.path.exists(cache._caminho('http://x/1'))
+
+    # O total acompanha uma página que mudou de tamanho e sobrevive a salvar/recarregar
+    servidor.paginas['http://x/2'] = b'y' * 100
+    cache.obter(servidor, 'http://x/2', _Parser())
+    assert cache.total_bytes == 500
+    cache.salvar()
+    assert CachePaginas(str(tmp_path), max_mb=1).total_bytes == 500
@@ -0,0 +1,67 @@
+"""
+Testes da exportação em CSV normalizado (pytest): colunas tipadas e tabelas filhas por codigo
+"""
+
+import csv
+import os
+
+import pytest
+
+import exportar_csv
+
+VEICULOS = [
+    {'codigo': '101', 'marca': 'Fiat', 'modelo': 'Cronos', 'ano': '2022/2023', 'preco': 'R$ 79.990,50',
+     'km': '18.500 km', 'fotos': ['a.jpg', 'b.jpg'], 'opcionais': ['Ar condicionado'],
+     'detalhes': 'Único dono\nRevisado, "impecável"'},
+    {'codigo': '102', 'marca': 'VW', 'modelo': 'Gol', 'ano': '', 'preco': 'Consulte', 'km': '',
+     'fotos': [], 'opcionais': None},
+]
+
+
+def _ler(diretorio, tabela):
+    with open(os.path.join(diretorio, f'{tabela}.csv'), encoding='utf-8', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def test_tabelas_normalizadas(tmp_path):
+    diretorio = str(tmp_path / 'csv')
+    contagem = exportar_csv.exportar(iter(VEICULOS), diretorio)
+    assert contagem == {'veiculos': 2, 'fotos': 2, 'opcionais': 1, 'detalhes': 2}
+
+    veiculos = _ler(diretorio, 'veiculos')
+    assert list(veiculos[0]) == list(exportar_csv.COLUNAS_VEICULOS)
+    assert {c: veiculos[0][c] for c in ('preco', 'km', 'ano_fabricacao', 'ano_modelo', 'num_fotos')} == {
+        'preco': '79990.50', 'km': '18500', 'ano_fabricacao': '2022', 'ano_modelo': '2023', 'num_fotos': '2'}
+    assert {c: veiculos[1][c] for c in ('preco', 'km', 'ano_fabricacao', 'num_opcionais')} == {
+        'preco': '', 'km': '', 'ano_fabricacao': '', 'num_opcionais': '0'}
+
+    assert _ler(diretorio, 'fotos') == [{'codigo': '101', 'ordem': '1', 'url': 'a.jpg'},
+                                        {'codigo': '101', 'ordem': '2', 'url': 'b.jpg'}]
+    assert _ler(diretorio, 'opcionais') == [{'codigo': '101', 'ordem': '1', 'opcional': 'Ar condicionado'}]
+    assert _ler(diretorio, 'detalhes') == [{'codigo': '101', 'linha': '1', 'texto': 'Único dono'},
+                                           {'codigo': '101', 'linha': '2', 'texto': 'Revisado, "impecável"'}]
+
+
+def test_falha_no_meio_mantem_as_tabelas_anteriores(tmp_path):
+    diretorio = str(tmp_path / 'csv')
+    exportar_csv.exportar(VEICULOS, diretorio)
+
+    def veiculos_com_queda():
+        yield {'codigo': '999', 'fotos': ['z.jpg']}
+        raise RuntimeError('queda')
+
+    with pytest.raises(RuntimeError):
+        exportar_csv.exportar(veiculos_com_queda(), diretorio)
+    assert [v['codigo'] for v in _ler(diretorio, 'veiculos')] == ['101', '102']
+    assert {f['codigo'] for f in _ler(diretorio, 'fotos')} == {'101'}
+    assert sorted(os.listdir(tmp_path)) == ['csv']
+
+
+def test_troca_interrompida_e_recuperada(tmp_path):
+    diretorio = str(tmp_path / 'csv')
+    exportar_csv.exportar(VEICULOS, diretorio)
+    # Queda entre os dois renames: só o conjunto antigo existe
+    os.rename(diretorio, diretorio + exportar_csv.SUFIXO_ANTIGO)
+    exportar_csv.exportar(VEICULOS[1:], diretorio)
+    assert [v['codigo'] for v in _ler(diretorio, 'veiculos')] == ['102']
+    assert sorted(os.listdir(tmp_path)) == ['csv']
@@ -0,0 +1,102 @@
+"""
+Testes da fronteira de crawl (pytest): prioridade, retentativas com backoff e repasse final
+"""
+
+import threading
+
+import fronteira_camoes
+from fronteira_camoes import FronteiraCrawl, PRIORIDADE_NOVO, PRIORIDADE_NORMAL
+
+
+def _fronteira(**opcoes):
+    # Sem limite de taxa nem esperas reais
+    padrao = {'taxa_padrao': 1000.0, 'taxas_por_host': {}, 'backoff_base': 0.001, 'backoff_max': 0.01,
+              'pausa_repasse': 0}
+    return FronteiraCrawl(**{**padrao, **opcoes})
+
+
+class _FalhaNasPrimeiras:
+    """Processador que falha nas `n` primeiras chamadas de cada URL"""
+
+    def __init__(self, falhas_por_url):
+        self.falhas_por_url = falhas_por_url
+        self.chamadas = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, url):
+        with self.lock:
+            n = self.chamadas[url] = self.chamadas.get(url, 0) + 1
+        if n <= self.falhas_por_url.get(url, 0):
+            raise ConnectionError(f'{url} falhou ({n})')
+        return url.upper()
+
+
+def test_prioridade_novo_sai_primeiro():
+    fronteira = _fronteira()
+    for i in range(3):
+        fronteira.adicionar(i, f'http://x/{i}', PRIORIDADE_NORMAL)
+    fronteira.adicionar('novo', 'http://x/novo', PRIORIDADE_NOVO)
+    ordem = []
+    fronteira.executar([lambda url: ordem.append(url)])
+    assert ordem == ['http://x/novo', 'http://x/0', 'http://x/1', 'http://x/2']
+
+
+def test_falha_temporaria_volta_para_a_fila():
+    processar = _FalhaNasPrimeiras({'http://x/a': 2})
+    fronteira = _fronteira(max_tentativas=3)
+    fronteira.adicionar('a', 'http://x/a')
+    fronteira.adicionar('b', 'http://x/b')
+    assert fronteira.executar([processar, processar]) == {'a': 'HTTP://X/A', 'b': 'HTTP://X/B'}
+    assert processar.chamadas == {'http://x/a': 3, 'http://x/b': 1}
+    assert fronteira.estatisticas['retentativas'] == 2
+    assert fronteira.estatisticas['falhas'] == 0
+    assert fronteira.falhas == {}
+
+
+def test_repasse_final_recupera_e_registra_falhas():
+    processar = _FalhaNasPrimeiras({'http://x/a': 2, 'http://x/b': 10})
+    fronteira = _fronteira(max_tentativas=2)
+    fronteira.adicionar('a', 'http://x/a')
+    fronteira.adicionar('b', 'http://x/b')
+    falhas = []
+    resultados = fronteira.executar([processar], ao_falhar=lambda chave, erro: falhas.append(chave))
+    assert resultados == {'a': 'HTTP://X/A'}
+    # 2 tentativas + 1 no repasse final
+    assert processar.chamadas == {'http://x/a': 3, 'http://x/b': 3}
+    assert fronteira.estatisticas['recuperadas_no_repasse'] == 1
+    assert fronteira.estatisticas['falhas'] == 1
+    assert list(fronteira.falhas) == ['b']
+    assert isinstance(fronteira.falhas['b']['erro'], ConnectionError)
+    assert falhas == ['b']  # avisada uma vez só, depois da última tentativa
+
+
+def test_sem_repasse_final_falha_avisada_na_hora():
+    processar = _FalhaNasPrimeiras({'http://x/a': 10})
+    fronteira = _fronteira(max_tentativas=2, repasse_final=False)
+    fronteira.adicionar('a', 'http://x/a')
+    falhas = []
+    assert fronteira.executar([processar], ao_falhar=lambda chave, erro: falhas.append((chave, str(erro)))) == {}
+    assert processar.chamadas == {'http://x/a': 2}
+    assert falhas == [('a', 'http://x/a falhou (2)')]
+
+
+def test_erro_no_callback_nao_para_os_workers():
+    fronteira = _fronteira()
+    for i in range(5):
+        fronteira.adicionar(i, f'http://x/{i}')
+
+    def ao_concluir(chave, resultado):
+        if chave == 1:
+            raise ValueError('callback quebrado')
+
+    resultados = fronteira.executar([lambda url: url], ao_concluir)
+    assert len(resultados) == 5
+    assert fronteira.estatisticas['erros_ao_concluir'] == 1
+
+
+def test_host_sem_www_e_balde_de_tokens():
+    assert fronteira_camoes._host('https://www.CamoesMultimarcas.com.br/x') == 'camoesmultimarcas.com.br'
+    balde = fronteira_camoes.BaldeTokens(taxa=1000.0, capacidade=3)
+    for _ in range(3):
+        balde.adquirir()
+    assert balde.tokens < 1
@@ -0,0 +1,86 @@
+"""
+Testes do histórico de preço/permanência (pytest): eventos, offsets no log e truncamento
+"""
+
+import json
+import os
+
+import pytest
+
+import historico_estoque
+
+
+def _veiculo(codigo, preco, modelo='Onix'):
+    return {'codigo': codigo, 'preco': preco, 'modelo': modelo, 'km': '10.000 km'}
+
+
+@pytest.fixture
+def arquivos(tmp_path):
+    return {'log': str(tmp_path / 'historico.ndjson'), 'indice': str(tmp_path / 'indice.json')}
+
+
+def test_eventos_entrada_preco_saida_retorno(arquivos):
+    registrar = historico_estoque.registrar_execucao
+    assert registrar([_veiculo('A1', 'R$ 50.000,00'), _veiculo('CAMOES_3', 'R$ 1,00')],
+                     '2024-01-01 08:00:00', **arquivos) == {'entrada': 1, 'retorno': 0, 'preco': 0, 'saida': 0}
+    assert registrar([_veiculo('A1', 'R$ 48.000,00')], '2024-01-03 08:00:00', **arquivos)['preco'] == 1
+    assert registrar([_veiculo('A1', 'Consulte')], '2024-01-04 08:00:00', **arquivos) == dict.fromkeys(
+        ('entrada', 'retorno', 'preco', 'saida'), 0)
+    assert registrar([], '2024-01-11 08:00:00', **arquivos)['saida'] == 1
+    assert registrar([_veiculo('A1', 'R$ 47.000,00')], '2024-01-21 08:00:00', **arquivos)['retorno'] == 1
+
+    indice = historico_estoque.carregar_indice(arquivos['indice'])
+    assert list(indice['veiculos']) == ['A1']  # CAMOES_<n> não entra no histórico
+    resumo = historico_estoque.historico_veiculo(indice, 'A1', arquivos['log'], agora='2024-01-22 08:00:00')
+    assert [e['tipo'] for e in resumo['eventos']] == ['entrada', 'preco', 'saida', 'retorno']
+    assert resumo['em_estoque'] is True
+    assert resumo['dias_em_estoque'] == 11.0  # 10 dias na 1ª passagem + 1 depois do retorno
+    assert resumo['preco_minimo'] == 4700000
+    assert resumo['mudancas_preco'] == 2
+    assert resumo['variacao_preco'] == -300000
+
+
+def test_offsets_apontam_para_as_linhas_do_log(arquivos):
+    historico_estoque.registrar_execucao([_veiculo('A1', 'R$ 10,00'), _veiculo('B2', 'R$ 20,00')],
+                                         '2024-01-01 08:00:00', **arquivos)
+    historico_estoque.registrar_execucao([_veiculo('B2', 'R$ 15,00')], '2024-01-02 08:00:00', **arquivos)
+    indice = historico_estoque.carregar_indice(arquivos['indice'])
+
+    with open(arquivos['log'], 'rb') as f:
+        linhas = f.readlines()
+    offsets = [sum(len(l) for l in linhas[:i]) for i in range(len(linhas))]
+    eventos = [json.loads(l) for l in linhas]
+    for codigo, registro in indice['veiculos'].items():
+        assert registro['eventos'] == [o for o, e in zip(offsets, eventos) if e['codigo'] == codigo]
+        assert historico_estoque.eventos_veiculo(registro, arquivos['log']) == [
+            e for e in eventos if e['codigo'] == codigo]
+    assert indice['tamanho_log'] == os.path.getsize(arquivos['log'])
+
+
+def test_execucao_interrompida_trunca_o_log(arquivos):
+    historico_estoque.registrar_execucao([_veiculo('A1', 'R$ 10,00')], '2024-01-01 08:00:00', **arquivos)
+    tamanho = os.path.getsize(arquivos['log'])
+    # Execução que caiu depois de escrever no log e antes de salvar o índice
+    with open(arquivos['log'], 'ab') as f:
+        f.write(b'{"codigo": "A1", "tipo": "saida", "preco": 1000, "data": "2024-01-0')
+
+    contagem = historico_estoque.registrar_execucao([_veiculo('A1', 'R$ 9,00')], '2024-01-02 08:00:00', **arquivos)
+    assert contagem['preco'] == 1 and contagem['saida'] == 0
+    with open(arquivos['log'], 'rb') as f:
+        f.seek(tamanho)
+        assert json.loads(f.readline())['tipo'] == 'preco'
+        assert f.read() == b''
+    indice = historico_estoque.carregar_indice(arquivos['indice'])
+    assert [e['tipo'] for e in historico_estoque.eventos_veiculo(indice['veiculos']['A1'], arquivos['log'])] == [
+        'entrada', 'preco']
+
+
+def test_resumo_permanencia(arquivos):
+    historico_estoque.registrar_execucao([_veiculo('A1', 'R$ 10,00'), _veiculo('B2', 'R$ 20,00')],
+                                         '2024-01-01 00:00:00', **arquivos)
+    historico_estoque.registrar_execucao([_veiculo('B2', 'R$ 18,00')], '2024-01-05 00:00:00', **arquivos)
+    indice = historico_estoque.carregar_indice(arquivos['indice'])
+    resumo = historico_estoque.resumo_permanencia(indice, agora='2024-01-11 00:00:00')
+    assert resumo['vendidos'] == {'total': 1, 'media_dias': 4.0, 'mediana_dias': 4.0, 'max_dias': 4.0}
+    assert resumo['em_estoque']['max_dias'] == 10.0
+    assert resumo['com_reducao_de_preco'] == 1
@@ -0,0 +1,89 @@
+"""
+Testes dos índices em memória (pytest)
+Os filtros por bitmap devem devolver os mesmos veículos que o backend SQLite
+"""
+
+import pytest
+
+import armazenamento_sqlite
+import indices_estoque
+
+VEICULOS = [
+    {'codigo': '101', 'marca': 'Citroën', 'modelo': 'C3', 'versao': 'Live 1.0', 'preco': 'R$ 59.900,00',
+     'ano': '2021/2022', 'km': '35.000 km', 'cambio': 'Manual', 'combustivel': 'Flex', 'cor': 'Branco'},
+    {'codigo': '102', 'marca': 'CITROEN', 'modelo': 'C4 Cactus', 'versao': 'Feel', 'preco': 'R$ 89.900,00',
+     'ano': '2020/2020', 'km': '52.000 km', 'cambio': 'Automático', 'combustivel': 'Flex', 'cor': 'Cinza'},
+    {'codigo': '103', 'marca': 'Fiat', 'modelo': 'Cronos', 'versao': 'Drive 1.3', 'preco': 'R$ 79.990,01',
+     'ano': '2022/2023', 'km': '18.500 km', 'cambio': 'Automatico', 'combustivel': 'Flex', 'cor': 'Prata'},
+    {'codigo': '104', 'marca': 'Volkswagen', 'modelo': 'Gol', 'versao': '1.0', 'preco': 'R$ 45.000,00',
+     'ano': '2018/2019', 'km': '80.000 km', 'cambio': 'Manual', 'combustivel': 'Gasolina', 'cor': 'Branco Perolizado'},
+    {'codigo': '105', 'marca': 'Fiat', 'modelo': 'Toro', 'versao': 'Volcano', 'preco': 'Consulte',
+     'ano': '2021/2021', 'km': '', 'cambio': 'Automático', 'combustivel': 'Diesel', 'cor': None},
+]
+
+# (categorias {campo: (valor, exato)}, faixas [(coluna, limite, valor)]) como a API monta
+CONSULTAS = [
+    ({'cambio': ('automatico', True)}, []),
+    ({'cambio': ('AUTOMÁTICO', True)}, []),
+    ({'marca': ('citroën', False)}, []),
+    ({'marca': ('citroen', False)}, []),
+    ({'cor': ('branco', False)}, []),
+    ({'cor': ('branco', True)}, []),
+    ({'combustivel': ('flex', True), 'marca': ('fiat', False)}, []),
+    ({}, [('preco', 'minimo', 5990000), ('preco', 'maximo', 8000000)]),
+    ({}, [('km', 'maximo', 52000)]),
+    ({'cambio': ('manual', True)}, [('ano_fabricacao', 'minimo', 2019)]),
+]
+
+
+@pytest.fixture(scope='module')
+def backends(tmp_path_factory):
+    caminho = str(tmp_path_factory.mktemp('sqlite') / 'estoque.db')
+    armazenamento_sqlite.salvar_estoque(VEICULOS, caminho)
+    return indices_estoque.construir_indices(VEICULOS), armazenamento_sqlite.EstoqueSQLite(caminho)
+
+
+def _codigos_bitmap(indices, categorias, faixas):
+    bitmap = indices['todos']
+    for campo, (valor, exato) in categorias.items():
+        bitmap &= indices_estoque.bitmap_categoria(indices, campo, valor, exato=exato)
+    for coluna, limite, valor in faixas:
+        bitmap &= indices_estoque.bitmap_faixa(indices, coluna, **{limite: valor})
+    return [VEICULOS[pos]['codigo'] for pos in indices_estoque.posicoes_do_bitmap(bitmap)]
+
+
+def _codigos_sqlite(sqlite, categorias, faixas):
+    opcoes = {'limit': None, 'offset': 0, 'ordenar': None, 'campos': None}
+    _, veiculos = sqlite.filtrar(categorias, faixas, None, opcoes)
+    return [v['codigo'] for v in veiculos]
+
+
+@pytest.mark.parametrize('categorias,faixas', CONSULTAS)
+def test_bitmap_igual_ao_sqlite(backends, categorias, faixas):
+    indices, sqlite = backends
+    assert _codigos_bitmap(indices, categorias, faixas) == _codigos_sqlite(sqlite, categorias, faixas)
+
+
+def test_categoria_ignora_acento_e_caixa(backends):
+    indices, _ = backends
+    assert _codigos_bitmap(indices, {'cambio': ('automatico', True)}, []) == ['102', '103', '105']
+    assert _codigos_bitmap(indices, {'marca': ('citroën', False)}, []) == ['101', '102']
+
+
+def test_faixa_de_preco_em_centavos(backends):
+    indices, _ = backends
+    # 'Consulte' não tem preço: fica fora de qualquer faixa
+    assert _codigos_bitmap(indices, {}, [('preco', 'minimo', 0)]) == ['101', '102', '103', '104']
+    # Como a API converte preco_max: 79990.01 * 100 dá 7999000.999..., truncar perderia o Cronos
+    maximo = round(float('79990.01') * 100)
+    assert _codigos_bitmap(indices, {}, [('preco', 'maximo', maximo)]) == ['101', '103', '104']
+
+
+def test_busca_termo_curto_no_meio_do_token():
+    indices = indices_estoque.construir_indices([
+        {'marca': 'Hyundai', 'modelo': 'HB20', 'versao': 'Comfort'},
+        {'marca': 'Citroën', 'modelo': 'C4 Cactus', 'versao': 'Feel'},
+    ])
+    assert [pos for pos, _ in indices_estoque.buscar_aproximado(indices, 'b2')] == [0]
+    assert [pos for pos, _ in indices_estoque.buscar_aproximado(indices, 'ct')] == [1]
+    assert indices_estoque.buscar_aproximado(indices, 'c4') == [(1, 1.0)]
@@ -0,0 +1,50 @@
+"""
+Testes da publicação compartilhada entre workers (pytest): gerações e corpo pré-serializado
+"""
+
+import gzip
+import json
+import os
+
+import memoria_compartilhada
+
+ESTOQUE = {'ultima_atualizacao': '2024-05-01 10:00:00', 'total_veiculos': 1,
+           'veiculos': [{'codigo': '1', 'modelo': 'Citroën C3', 'fotos': ['a.jpg']}]}
+
+
+def _publicar(tmp_path, estoque=ESTOQUE):
+    arquivo = tmp_path / 'estoque.json'
+    arquivo.write_text(json.dumps(estoque, ensure_ascii=False), encoding='utf-8')
+    return memoria_compartilhada.publicar(str(arquivo), str(tmp_path / 'shm'))
+
+
+def test_geracao_publicada_com_corpo_pronto(tmp_path):
+    contador = memoria_compartilhada.ContadorGeracao(str(tmp_path / 'shm'))
+    assert contador.geracao() is None
+    geracao = _publicar(tmp_path)
+    assert contador.geracao() == geracao == 1
+
+    assert list(contador.abrir(geracao).veiculos) == ESTOQUE['veiculos']
+    respostas = contador.respostas(geracao)
+    # Mesmo ETag que a API calcula sem o modo compartilhado
+    assert respostas['etag'] == memoria_compartilhada.preparar_respostas(ESTOQUE)['etag']
+    assert json.loads(respostas['arquivos']['identity'].read()) == ESTOQUE
+    assert json.loads(gzip.decompress(respostas['arquivos']['gzip'].read())) == ESTOQUE
+
+
+def test_geracoes_antigas_sao_apagadas(tmp_path):
+    for _ in range(4):
+        geracao = _publicar(tmp_path)
+    assert geracao == 4
+    restantes = {nome.split('.')[1] for nome in os.listdir(tmp_path / 'shm') if nome.startswith('estoque.')}
+    assert restantes == {str(g) for g in range(geracao - memoria_compartilhada.GERACOES_MANTIDAS + 1, geracao + 1)}
+
+
+def test_worker_atrasado_le_o_corpo_de_geracao_apagada(tmp_path):
+    contador = memoria_compartilhada.ContadorGeracao(str(tmp_path / 'shm'))
+    geracao = _publicar(tmp_path)
+    respostas = contador.respostas(geracao)  # aberto na troca de geração, como na API
+    for _ in range(memoria_compartilhada.GERACOES_MANTIDAS):
+        _publicar(tmp_path, dict(ESTOQUE, total_veiculos=2))
+    assert not os.path.exists(memoria_compartilhada.arquivo_geracao(str(tmp_path / 'shm'), geracao, 'json'))
+    assert json.loads(respostas['arquivos']['identity'].read()) == ESTOQUE
@@ -0,0 +1,57 @@
+"""
+Testes do feed de mudanças (pytest): diff por código, versões e o flag 'completo'
+"""
+
+import mudancas_estoque
+
+
+def _veiculo(codigo, preco='R$ 10,00', km='1.000 km'):
+    return {'codigo': codigo, 'modelo': f'Modelo {codigo}', 'preco': preco, 'km': km}
+
+
+def test_calcular_mudancas():
+    anteriores = {v['codigo']: v for v in (_veiculo('A'), _veiculo('B'), _veiculo('CAMOES_1'))}
+    diff = mudancas_estoque.calcular_mudancas(anteriores, [
+        _veiculo('A', preco='R$ 9,00'), _veiculo('C'), _veiculo('C', preco='R$ 1,00'), _veiculo('CAMOES_2')])
+    assert [v['codigo'] for v in diff['adicionados']] == ['C']
+    assert [v['codigo'] for v in diff['removidos']] == ['B']  # CAMOES_<n> não conta como removido
+    assert diff['alterados'] == [{'codigo': 'A', 'modelo': 'Modelo A',
+                                  'mudancas': {'preco': {'de': 'R$ 10,00', 'para': 'R$ 9,00'}}}]
+    assert not mudancas_estoque.tem_mudancas(mudancas_estoque.calcular_mudancas(anteriores, list(anteriores.values())))
+
+
+def test_versoes_e_desde(tmp_path):
+    caminho = str(tmp_path / 'mudancas.json')
+    diff = {'adicionados': [], 'removidos': [], 'alterados': []}
+    for _ in range(3):
+        mudancas_estoque.registrar_mudancas(diff, caminho, momento='2024-01-01 00:00:00')
+    feed = mudancas_estoque.carregar_feed(caminho)
+    assert feed['versao_atual'] == 3
+
+    resposta = mudancas_estoque.mudancas_desde(feed, 1)
+    assert [e['versao'] for e in resposta['entradas']] == [2, 3]
+    assert resposta['completo'] is True
+    assert mudancas_estoque.mudancas_desde(feed, 0)['completo'] is True
+    em_dia = mudancas_estoque.mudancas_desde(feed, 3)
+    assert em_dia['entradas'] == [] and em_dia['completo'] is True
+
+
+def test_cliente_atrasado_nao_recebe_feed_completo(tmp_path, monkeypatch):
+    monkeypatch.setattr(mudancas_estoque, 'MAX_ENTRADAS', 2)
+    caminho = str(tmp_path / 'mudancas.json')
+    diff = {'adicionados': [], 'removidos': [], 'alterados': []}
+    for _ in range(5):
+        mudancas_estoque.registrar_mudancas(diff, caminho)
+    feed = mudancas_estoque.carregar_feed(caminho)
+    assert [e['versao'] for e in feed['entradas']] == [4, 5]
+
+    assert mudancas_estoque.mudancas_desde(feed, 3)['completo'] is True
+    atrasado = mudancas_estoque.mudancas_desde(feed, 2)
+    assert atrasado['completo'] is False  # versão 3 já saiu do arquivo
+    assert [e['versao'] for e in atrasado['entradas']] == [4, 5]
+
+
+def test_feed_vazio(tmp_path):
+    feed = mudancas_estoque.carregar_feed(str(tmp_path / 'inexistente.json'))
+    assert mudancas_estoque.mudancas_desde(feed, 0) == {
+        'versao_atual': 0, 'desde': 0, 'completo': True, 'entradas': []}
@@ -0,0 +1,111 @@
+"""
+Testes do parser lxml (pytest): listagem e página de detalhes a partir de HTML salvo em fixtures/
+"""
+
+import os
+
+import pytest
+
+import parser_camoes
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+LINK_COROLLA = parser_camoes.DOMINIO + '/carros/toyota-corolla-xei-2-0-7329496.html'
+
+
+def _html(nome):
+    with open(os.path.join(FIXTURES, nome), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.fixture(scope='module')
+def listagem():
+    return parser_camoes.parse_listagem(_html('listagem.html'))
+
+
+def test_listagem_card_completo(listagem):
+    registros, total = listagem
+    assert total == 4
+    assert [idx for idx, _ in registros] == [1, 2, 4]  # card 3 sem preço é descartado
+    dados = dict(registros)[1]
+    assert {campo: dados[campo] for campo in ('codigo', 'marca', 'modelo', 'versao', 'preco', 'ano', 'km',
+                                              'cambio', 'combustivel', 'foto_principal', 'link')} == {
+        'codigo': '7329496',
+        'marca': 'TOYOTA',
+        'modelo': 'TOYOTA COROLLA XEI 2.0',
+        'versao': 'XEI 2.0',
+        'preco': 'R$ 98.900,00',
+        'ano': '2020/2021',
+        'km': '35.000 km',
+        'cambio': 'Automático',
+        'combustivel': 'FLEX',
+        'foto_principal': 'https://cdn.example.com/7329496/1.jpg',  # data-src, não o lazy.gif
+        'link': LINK_COROLLA,
+    }
+
+
+def test_listagem_sem_preco_no_h3_sem_km_e_sem_foto(listagem):
+    dados = dict(listagem[0])[2]
+    assert dados['preco'] == 'R$ 35.500,00'  # span#valor_veic
+    assert dados['ano'] == '2016'  # primeiro resumo com 4 dígitos
+    assert dados['km'] == '' and dados['cambio'] == ''
+    assert dados['foto_principal'] == ''  # só lazy.gif
+
+
+def test_listagem_sem_titulo_usa_alt_e_codigo_pela_posicao(listagem):
+    dados = dict(listagem[0])[4]
+    assert dados['modelo'] == 'VW GOL' and dados['versao'] == ''
+    assert dados['codigo'] == 'CAMOES_4'
+    assert dados['link'] == ''  # javascript:
+
+
+def test_montar_veiculo_sem_modelo_ou_preco():
+    assert parser_camoes.montar_veiculo({'href': None, 'titulo': None, 'img_alt': None}, 1) is None
+    assert parser_camoes.montar_veiculo({'titulo': 'FIAT UNO', 'preco': None, 'valor': None}, 1) is None
+    dados = parser_camoes.montar_veiculo({'titulo': '2019 FIAT UNO', 'preco': 'R$ 1,00'}, 7)
+    assert dados['modelo'] == 'FIAT UNO' and dados['km'] == '' and dados['foto_principal'] == ''
+
+
+def test_detalhes_fotos_cor_detalhes_e_opcionais():
+    detalhes = parser_camoes.parse_detalhes(_html('detalhe.html'), LINK_COROLLA)
+    assert detalhes == {
+        'fotos': ['https://cdn.example.com/7329496/1.jpg', 'https://cdn.example.com/7329496/2.jpg'],
+        'cor': 'Prata',
+        'detalhes': 'Único dono, revisões na concessionária.',  # blocos repetidos entram uma vez
+        'opcionais': ['Ar condicionado', 'Direção elétrica', 'Teto solar'],
+    }
+
+
+def test_detalhes_sem_fotos():
+    detalhes = parser_camoes.parse_detalhes(_html('detalhe_sem_fotos.html'))
+    assert detalhes == {'fotos': [], 'cor': '', 'detalhes': '', 'opcionais': []}
+    # Sem miniaturas válidas, a foto principal vira a única foto
+    bruto = {'thumbs': [None, parser_camoes.DOMINIO + '/img/lazy.gif'], 'foto_principal': 'grande.jpg'}
+    assert parser_camoes.montar_detalhes(bruto)['fotos'] == ['grande.jpg']
+
+
+def test_aplicar_detalhes_sem_pagina():
+    dados = parser_camoes.aplicar_detalhes({'cor': ''}, None)
+    assert dados == {'cor': '', 'fotos': [], 'detalhes': '', 'opcionais': []}
+
+
+@pytest.mark.parametrize('processos', [None, 2])
+def test_execucao_arquivada_reprocessa_igual_ao_parse_direto(tmp_path, processos):
+    paginas = {LINK_COROLLA: _html('detalhe.html'),
+               parser_camoes.DOMINIO + '/carros/fiat-uno-way-7330001.html': _html('detalhe_sem_fotos.html')}
+    arquivo = parser_camoes.ArquivoExecucao(str(tmp_path))
+    arquivo.salvar_listagem(_html('listagem.html'), parser_camoes.DOMINIO + '/multipla')
+    for link, html in paginas.items():
+        arquivo.salvar_detalhe(link, html)
+    arquivo.fechar()
+
+    registros, _ = parser_camoes.parse_listagem(_html('listagem.html'))
+    diretos = [parser_camoes.aplicar_detalhes(dados, parser_camoes.parse_detalhes(paginas[dados['link']], dados['link'])
+                                              if dados['link'] in paginas else None)
+               for _, dados in registros]
+    reprocessados = parser_camoes.reprocessar_execucao(arquivo.diretorio, processos)
+
+    def sem_data(veiculos):
+        return [{c: v for c, v in veiculo.items() if c != 'data_scraping'} for veiculo in veiculos]
+
+    assert sem_data(reprocessados) == sem_data(diretos)
+    assert sorted(os.listdir(os.path.join(arquivo.diretorio, 'detalhes'))) == ['7329496.html', '7330001.html']
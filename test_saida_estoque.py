@@ -0,0 +1,51 @@
+"""
+Testes da gravação das saídas do scraper (pytest): escrita atômica e NDJSON incremental
+"""
+
+import os
+
+import pytest
+
+import saida_estoque
+
+
+def test_escrita_atomica_mantem_o_arquivo_anterior_se_falhar(tmp_path):
+    caminho = str(tmp_path / 'estoque.json')
+    with saida_estoque.escrita_atomica(caminho) as f:
+        f.write('antigo')
+    with pytest.raises(RuntimeError):
+        with saida_estoque.escrita_atomica(caminho) as f:
+            f.write('novo pela metade')
+            raise RuntimeError('queda')
+    with open(caminho, encoding='utf-8') as f:
+        assert f.read() == 'antigo'
+    assert os.listdir(tmp_path) == ['estoque.json']
+
+
+def test_ndjson_grava_cada_veiculo_na_hora(tmp_path):
+    arquivo = str(tmp_path / 'estoque.ndjson')
+    saida = saida_estoque.SaidaNDJSON(arquivo, 3)
+    # Ordem de conclusão, não da listagem: nenhum veículo espera pelo anterior
+    saida.concluir({'codigo': 'C', 'fotos': ['c.jpg']})
+    assert [v['codigo'] for v in saida_estoque.ler_ndjson(saida.parcial)] == ['C']
+    saida.concluir({'codigo': 'A', 'fotos': []})
+    with pytest.raises(RuntimeError):
+        saida.finalizar()
+
+    # Queda: o .parcial fica e só os veículos com fotos são reaproveitados
+    saida.fechar()
+    assert list(saida_estoque.recuperar_parcial(arquivo)) == ['C']
+
+    saida = saida_estoque.SaidaNDJSON(arquivo, 2)
+    saida.concluir({'codigo': 'B'})
+    saida.concluir({'codigo': 'A'})
+    saida.finalizar()
+    assert [v['codigo'] for v in saida_estoque.ler_ndjson(arquivo)] == ['B', 'A']
+    assert not os.path.exists(saida.parcial)
+    assert saida_estoque.recuperar_parcial(arquivo) == {}
+
+
+def test_ler_ndjson_ignora_ultima_linha_truncada(tmp_path):
+    caminho = tmp_path / 'estoque.ndjson'
+    caminho.write_text('{"codigo": "A"}\n{"codigo": "B"}\n{"codigo": "C", "fo', encoding='utf-8')
+    assert [v['codigo'] for v in saida_estoque.ler_ndjson(str(caminho))] == ['A', 'B']
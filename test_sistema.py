@@ -15,6 +15,8 @@ if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 
 class TestadorSistema:
+    __test__ = False  # script contra a API rodando, não é coletado pelo pytest
+    
     def __init__(self, api_url='http://localhost:5000'):
         self.api_url = api_url
         self.resultados = []
@@ -279,6 +281,158 @@ class TestadorSistema:
             self.print_resultado("Performance", False, str(e))
             return False
     
+    def teste_8_paginacao(self):
+        """Teste 8: Paginação, ordenação e campos em GET /api/estoque"""
+        self.print_header("Teste 8: Paginação e Ordenação")
+        
+        try:
+            response = requests.get(
+                f"{self.api_url}/api/estoque",
+                params={'limit': 2, 'offset': 0, 'ordenar': 'preco', 'campos': 'codigo,preco'},
+                timeout=5
+            )
+            if response.status_code != 200:
+                self.print_resultado("GET /api/estoque?limit=2", False, f"Status: {response.status_code}")
+                return False
+            
+            dados = response.json()
+            paginacao = dados.get('paginacao', {})
+            veiculos = dados.get('veiculos', [])
+            sucesso = (len(veiculos) <= 2 and paginacao.get('limit') == 2
+                       and all(set(v) <= {'codigo', 'preco'} for v in veiculos))
+            self.print_resultado(
+                "GET /api/estoque?limit=2&ordenar=preco&campos=codigo,preco",
+                sucesso,
+                f"{len(veiculos)} veículos, próximo offset: {paginacao.get('proximo_offset')}"
+            )
+            
+            # Segunda página não repete a primeira
+            if sucesso and paginacao.get('proximo_offset') is not None:
+                response = requests.get(
+                    f"{self.api_url}/api/estoque",
+                    params={'limit': 2, 'offset': paginacao['proximo_offset'], 'ordenar': 'preco', 'campos': 'codigo'},
+                    timeout=5
+                )
+                segunda = [v.get('codigo') for v in response.json().get('veiculos', [])]
+                sem_repeticao = not set(segunda) & {v.get('codigo') for v in veiculos}
+                self.print_resultado("Segunda página sem repetir veículos", sem_repeticao, f"Códigos: {segunda}")
+                sucesso = sucesso and sem_repeticao
+            
+            # Parâmetro inválido responde 400
+            response = requests.get(f"{self.api_url}/api/estoque", params={'limit': -1}, timeout=5)
+            self.print_resultado("limit=-1 retorna 400", response.status_code == 400, f"Status: {response.status_code}")
+            return sucesso and response.status_code == 400
+            
+        except Exception as e:
+            self.print_resultado("Paginação", False, str(e))
+            return False
+    
+    def teste_9_busca_texto(self):
+        """Teste 9: Busca full-text GET /api/estoque/texto"""
+        self.print_header("Teste 9: Busca nos Detalhes e Opcionais")
+        
+        try:
+            response = requests.get(
+                f"{self.api_url}/api/estoque/texto",
+                params={'q': 'ar condicionado', 'limit': 5},
+                timeout=5
+            )
+            sucesso = response.status_code == 200
+            
+            if sucesso:
+                dados = response.json()
+                veiculos = dados.get('veiculos', [])
+                scores = [v.get('score', 0) for v in veiculos]
+                sucesso = scores == sorted(scores, reverse=True) and all('trechos' in v for v in veiculos)
+                self.print_resultado(
+                    "GET /api/estoque/texto?q=ar condicionado",
+                    sucesso,
+                    f"{dados.get('total_encontrados', 0)} veículos encontrados (ordenados por relevância)"
+                )
+            else:
+                self.print_resultado("GET /api/estoque/texto", False, f"Status: {response.status_code}")
+            
+            response = requests.get(f"{self.api_url}/api/estoque/texto", timeout=5)
+            self.print_resultado("Sem 'q' retorna 400", response.status_code == 400, f"Status: {response.status_code}")
+            return sucesso and response.status_code == 400
+            
+        except Exception as e:
+            self.print_resultado("GET /api/estoque/texto", False, str(e))
+            return False
+    
+    def teste_10_mudancas(self):
+        """Teste 10: Feed de mudanças GET /api/estoque/mudancas"""
+        self.print_header("Teste 10: Feed de Mudanças")
+        
+        try:
+            response = requests.get(f"{self.api_url}/api/estoque/mudancas", params={'desde': 0}, timeout=5)
+            if response.status_code != 200:
+                self.print_resultado("GET /api/estoque/mudancas", False, f"Status: {response.status_code}")
+                return False
+            
+            dados = response.json()
+            versao = dados.get('versao_atual', 0)
+            self.print_resultado(
+                "GET /api/estoque/mudancas?desde=0",
+                'completo' in dados and 'entradas' in dados,
+                f"Versão atual: {versao}, {len(dados.get('entradas', []))} entradas"
+            )
+            
+            # Cliente em dia: nenhuma entrada nova
+            response = requests.get(f"{self.api_url}/api/estoque/mudancas", params={'desde': versao}, timeout=5)
+            em_dia = response.json()
+            sucesso = em_dia.get('entradas') == [] and em_dia.get('completo') is True
+            self.print_resultado(f"desde={versao} sem entradas novas", sucesso, f"completo: {em_dia.get('completo')}")
+            
+            response = requests.get(f"{self.api_url}/api/estoque/mudancas", params={'desde': 'abc'}, timeout=5)
+            self.print_resultado("desde=abc retorna 400", response.status_code == 400, f"Status: {response.status_code}")
+            return sucesso and response.status_code == 400
+            
+        except Exception as e:
+            self.print_resultado("GET /api/estoque/mudancas", False, str(e))
+            return False
+    
+    def teste_11_historico(self):
+        """Teste 11: Histórico de preço GET /api/estoque/historico"""
+        self.print_header("Teste 11: Histórico de Preço e Permanência")
+        
+        try:
+            response = requests.get(f"{self.api_url}/api/estoque/historico", timeout=5)
+            sucesso = response.status_code == 200
+            if sucesso:
+                resumo = response.json()
+                self.print_resultado(
+                    "GET /api/estoque/historico",
+                    'em_estoque' in resumo,
+                    f"{resumo.get('em_estoque', {}).get('total', 0)} em estoque, "
+                    f"{resumo.get('vendidos', {}).get('total', 0)} vendidos"
+                )
+            else:
+                self.print_resultado("GET /api/estoque/historico", False, f"Status: {response.status_code}")
+                return False
+            
+            # Histórico do primeiro veículo (404 se o histórico ainda não registrou nenhuma execução)
+            estoque = requests.get(f"{self.api_url}/api/estoque", params={'limit': 1, 'campos': 'codigo'}, timeout=5).json()
+            if not estoque.get('veiculos'):
+                return sucesso
+            codigo = estoque['veiculos'][0].get('codigo')
+            response = requests.get(f"{self.api_url}/api/estoque/historico/{codigo}", timeout=5)
+            if response.status_code == 200:
+                dados = response.json()
+                self.print_resultado(
+                    f"GET /api/estoque/historico/{codigo}",
+                    bool(dados.get('eventos')),
+                    f"{len(dados.get('eventos', []))} eventos, {dados.get('dias_em_estoque')} dias em estoque"
+                )
+                return bool(dados.get('eventos'))
+            self.print_resultado(f"GET /api/estoque/historico/{codigo}", response.status_code == 404,
+                                 f"Status: {response.status_code} (execute o scraper com histórico)")
+            return response.status_code == 404
+            
+        except Exception as e:
+            self.print_resultado("GET /api/estoque/historico", False, str(e))
+            return False
+    
     def gerar_relatorio(self):
         """Gera relatório final dos testes"""
         self.print_header("RELATÓRIO FINAL")
@@ -334,6 +488,10 @@ def main():
     testador.teste_5_endpoint_codigo()
     testador.teste_6_endpoint_webhook_n8n()
     testador.teste_7_performance()
+    testador.teste_8_paginacao()
+    testador.teste_9_busca_texto()
+    testador.teste_10_mudancas()
+    testador.teste_11_historico()
     
     # Gerar relatório final
     testador.gerar_relatorio()
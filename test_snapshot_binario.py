@@ -0,0 +1,80 @@
+"""
+Testes do snapshot binário (pytest): ida e volta JSON -> binário -> veículos
+"""
+
+import pytest
+
+import indices_estoque
+import snapshot_binario
+import texto_estoque
+
+ESTOQUE = {
+    'ultima_atualizacao': '2024-05-01 10:00:00',
+    'total_veiculos': 4,
+    'veiculos': [
+        {'codigo': '1', 'modelo': 'Citroën C4 Cactus', 'preco': 'R$ 89.900,00', 'cor': 'Cinza',
+         'fotos': ['a.jpg', 'b.jpg'], 'opcionais': ['Ar condicionado']},
+        {'codigo': '2', 'modelo': 'HB20', 'preco': 'R$ 59.900,00', 'cor': None, 'fotos': [], 'opcionais': []},
+        # Ordem de chaves diferente, campo extra e valor que não é string
+        {'modelo': 'Gol', 'codigo': '3', 'preco': 'Consulte', 'fotos': ['a.jpg'], 'score': 0.5},
+        {'codigo': '4', 'modelo': 'Toro ✓', 'preco': '', 'cor': 'Branco', 'fotos': ['c.jpg'],
+         'opcionais': ['Ar condicionado', 'Teto solar'], 'score': None},
+    ],
+}
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    caminho = str(tmp_path / 'estoque.bin')
+    snapshot_binario.gerar(ESTOQUE, caminho)
+    return snapshot_binario.abrir(caminho)
+
+
+def test_ida_e_volta(snapshot):
+    assert snapshot.total == 4
+    assert snapshot.ultima_atualizacao == ESTOQUE['ultima_atualizacao']
+    assert snapshot.total_veiculos == ESTOQUE['total_veiculos']
+    assert list(snapshot.veiculos) == ESTOQUE['veiculos']
+    # Mesma ordem de chaves do original (a API serializa o dict como está)
+    assert [list(v) for v in snapshot.veiculos] == [list(v) for v in ESTOQUE['veiculos']]
+
+
+def test_acesso_como_lista(snapshot):
+    veiculos = snapshot.veiculos
+    assert veiculos[-1] == ESTOQUE['veiculos'][-1]
+    assert veiculos[1:3] == ESTOQUE['veiculos'][1:3]
+    assert veiculos[0] == veiculos[0] and veiculos[0] is not veiculos[0]  # nada fica guardado
+    with pytest.raises(IndexError):
+        veiculos[4]
+
+
+def test_valores_da_coluna(snapshot):
+    assert snapshot.veiculos.valores('cor') == ['Cinza', None, None, 'Branco']
+    assert snapshot.valores('score') == [None, None, 0.5, None]
+    assert snapshot.valores('inexistente') == [None] * 4
+
+
+def test_estoque_vazio(tmp_path):
+    caminho = str(tmp_path / 'vazio.bin')
+    snapshot_binario.gerar({'ultima_atualizacao': None, 'veiculos': []}, caminho)
+    snapshot = snapshot_binario.abrir(caminho)
+    assert snapshot.total == 0 and list(snapshot.veiculos) == []
+
+
+def test_arquivo_que_nao_e_snapshot(tmp_path):
+    caminho = tmp_path / 'outro.bin'
+    caminho.write_bytes(b'{"veiculos": []}' + b' ' * 32)
+    with pytest.raises(ValueError):
+        snapshot_binario.abrir(str(caminho))
+
+
+def test_indices_lidos_das_colunas_sem_montar_veiculos(snapshot, monkeypatch):
+    esperado = (indices_estoque.construir_indices(ESTOQUE['veiculos']),
+                texto_estoque.construir_indice_texto(ESTOQUE['veiculos']))
+
+    def montar(self, pos):
+        raise AssertionError(f'veículo {pos} montado para construir os índices')
+
+    monkeypatch.setattr(snapshot_binario.SnapshotBinario, 'veiculo', montar)
+    assert indices_estoque.construir_indices(snapshot.veiculos) == esperado[0]
+    assert texto_estoque.construir_indice_texto(snapshot.veiculos) == esperado[1]
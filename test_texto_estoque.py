@@ -0,0 +1,75 @@
+"""
+Testes da busca full-text (pytest): radicais, ranking BM25 e trechos destacados
+"""
+
+import texto_estoque
+
+VEICULOS = [
+    {'codigo': '1', 'detalhes': 'Carro muito conservado, revisões em dia na concessionária.',
+     'opcionais': ['Ar condicionado', 'Direção hidráulica']},
+    {'codigo': '2', 'detalhes': 'Único dono, todas as revisões feitas. Ar-condicionado digital, ar quente.',
+     'opcionais': ['Ar condicionado', 'Teto solar', 'Bancos de couro']},
+    {'codigo': '3', 'detalhes': 'Pneus novos. Ar quente e condicionado de fábrica.',
+     'opcionais': []},
+    {'codigo': '4', 'detalhes': '', 'opcionais': ['Alarme', 'Travas elétricas']},
+]
+
+
+def _indice():
+    return texto_estoque.construir_indice_texto(VEICULOS)
+
+
+def test_radical_junta_plural_genero_e_acento():
+    assert texto_estoque.termos('Revisões revisão') == ['revisa', 'revisa']
+    assert texto_estoque.termos('bancos de couro') == ['banc', 'cour']
+    assert texto_estoque.termos('Único DONO') == texto_estoque.termos('unico dono')
+
+
+def test_bm25_ordena_por_relevancia():
+    # Mesmo tf: o texto mais curto (veículo 1) fica na frente
+    resultado = texto_estoque.buscar(_indice(), 'revisões')
+    assert [pos for pos, _ in resultado] == [0, 1]
+    assert resultado[0][1] > resultado[1][1] > 0
+
+    # Termo raro (idf maior) pesa mais que termo presente em quase todos
+    raro = dict(texto_estoque.buscar(_indice(), 'teto ar'))
+    assert max(raro, key=raro.get) == 1
+    assert 3 not in raro  # sem nenhum dos termos
+
+
+def test_bonus_de_frase_para_termos_vizinhos():
+    scores = dict(texto_estoque.buscar(_indice(), 'ar condicionado'))
+    # O veículo 3 tem 'ar' e 'condicionado', mas não lado a lado: fica atrás de quem tem a frase
+    assert scores[2] < scores[0]
+    assert scores[2] < scores[1]
+
+
+def test_busca_sem_termos():
+    assert texto_estoque.buscar(_indice(), 'de com para') == []
+    assert texto_estoque.buscar(_indice(), 'inexistente') == []
+
+
+def test_trechos_destacam_termos_do_texto_original():
+    trechos = texto_estoque.trechos(VEICULOS[1], 'único dono revisão')
+    assert trechos
+    assert '*Único* *dono*' in trechos[0]
+    assert '*revisões*' in trechos[0]
+
+
+def test_trechos_limitados_e_com_reticencias():
+    veiculo = {'detalhes': ' '.join(['palavra'] * 40 + ['garantia'] + ['palavra'] * 40 + ['garantia'] + ['fim'] * 40)}
+    trechos = texto_estoque.trechos(veiculo, 'garantia', tamanho=10)
+    assert len(trechos) == texto_estoque.MAX_TRECHOS
+    assert all(t.startswith('…') and t.endswith('…') for t in trechos)
+    assert all(t.count('*garantia*') == 1 for t in trechos)
+    assert texto_estoque.trechos(veiculo, 'ausente') == []
+
+
+def test_consulta_com_pontuacao_divide_como_o_texto():
+    # O texto é dividido em \w+: 'solar.' e '1.0' precisam virar as mesmas chaves
+    assert texto_estoque.termos('teto solar.') == ['tet', 'solar']
+    veiculos = [{'detalhes': 'Motor 1.0 turbo, teto solar.'}, {'detalhes': 'Motor 2.0 diesel'}]
+    indice = texto_estoque.construir_indice_texto(veiculos)
+    assert [pos for pos, _ in texto_estoque.buscar(indice, 'solar.')] == [0]
+    assert [pos for pos, _ in texto_estoque.buscar(indice, '1.0')][0] == 0
+    assert texto_estoque.trechos(veiculos[0], 'solar.')[0].endswith('teto *solar*')
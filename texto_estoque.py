@@ -0,0 +1,180 @@
+"""
+Busca full-text (BM25) sobre detalhes e opcionais dos veículos
+Normalização para português (sem acento, stopwords, radical simples) e trechos destacados
+"""
+
+from array import array
+import math
+import re
+
+from indices_estoque import campos_por_veiculo, normalizar
+
+# Parâmetros do BM25
+K1 = 1.2
+B = 0.75
+BONUS_FRASE = 0.5  # score * (1 + BONUS_FRASE * fração dos pares da consulta encontrados lado a lado)
+
+TAMANHO_TRECHO = 24  # palavras por trecho
+MAX_TRECHOS = 2
+
+STOPWORDS = frozenset("""
+a o as os um uma uns umas de do da dos das em no na nos nas por pelo pela pelos pelas
+para pra com sem e ou que se ao aos à às é são ser foi muito mais menos seu sua seus suas
+nosso nossa este esta esse essa isso isto já até onde como também ter tem
+""".split())
+
+# Sufixos (já sem acento) -> substituição, testados do mais longo para o mais curto
+SUFIXOS_PLURAL = (('oes', 'ao'), ('aes', 'ao'), ('ais', 'al'), ('eis', 'el'), ('ois', 'ol'),
+                  ('res', 'r'), ('zes', 'z'), ('ns', 'm'), ('s', ''))
+
+_PALAVRA = re.compile(r'\w+')
+
+
+def radical(token):
+    """Radical simples: tira plural, advérbio em -mente e a vogal final de gênero ('revisadas' -> 'revisad')"""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith('mente') and len(token) - 5 >= 4:
+        token = token[:-5]
+    for sufixo, troca in SUFIXOS_PLURAL:
+        if token.endswith(sufixo) and len(token) - len(sufixo) >= 3:
+            token = token[:-len(sufixo)] + troca
+            break
+    if len(token) > 3 and token[-1] in 'aeo':
+        token = token[:-1]
+    return token
+
+
+def _chave(palavra):
+    """Radical de uma palavra de _PALAVRA (None se for stopword)"""
+    normalizada = normalizar(palavra)
+    if not normalizada or normalizada in STOPWORDS:
+        return None
+    return radical(normalizada.replace(' ', ''))
+
+
+def termos(texto):
+    """Radicais da consulta/documento (sem stopwords), na ordem do texto; mesma divisão em palavras de _palavras"""
+    return [chave for chave in map(_chave, _PALAVRA.findall(texto or '')) if chave]
+
+
+def texto_veiculo(veiculo):
+    """Texto pesquisável do veículo: detalhes + lista de opcionais"""
+    partes = [veiculo.get('detalhes') or '']
+    opcionais = [o for o in veiculo.get('opcionais') or [] if o]
+    if opcionais:
+        partes.append('Opcionais: ' + ', '.join(opcionais))
+    return '\n'.join(partes)
+
+
+def _palavras(texto):
+    """[(radical ou None se stopword, inicio, fim)] de cada palavra do texto original"""
+    palavras = []
+    for m in _PALAVRA.finditer(texto):
+        palavras.append((_chave(m.group()), m.start(), m.end()))
+    return palavras
+
+
+def construir_indice_texto(veiculos):
+    """
+    Índice invertido para BM25:
+    - postings: {radical: {posicao: [posições da palavra no texto]}}
+    - tamanhos: array com o número de palavras de cada veículo; media: tamanho médio
+    - idf: {radical: idf}
+    """
+    postings = {}
+    tamanhos = array('q')
+    for pos, v in enumerate(campos_por_veiculo(veiculos, ('detalhes', 'opcionais'))):
+        palavras = _palavras(texto_veiculo(v))
+        tamanhos.append(len(palavras))
+        for i, (chave, _, _) in enumerate(palavras):
+            if chave:
+                postings.setdefault(chave, {}).setdefault(pos, []).append(i)
+
+    total = len(veiculos)
+    idf = {
+        chave: math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+        for chave, docs in postings.items()
+    }
+    return {
+        'postings': postings,
+        'tamanhos': tamanhos,
+        'media': (sum(tamanhos) / total) if total else 0.0,
+        'idf': idf,
+    }
+
+
+def _fracao_frase(indice, consulta, pos):
+    """Fração dos pares vizinhos da consulta que aparecem lado a lado no texto do veículo"""
+    pares = list(zip(consulta, consulta[1:]))
+    if not pares:
+        return 0.0
+    encontrados = 0
+    for a, b in pares:
+        posicoes_a = indice['postings'].get(a, {}).get(pos, ())
+        posicoes_b = set(indice['postings'].get(b, {}).get(pos, ()))
+        # Stopwords contam na distância: 'único dono' e 'ar (o) condicionado' valem com até 1 palavra no meio
+        if any(p + 1 in posicoes_b or p + 2 in posicoes_b for p in posicoes_a):
+            encontrados += 1
+    return encontrados / len(pares)
+
+
+def buscar(indice, consulta):
+    """[(posicao, score)] dos veículos que contêm algum termo, do maior score BM25 para o menor"""
+    radicais = termos(consulta)
+    unicos = list(dict.fromkeys(radicais))
+    scores = {}
+    for chave in unicos:
+        docs = indice['postings'].get(chave)
+        if not docs:
+            continue
+        idf = indice['idf'][chave]
+        for pos, ocorrencias in docs.items():
+            tf = len(ocorrencias)
+            norma = K1 * (1 - B + B * indice['tamanhos'][pos] / (indice['media'] or 1))
+            scores[pos] = scores.get(pos, 0.0) + idf * tf * (K1 + 1) / (tf + norma)
+
+    if len(radicais) > 1:
+        for pos in scores:
+            scores[pos] *= 1 + BONUS_FRASE * _fracao_frase(indice, radicais, pos)
+    return sorted(((pos, round(s, 4)) for pos, s in scores.items()), key=lambda item: (-item[1], item[0]))
+
+
+def trechos(veiculo, consulta, tamanho=TAMANHO_TRECHO, maximo=MAX_TRECHOS):
+    """Trechos do texto do veículo com as palavras da consulta destacadas em *negrito* (WhatsApp)"""
+    procurados = set(termos(consulta))
+    texto = texto_veiculo(veiculo)
+    palavras = _palavras(texto)
+    acertos = [i for i, (chave, _, _) in enumerate(palavras) if chave in procurados]
+    if not acertos:
+        return []
+
+    # Janelas que começam em cada acerto; as com mais termos distintos primeiro
+    janelas = []
+    for inicio in acertos:
+        fim = min(len(palavras), inicio + tamanho)
+        distintos = {palavras[i][0] for i in acertos if inicio <= i < fim}
+        janelas.append((-len(distintos), inicio, fim))
+    janelas.sort()
+
+    escolhidas = []
+    for _, inicio, fim in janelas:
+        inicio = max(0, inicio - 3)  # um pouco de contexto antes do primeiro termo
+        if all(fim <= a or inicio >= b for a, b in escolhidas):
+            escolhidas.append((inicio, fim))
+        if len(escolhidas) == maximo:
+            break
+
+    resultado = []
+    for inicio, fim in sorted(escolhidas):
+        partes = []
+        cursor = palavras[inicio][1]
+        for chave, a, b in palavras[inicio:fim]:
+            partes.append(texto[cursor:a])
+            partes.append(f'*{texto[a:b]}*' if chave in procurados else texto[a:b])
+            cursor = b
+        trecho = ' '.join(''.join(partes).split())
+        prefixo = '…' if inicio > 0 else ''
+        sufixo = '…' if fim < len(palavras) else ''
+        resultado.append(prefixo + trecho + sufixo)
+    return resultado